@@ -33,8 +33,9 @@ import sys
 import traceback
 import bpy
 import bpy.utils.previews
-from bpy.props import StringProperty
+from bpy.props import StringProperty, BoolProperty, FloatProperty
 from . import auto_load
+from .utils.profiling import HandlerProfiler
 
 PACKAGE_NAME = __package__
 
@@ -79,6 +80,21 @@ class WMOPreferences(bpy.types.AddonPreferences):
         subtype="DIR_PATH"
     )
 
+    handler_profiling: BoolProperty(
+        name="Profile Handlers",
+        description="Record execution time of the addon's scene handlers (for debugging performance)",
+        default=False,
+        update=lambda self, ctx: HandlerProfiler.configure(self.handler_profiling, self.handler_budget_ms)
+    )
+
+    handler_budget_ms: FloatProperty(
+        name="Handler Budget (ms)",
+        description="Log a warning when a profiled handler takes longer than this. 0 disables warnings",
+        min=0.0,
+        default=16.0,
+        update=lambda self, ctx: HandlerProfiler.configure(self.handler_profiling, self.handler_budget_ms)
+    )
+
     def draw(self, context):
         self.layout.prop(self, "wow_path")
         self.layout.prop(self, "wmv_path")
@@ -86,6 +102,10 @@ class WMOPreferences(bpy.types.AddonPreferences):
         self.layout.prop(self, "cache_dir_path")
         self.layout.prop(self, "project_dir_path")
 
+        row = self.layout.row()
+        row.prop(self, "handler_profiling")
+        row.prop(self, "handler_budget_ms")
+
 
 def register():
     global pcoll
@@ -105,6 +125,10 @@ def register():
 
     bpy.utils.register_class(WMOPreferences)
 
+    addon = bpy.context.preferences.addons.get(__package__)
+    if addon:
+        HandlerProfiler.configure(addon.preferences.handler_profiling, addon.preferences.handler_budget_ms)
+
     try:
         auto_load.register()
         print("Registered WoW Blender Studio")
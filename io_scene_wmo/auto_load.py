@@ -16,6 +16,7 @@ __all__ = (
 
 MODULES_TO_IGNORE = (
     "third_party",
+    "benchmarks",
     "test",
     "developer_utils",
     "pywowlib",
@@ -0,0 +1,126 @@
+""" Benchmark of WMO portal vertex ordering.
+
+Run from Blender with the addon installed:
+    blender --background --python benchmarks/portal_vertex_sorting.py -- [addon_module_name]
+"""
+
+import sys
+import bmesh
+import importlib
+
+from math import cos, sin, pi
+from mathutils import Vector
+from timeit import timeit
+
+
+VERTEX_COUNTS = (4, 8, 16, 32, 64)
+REPEATS = 100
+
+
+def create_portal(n_vertices: int, triangulate: bool = False, concave: bool = False) -> bmesh.types.BMesh:
+    """ Create a planar portal outline, optionally with internal edges or a star-shaped concave outline """
+
+    bm = bmesh.new()
+
+    verts = []
+    for i in range(n_vertices):
+        angle = 2 * pi * i / n_vertices
+        radius = 0.5 if concave and i % 2 else 1.0
+        verts.append(bm.verts.new((radius * cos(angle), 0.0, radius * sin(angle))))
+
+    face = bm.faces.new(verts)
+
+    if triangulate:
+        bmesh.ops.triangulate(bm, faces=[face])
+
+    bm.verts.ensure_lookup_table()
+    bm.normal_update()
+
+    return bm
+
+
+def create_comb_portal(n_vertices: int) -> bmesh.types.BMesh:
+    """ Create a planar comb-shaped portal outline with n_vertices / 4 teeth. With an even number of teeth
+    the centroid lies in the middle notch, outside of the outline, so it is not star-shaped around it. """
+
+    n_teeth = n_vertices // 4
+    width = 2.0 / (2 * n_teeth - 1)
+    notch_depth = 0.2
+
+    bm = bmesh.new()
+
+    coords = [(0.0, 0.0), (2.0, 0.0)]
+
+    for i in reversed(range(n_teeth)):
+        coords.extend((((2 * i + 1) * width, 1.0), (2 * i * width, 1.0)))
+
+        if i:
+            coords.extend(((2 * i * width, notch_depth), ((2 * i - 1) * width, notch_depth)))
+
+    bm.faces.new([bm.verts.new((x, 0.0, z)) for x, z in coords])
+
+    bm.verts.ensure_lookup_table()
+    bm.normal_update()
+
+    return bm
+
+
+def is_outline_order(bm: bmesh.types.BMesh, result) -> bool:
+    """ Check that consecutive vertices of the result are the original outline neighbours """
+
+    n = len(bm.verts)
+
+    if len(result) != n:
+        return False
+
+    indices = [vtx.index for vtx in result]
+    return all((indices[(i + 1) % n] - indices[i]) % n in (1, n - 1) for i in range(n))
+
+
+def is_counter_clockwise(result, normal: Vector) -> bool:
+    """ Check that the result winds counter-clockwise around the portal normal """
+
+    area_normal = Vector((0, 0, 0))
+    for i, vtx in enumerate(result):
+        area_normal += vtx.co.cross(result[(i + 1) % len(result)].co)
+
+    return area_normal.dot(normal) > 0
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    addon_name = argv[0] if argv else 'io_scene_wmo'
+
+    wmo_scene = importlib.import_module('{}.wmo.wmo_scene'.format(addon_name))
+    sort_portal_vertices = wmo_scene.BlenderWMOScene.sort_portal_vertices
+
+    normal = Vector((0, -1, 0))
+
+    print('{:>8} {:>12} {:>14} {:>8}'.format('vertices', 'variant', 'time (us)', 'valid'))
+
+    for n_vertices in VERTEX_COUNTS:
+        variants = [('outline', lambda: create_portal(n_vertices)),
+                    ('triangulated', lambda: create_portal(n_vertices, triangulate=True)),
+                    ('concave', lambda: create_portal(n_vertices, concave=True))]
+
+        # outline walking fallback is only used for outlines angular sorting fails on
+        if n_vertices % 8 == 0:
+            variants.append(('comb', lambda: create_comb_portal(n_vertices)))
+
+        for variant, create in variants:
+
+            bm = create()
+
+            result = sort_portal_vertices(bm.verts, normal)
+            valid = is_outline_order(bm, result) and is_counter_clockwise(result, normal)
+            time = timeit(lambda: sort_portal_vertices(bm.verts, normal), number=REPEATS) / REPEATS
+
+            print('{:>8} {:>12} {:>14.2f} {:>8}'.format(n_vertices, variant, time * 1e6, str(valid)))
+
+            bm.free()
+
+            assert valid, "Invalid order of {} {} portal vertices".format(n_vertices, variant)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+""" Benchmark of the WoW viewport render engine.
+
+Draws a scene with DrawingManager into an offscreen framebuffer along a camera path, and saves per-frame CPU
+phase times, GPU pass times and counters of the frame profiler to JSON. The GPU module of Blender 2.8x is not
+available in background mode, a headless run uses a virtual display instead, Mesa software GL is fine:
+
+    LIBGL_ALWAYS_SOFTWARE=1 xvfb-run -a blender --factory-startup [scene.blend] \\
+        --python benchmarks/render_engine.py -- [options] --output result.json
+
+Without a .blend file a synthetic scene of instanced and unique M2 meshes is created. Camera paths are
+'orbit' and 'flythrough' around the scene bounds, 'camera' replays the animated scene camera over the frame range,
+and a path to a JSON list of 4x4 camera world matrices (rows) replays a recorded path.
+
+Two addon revisions are compared by running the benchmark with each of them installed, then, with any Python:
+
+    python benchmarks/render_engine.py --compare baseline.json candidate.json [--threshold 5]
+"""
+
+import sys
+import json
+import argparse
+import importlib
+
+from math import cos, sin, pi, tan, radians
+from time import perf_counter
+
+
+PROJECTION_FOV = 60.0
+PROJECTION_NEAR = 0.1
+PROJECTION_FAR = 5000.0
+
+
+def parse_args(argv):
+
+    parser = argparse.ArgumentParser(prog='render_engine.py', description='WoW render engine benchmark')
+    parser.add_argument('--addon', default='io_scene_wmo', help='module name of the installed addon')
+    parser.add_argument('--path', default='orbit', help="'orbit', 'flythrough', 'camera' or a JSON file")
+    parser.add_argument('--frames', type=int, default=240, help='frames of procedural paths')
+    parser.add_argument('--warm-up', type=int, default=10, help='frames drawn before measuring')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--sync', action='store_true', help='wait for the GPU after every frame')
+    parser.add_argument('--objects', type=int, default=1000, help='objects of the synthetic scene')
+    parser.add_argument('--meshes', type=int, default=16, help='distinct meshes of the synthetic scene')
+    parser.add_argument('--unique', type=float, default=0.1,
+                        help='fraction of synthetic objects with a mesh of their own')
+    parser.add_argument('--output', help='JSON file to save results to')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help='compare two result files instead of running the benchmark')
+    parser.add_argument('--threshold', type=float, default=0.0,
+                        help='with --compare, fail when mean frame time regresses by more percent')
+
+    return parser.parse_args(argv)
+
+
+#############################################################
+######                  Scene set-up                   ######
+#############################################################
+
+
+def create_synthetic_scene(n_objects: int, n_meshes: int, unique_fraction: float):
+    """ Grid of UV spheres sharing a few meshes and materials, some objects use a mesh of their own """
+
+    import bpy
+    import bmesh
+
+    materials = [bpy.data.materials.new('Benchmark_{}'.format(i)) for i in range(4)]
+
+    def create_mesh(name: str, segments: int):
+
+        bm = bmesh.new()
+        bm.loops.layers.uv.new('UVMap')
+        bmesh.ops.create_uvsphere(bm, u_segments=segments, v_segments=segments // 2, diameter=1.0, calc_uvs=True)
+
+        mesh = bpy.data.meshes.new(name)
+        bm.to_mesh(mesh)
+        bm.free()
+
+        mesh.uv_layers.new(name='UVMap.001')
+
+        for material in materials:
+            mesh.materials.append(material)
+
+        for poly in mesh.polygons:
+            poly.material_index = poly.index % len(materials)
+
+        return mesh
+
+    shared_meshes = [create_mesh('Benchmark_Shared_{}'.format(i), 16 + 8 * (i % 4)) for i in range(max(1, n_meshes))]
+
+    collection = bpy.context.scene.collection
+    side = max(1, int(n_objects ** 0.5))
+    n_unique = int(n_objects * unique_fraction)
+
+    for i in range(n_objects):
+        mesh = create_mesh('Benchmark_Unique_{}'.format(i), 16) if i < n_unique else shared_meshes[i % len(shared_meshes)]
+
+        obj = bpy.data.objects.new('Benchmark_{}'.format(i), mesh)
+        obj.location = (3.0 * (i % side), 3.0 * (i // side), 0.0)
+        collection.objects.link(obj)
+
+
+def get_scene_bounds():
+    """ Center and radius of mesh objects of the scene """
+
+    import bpy
+    from mathutils import Vector
+
+    points = [obj.matrix_world @ Vector(corner) for obj in bpy.context.scene.objects if obj.type == 'MESH'
+              for corner in obj.bound_box]
+
+    if not points:
+        return Vector((0.0, 0.0, 0.0)), 10.0
+
+    bb_min = Vector(map(min, *points)) if len(points) > 1 else points[0]
+    bb_max = Vector(map(max, *points)) if len(points) > 1 else points[0]
+    center = (bb_min + bb_max) / 2
+
+    return center, max((bb_max - center).length, 1.0)
+
+
+#############################################################
+######                  Camera paths                   ######
+#############################################################
+
+
+def perspective_matrix(aspect: float):
+
+    from mathutils import Matrix
+
+    f = 1.0 / tan(radians(PROJECTION_FOV) / 2)
+    near, far = PROJECTION_NEAR, PROJECTION_FAR
+
+    return Matrix(((f / aspect, 0.0, 0.0, 0.0),
+                   (0.0, f, 0.0, 0.0),
+                   (0.0, 0.0, (far + near) / (near - far), 2 * far * near / (near - far)),
+                   (0.0, 0.0, -1.0, 0.0)))
+
+
+def look_at(eye, target):
+    """ Camera world matrix looking from eye to target, with Z up """
+
+    from mathutils import Vector
+
+    direction = Vector(target) - Vector(eye)
+
+    matrix = direction.to_track_quat('-Z', 'Y').to_matrix().to_4x4()
+    matrix.translation = eye
+
+    return matrix
+
+
+def create_camera_path(path: str, n_frames: int, width: int, height: int):
+    """ Return a list of (camera world matrix, projection matrix) """
+
+    import bpy
+    from mathutils import Matrix, Vector
+
+    projection = perspective_matrix(width / height)
+
+    if path in ('orbit', 'flythrough'):
+        center, radius = get_scene_bounds()
+        frames = []
+
+        for i in range(n_frames):
+            t = i / max(1, n_frames - 1)
+
+            if path == 'orbit':
+                angle = 2 * pi * t
+                eye = center + Vector((cos(angle) * radius * 1.5, sin(angle) * radius * 1.5, radius * 0.5))
+                target = center
+            else:
+                # low pass over the scene from one corner to the opposite one
+                eye = center + Vector((-radius, -radius, radius * 0.1)) * (1 - 2 * t)
+                target = eye + Vector((1.0, 1.0, -0.1))
+
+            frames.append((look_at(eye, target), projection))
+
+        return frames
+
+    if path == 'camera':
+        scene = bpy.context.scene
+
+        if not scene.camera:
+            raise RuntimeError('Scene has no camera to replay.')
+
+        frames = []
+
+        for frame in range(scene.frame_start, scene.frame_end + 1):
+            scene.frame_set(frame)
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            camera = scene.camera.evaluated_get(depsgraph)
+
+            frames.append((camera.matrix_world.copy(),
+                           camera.calc_matrix_camera(depsgraph, x=width, y=height)))
+
+        return frames
+
+    with open(path) as f:
+        return [(Matrix(matrix), projection) for matrix in json.load(f)]
+
+
+#############################################################
+######                   Benchmark                     ######
+#############################################################
+
+
+def run_benchmark(args):
+
+    import bpy
+    import bgl
+    import gpu
+
+    if bpy.app.background:
+        raise RuntimeError('OpenGL drawing is not available in background mode, run Blender on a (virtual) display.')
+
+    import addon_utils
+    addon_utils.enable(args.addon, default_set=True)
+
+    drawing_manager = importlib.import_module('{}.render.drawing_manager'.format(args.addon))
+    render_utils = importlib.import_module('{}.render.utils'.format(args.addon))
+    wbs_kernel = importlib.import_module('{}.wbs_kernel.wbs_kernel'.format(args.addon))
+
+    if not any(obj.type == 'MESH' for obj in bpy.context.scene.objects):
+        create_synthetic_scene(args.objects, args.meshes, args.unique)
+
+    camera_path = create_camera_path(args.path, args.frames, args.width, args.height)
+
+    render_settings = bpy.context.scene.wow_render_settings
+    render_settings.frame_profiling = True
+    render_settings.frame_profiling_overlay = False
+
+    wbs_kernel.OpenGLUtils.init_glew()
+
+    offscreen = gpu.types.GPUOffScreen(args.width, args.height)
+    view = render_utils.OffscreenView(args.width, args.height, PROJECTION_NEAR, PROJECTION_FAR)
+
+    start = perf_counter()
+    draw_mgr = drawing_manager.DrawingManager(bpy.context)
+    draw_mgr.init_datablocks(bpy.context.evaluated_depsgraph_get())
+    init_time = (perf_counter() - start) * 1000
+
+    profiler = draw_mgr.profiler
+    profiler.max_samples = len(camera_path)
+
+    def draw_frame(camera_matrix, projection):
+        view.set_camera(camera_matrix, projection)
+
+        with offscreen.bind():
+            bgl.glClearColor(0.0, 0.0, 0.0, 1.0)
+            bgl.glClear(bgl.GL_COLOR_BUFFER_BIT | bgl.GL_DEPTH_BUFFER_BIT)
+            draw_mgr.draw(view, view)
+
+        if args.sync:
+            bgl.glFinish()
+
+    for i in range(args.warm_up):
+        draw_frame(*camera_path[i % len(camera_path)])
+
+    # drop warm-up samples and pending queries, profiling is enabled again by the next draw
+    bgl.glFinish()
+    profiler.configure(False)
+    profiler.reset()
+
+    counters = {}
+    wall_times = []
+
+    for camera_matrix, projection in camera_path:
+        frame_start = perf_counter()
+        draw_frame(camera_matrix, projection)
+        wall_times.append((perf_counter() - frame_start) * 1000)
+
+        for name, value in draw_mgr.get_frame_counters().items():
+            counters.setdefault(name, []).append(value)
+
+    bgl.glFinish()
+    profiler.collect_gpu_results()
+
+    results = {
+        'addon': args.addon,
+        'blender': bpy.app.version_string,
+        'renderer': bgl.glGetString(bgl.GL_RENDERER),
+        'scene': bpy.data.filepath or 'synthetic ({} objects, {} meshes)'.format(args.objects, args.meshes),
+        'path': args.path,
+        'resolution': [args.width, args.height],
+        'sync': args.sync,
+        'init_ms': init_time,
+        'summary': profiler.summary(),
+        'per_frame': {
+            'wall_ms': wall_times,
+            'cpu_ms': {name: list(stats.samples) for name, stats in profiler.cpu_stats.items()},
+            'gpu_ms': {name: list(stats.samples) for name, stats in profiler.gpu_stats.items()},
+            'counters': counters
+        }
+    }
+
+    draw_mgr.free()
+    offscreen.free()
+
+    return results
+
+
+def print_results(results):
+
+    summary = results['summary']
+
+    print('\n### WoW render engine benchmark ###')
+    print('Renderer: {}, scene: {}, path: {}, frames: {}'.format(
+        results['renderer'], results['scene'], results['path'], summary['frames']))
+    print('Initialization: {:.1f} ms'.format(results['init_ms']))
+
+    print('{:>20} {:>10} {:>10} {:>10} {:>10}'.format('phase', 'mean ms', 'p50 ms', 'p95 ms', 'max ms'))
+
+    for title in ('cpu_ms', 'gpu_ms'):
+        for name, stats in summary[title].items():
+            print('{:>20} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                '{} {}'.format(title[:3], name), stats['mean'], stats['p50'], stats['p95'], stats['max']))
+
+    for name, value in summary['counters_mean'].items():
+        print('{:>20} {:>10.1f}'.format(name, value))
+
+
+#############################################################
+######                   Comparison                    ######
+#############################################################
+
+
+def compare_results(baseline_path: str, candidate_path: str, threshold: float) -> int:
+    """ Print mean and p95 differences of two result files, return 1 if mean frame time regressed over threshold """
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)['summary']
+
+    with open(candidate_path) as f:
+        candidate = json.load(f)['summary']
+
+    def change(old: float, new: float) -> str:
+        return '{:+.1f}%'.format((new - old) / old * 100) if old else 'n/a'
+
+    print('{:>20} {:>12} {:>12} {:>9} {:>12} {:>12} {:>9}'.format(
+        'phase', 'base mean', 'cand mean', 'change', 'base p95', 'cand p95', 'change'))
+
+    for title in ('cpu_ms', 'gpu_ms'):
+        for name in sorted(set(baseline[title]) | set(candidate[title])):
+            old = baseline[title].get(name)
+            new = candidate[title].get(name)
+
+            if not old or not new:
+                print('{:>20} {:>12}'.format('{} {}'.format(title[:3], name), 'missing'))
+                continue
+
+            print('{:>20} {:>12.3f} {:>12.3f} {:>9} {:>12.3f} {:>12.3f} {:>9}'.format(
+                '{} {}'.format(title[:3], name), old['mean'], new['mean'], change(old['mean'], new['mean']),
+                old['p95'], new['p95'], change(old['p95'], new['p95'])))
+
+    for name in sorted(set(baseline['counters_mean']) | set(candidate['counters_mean'])):
+        old = baseline['counters_mean'].get(name, 0.0)
+        new = candidate['counters_mean'].get(name, 0.0)
+
+        print('{:>20} {:>12.1f} {:>12.1f} {:>9}'.format(name, old, new, change(old, new)))
+
+    old_frame = baseline['cpu_ms'].get('frame', {}).get('mean', 0.0)
+    new_frame = candidate['cpu_ms'].get('frame', {}).get('mean', 0.0)
+
+    if threshold and old_frame and (new_frame - old_frame) / old_frame * 100 > threshold:
+        print('\nMean frame time regressed by more than {:.1f}%.'.format(threshold))
+        return 1
+
+    return 0
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+
+    if args.compare:
+        sys.exit(compare_results(*args.compare, args.threshold))
+
+    import bpy
+
+    try:
+        results = run_benchmark(args)
+        print_results(results)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+
+            print('\nResults saved to \"{}\".'.format(args.output))
+
+    finally:
+        bpy.ops.wm.quit_blender()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ import os
 from ..utils.misc import load_game_data
 from .m2_scene import BlenderM2Scene
 from ..pywowlib.m2_file import M2File, M2Versions
+from ..pywowlib.file_formats.skin_format import M2SkinProfile
 from ..ui import get_addon_prefs
 
 
@@ -49,10 +50,11 @@ def import_m2(version, filepath, is_local_file=False):
 
         # extract skins and everything else
         skin_filepaths = game_data.extract_files(extract_dir, dependencies.skins, 'skin')
+        lod_skin_filepaths = []
 
         if version >= M2Versions.WOD:
             game_data.extract_files(extract_dir, dependencies.bones, 'bone', True)
-            game_data.extract_files(extract_dir, dependencies.lod_skins, 'skin', True)
+            lod_skin_filepaths = game_data.extract_files(extract_dir, dependencies.lod_skins, 'skin', True)
 
     else:
         raise NotImplementedError('Error: Importing without gamedata loaded is not yet implemented.')
@@ -60,6 +62,13 @@ def import_m2(version, filepath, is_local_file=False):
     m2_file.read_additional_files(skin_filepaths, anim_filepaths)
     m2_file.root.assign_bone_names()
 
+    # lowest detail levels, only used by the viewport render engine
+    lod_skins = []
+    for lod_skin_path in filter(None, lod_skin_filepaths):
+        if os.path.isfile(lod_skin_path):
+            with open(lod_skin_path, 'rb') as f:
+                lod_skins.append(M2SkinProfile().read(f))
+
     print("\n\n### Importing M2 model ###")
 
     bl_m2 = BlenderM2Scene(m2_file, addon_preferences)
@@ -69,7 +78,7 @@ def import_m2(version, filepath, is_local_file=False):
     bl_m2.load_colors()
     bl_m2.load_transparency()
     bl_m2.load_materials()
-    bl_m2.load_geosets()
+    bl_m2.load_geosets(lod_skins)
     bl_m2.load_texture_transforms()
     bl_m2.load_collision()
     bl_m2.load_attachments()
@@ -696,7 +696,7 @@ class BlenderM2Scene:
                                             'pose.bones.["{}"].scale'.format(bl_bone.name),
                                             bone.scale)
 
-    def load_geosets(self):
+    def load_geosets(self, lod_skins=()):
 
         if not len(self.m2.root.vertices):
             print("\nNo mesh geometry found to import.")
@@ -707,6 +707,9 @@ class BlenderM2Scene:
 
         skin = self.m2.skins[0]
 
+        # lower detail levels: remaining skin profiles followed by LOD skins of WoD+ models
+        lod_skins = self.m2.skins[1:] + list(lod_skins)
+
         for smesh_i, smesh in enumerate(skin.submeshes):
 
             vertices = [self.m2.root.vertices[skin.vertex_indices[i]].pos
@@ -755,6 +758,8 @@ class BlenderM2Scene:
             for i, poly in enumerate(mesh.polygons):
                 poly.material_index = 0  # TODO: excuse me wtf?
 
+            self._bl_store_lod_triangles(mesh, skin, smesh_i, lod_skins)
+
             # get object name
             name = M2SkinMeshPartID.get_mesh_part_name(smesh.skin_section_id)
             obj = bpy.data.objects.new(name if name else 'Geoset', mesh)
@@ -793,6 +798,35 @@ class BlenderM2Scene:
 
             self.geosets.append(obj)
 
+    @staticmethod
+    def _bl_store_lod_triangles(mesh: bpy.types.Mesh, skin, smesh_i: int, lod_skins):
+        """ Store triangles of the submesh in lower detail skins as vertex index triplets of its Blender mesh,
+        used by the viewport render engine to draw distant objects """
+
+        smesh = skin.submeshes[smesh_i]
+        vertex_map = {skin.vertex_indices[i]: i - smesh.vertex_start
+                      for i in range(smesh.vertex_start, smesh.vertex_start + smesh.vertex_count)}
+
+        # submeshes of the same mesh part are matched by their order
+        n_preceding = sum(1 for other in skin.submeshes[:smesh_i] if other.skin_section_id == smesh.skin_section_id)
+
+        for lod, lod_skin in enumerate(lod_skins, start=1):
+            lod_smeshes = [other for other in lod_skin.submeshes if other.skin_section_id == smesh.skin_section_id]
+            triangles = []
+
+            # mesh parts missing in a level are not drawn at it
+            if n_preceding < len(lod_smeshes):
+                lod_smesh = lod_smeshes[n_preceding]
+
+                for i in range(lod_smesh.index_start, lod_smesh.index_start + lod_smesh.index_count, 3):
+                    triangle = [vertex_map.get(lod_skin.vertex_indices[lod_skin.triangle_indices[i + j]])
+                                for j in range(3)]
+
+                    if None not in triangle:
+                        triangles.extend(triangle)
+
+            mesh['wow_m2_lod{}'.format(lod)] = triangles
+
     def load_texture_transforms(self):
 
         def bl_convert_trans_track(value=None):
@@ -1,11 +1,13 @@
 import bpy
 from bpy.app.handlers import persistent
 from .drivers import register as register_m2_driver_utils
+from ...utils.profiling import profile_handler
 
 __reload_order_index__ = 0
 
 
 @persistent
+@profile_handler()
 def live_update_materials(dummy):
     try:
         anim = bpy.context.scene.wow_m2_animations[bpy.context.scene.wow_m2_cur_anim_index]
@@ -3,7 +3,7 @@ import gpu
 
 import mathutils
 
-from typing import Union
+from typing import Tuple, Union
 from bgl import *
 
 from .drawing_elements import ElementTypes
@@ -25,14 +25,8 @@ class DrawingBatch:
     # uniform data
     draw_material: Union['M2DrawingMaterial', 'WMODrawingMaterial', None]
 
-    # texture slots
-
-    gl_texture_slots = (
-        GL_TEXTURE0,
-        GL_TEXTURE1,
-        GL_TEXTURE2,
-        GL_TEXTURE3
-    )
+    # detail level picked for the current frame, 0 is the full geometry
+    lod: int = 0
 
     def __init__(self
                  , c_batch: Union['CM2DrawingBatch', 'CWMODrawingBatch']
@@ -48,8 +42,8 @@ class DrawingBatch:
         self.mat_id = self.c_batch.get_mat_id()
 
         try:
-            self.draw_material = self.draw_obj.draw_mgr.draw_materials.get(
-                self.draw_obj.bl_obj.data.materials[self.mat_id].name)
+            self.draw_material = self.draw_obj.draw_mgr.get_draw_material(
+                self.draw_obj.bl_obj.data.materials[self.mat_id])
 
         except IndexError:
             self.draw_material = None
@@ -84,18 +78,44 @@ class DrawingBatch:
     def sort_radius(self) -> float:
         return self.c_batch.sort_radius
 
+    @property
+    def n_lods(self) -> int:
+        """ Number of lower detail levels the batch can be drawn with """
+        return 0
+
+    @property
+    def n_triangles(self) -> int:
+        """ Triangles drawn per instance at the current detail level, used for statistics """
+        return 0
+
+    @property
+    def instance_key(self):
+        """ Batches with the same key share GPU geometry and material, and can be drawn in one instanced call """
+        return None
+
+    @property
+    def texture_key(self) -> Tuple[str, ...]:
+        """ Names of bound textures, used to group batches sharing them """
+
+        if not self.draw_material:
+            return ()
+
+        return tuple(texture.name if texture else '' for texture in map(self.draw_material.get_texture, range(4)))
+
     @property
     def sort_distance(self):
+        return self.get_sort_distance(self.draw_obj.draw_mgr.region_3d.perspective_matrix.to_translation())
+
+    def get_sort_distance(self, view_position: mathutils.Vector) -> float:
 
-        perspective_mat = self.draw_obj.draw_mgr.region_3d.perspective_matrix
         bb_center = self.draw_obj.bl_obj.matrix_world @ self.bb_center
 
-        value = (perspective_mat.to_translation() - bb_center).length
+        value = (view_position - bb_center).length
 
         if self.draw_material.is_inverted or self.draw_material.is_transformed:
             result_point = bb_center * (1.0 / value) if value > 0.00000023841858 else bb_center
 
-            sort_dist = perspective_mat.to_translation().length * self.sort_radius
+            sort_dist = view_position.length * self.sort_radius
 
             result_point *= sort_dist
 
@@ -104,12 +124,32 @@ class DrawingBatch:
 
         return value
 
+    def get_world_bounding_sphere(self) -> Tuple[float, float, float, float]:
+
+        bl_obj = self.draw_obj.bl_obj
+
+        if not bl_obj:
+            return 0.0, 0.0, 0.0, 0.0
+
+        # skybox is always drawn
+        if self.is_skybox:
+            return 0.0, 0.0, 0.0, float('inf')
+
+        matrix_world = bl_obj.matrix_world
+        radius = self.sort_radius * max(abs(scale) for scale in matrix_world.to_scale())
+
+        return (*(matrix_world @ self.bb_center), radius)
+
     def create_vao(self):
-        self.shader = self.determine_valid_shader()
-        self.c_batch.set_program(self.shader.program)
+        self.update_state()
         self.c_batch.create_vao()
         glCheckError('Create VAO')
 
+    def update_state(self):
+        """ Cache shader of the batch, needs to be called when its material changes """
+        self.shader = self.determine_valid_shader()
+        self.c_batch.set_program(self.shader.program)
+
     def ensure_context(self):
         mat_test = self.draw_material.bl_material
 
@@ -120,12 +160,11 @@ class DrawingBatch:
 
     def _set_active_textures(self):
 
-        for i, gl_slot in enumerate(self.gl_texture_slots):
-            bind_code = self.draw_material.get_bindcode(i)
+        state = self.draw_obj.draw_mgr.render_state
+        textures = self.draw_obj.draw_mgr.textures
 
-            if bind_code:
-                glActiveTexture(gl_slot)
-                glBindTexture(GL_TEXTURE_2D, bind_code)
+        for i in range(len(state.texture_slots)):
+            state.bind_texture(i, textures.get_bindcode(self.draw_material.get_texture(i)))
 
     def determine_valid_shader(self) -> gpu.types.GPUShader:
         raise NotImplementedError()
@@ -136,7 +175,7 @@ class DrawingBatch:
 
         bl_obj = self.draw_obj.bl_obj
 
-        if not bl_obj.visible_get():
+        if not self.draw_obj.draw_mgr.is_object_visible(bl_obj):
             return
 
         if self.tag_free:
@@ -151,27 +190,20 @@ class DrawingBatch:
 
         glCheckError('drawfallback pre')
 
-        self.shader = self.determine_valid_shader()
-        self.shader.bind()
-        self.c_batch.set_program(self.shader.program)
+        state = self.draw_obj.draw_mgr.render_state
+        state.count_batch(0, 2, 1, self.n_triangles)
 
-        self.shader.uniform_float('uViewProjectionMatrix', self.draw_obj.draw_mgr.region_3d.perspective_matrix)
+        state.use_shader(self.shader)
+        state.set_placement(self.draw_obj.bl_obj)
+        state.set_uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, 1.0 / 255.0))
+        state.set_uniform_int('UnFogged_IsAffectedByLight_LightCount', (False, True, 0))
 
-        self.shader.uniform_float('uPlacementMatrix', self.draw_obj.bl_obj.matrix_world)
-        self.shader.uniform_float('uSunDirAndFogStart', self.draw_obj.draw_mgr.sun_dir_and_fog_start)
-        self.shader.uniform_float('uSunColorAndFogEnd', self.draw_obj.draw_mgr.sun_color_and_fog_end)
-        self.shader.uniform_float('uAmbientLight', self.draw_obj.draw_mgr.ambient_light)
-        self.shader.uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, 1.0 / 255.0))
-        self.shader.uniform_int('UnFogged_IsAffectedByLight_LightCount', (False, True, 0))
-
-        glEnable(GL_DEPTH_TEST)
+        state.set_capability(GL_DEPTH_TEST, True)
+        state.set_capability(GL_CULL_FACE, False)
+        state.set_capability(GL_BLEND, False)
 
         self.c_batch.draw()
 
-        glDisable(GL_DEPTH_TEST)
-
-        gpu.shader.unbind()
-
         glCheckError('draw fallback post')
 
     def draw_batch(self):
@@ -1,9 +1,27 @@
 import traceback
+import numpy as np
 
 from enum import IntEnum
-from copy import copy
-from typing import List
-from functools import cmp_to_key, partial
+from typing import AbstractSet, Dict, List, Optional, Tuple
+
+from mathutils import Matrix, Vector
+
+from .m2.shaders import EGxBLend
+from .render_state import DEPTH_RANGE_SCENE
+
+try:
+    from ..wbs_kernel.wbs_kernel import CHiZCuller
+
+# prebuilt kernel predating occlusion culling, which is then disabled
+except ImportError:
+    CHiZCuller = None
+
+try:
+    from ..wbs_kernel.wbs_kernel import CFrustum as Frustum
+
+# prebuilt kernel predating frustum culling
+except ImportError:
+    from .frustum import Frustum
 
 
 class ElementTypes(IntEnum):
@@ -16,120 +34,367 @@ class ElementTypes(IntEnum):
 
 
 class DrawingElements:
-
-    def __init__(self):
+    """ Collection of drawing batches ordered for submission.
+    Opaque order only depends on batch and material properties and is cached until those change,
+    transparent batches are additionally sorted back to front and are re-sorted on view changes only.
+    Batches with world bounding spheres outside of the view frustum are skipped, batches having lower detail levels
+    can be drawn with one picked from their projected size.
+    With occlusion culling, opaque WMO group batches are drawn first and their depth is captured to a hierarchical-Z
+    pyramid, other batches are skipped if hidden behind the pyramid read back from a previous frame.
+    Adjacent visible batches sharing an instance key and detail level are submitted as one instanced draw call. """
+
+    def __init__(self, profiler: 'FrameProfiler'):
         self.batches: List['M2DrawingBatch'] = []
+        self.profiler = profiler
+
+        self.opaque_order: List['M2DrawingBatch'] = []
+        self.transparent_order: List['M2DrawingBatch'] = []
+        self.draw_order: List['M2DrawingBatch'] = []
+        self.view_matrix: Optional[Matrix] = None
+
+        # (x, y, z, radius) rows and visibility mask matching draw order
+        self.frustum = Frustum()
+        self.bounding_spheres = np.zeros((0, 4), dtype=np.float32)
+        self.visibility = np.zeros(0, dtype=np.uint8)
+
+        # batch id: whether it occludes and whether it can be occluded, masks of those matching draw order,
+        # and the view depth was last captured with
+        self.hiz = CHiZCuller() if CHiZCuller else None
+        self.occlusion_roles: Dict[int, Tuple[bool, bool]] = {}
+        self.occluders = np.zeros(0, dtype=np.uint8)
+        self.occludees = np.zeros(0, dtype=np.uint8)
+        self.capture_view_matrix: Optional[Matrix] = None
+
+        self.is_order_valid = False
+        self.is_transparent_order_valid = False
+        self.is_bounds_valid = False
+        self.is_instance_data_valid = False
+        self.is_occlusion_data_valid = False
+        self.is_occlusion_masks_valid = False
+
+        # statistics of the last drawn frame
+        self.n_submitted = 0
+        self.n_culled = 0
+        self.n_portal_culled = 0
+        self.n_draw_calls = 0
+        self.n_lod_reduced = 0
+        self.n_occluded = 0
 
     def add_batch(self, batch):
         self.batches.append(batch)
+        self.invalidate()
 
     def remove_batch(self, batch):
         self.batches.remove(batch)
+        self.invalidate()
+
+    def invalidate(self):
+        """ Request a full re-sort, needs to be called when batches or their materials change """
+        self.is_order_valid = False
+        self.is_transparent_order_valid = False
+        self.is_bounds_valid = False
+        self.is_instance_data_valid = False
+        self.is_occlusion_data_valid = False
+
+    def invalidate_transforms(self):
+        """ Request re-sorting of transparent batches and bounds update, needs to be called when objects are transformed """
+        self.is_transparent_order_valid = False
+        self.is_bounds_valid = False
+        self.is_instance_data_valid = False
+        self.is_occlusion_data_valid = False
+
+    def invalidate_instances(self):
+        """ Request update of per-instance data, needs to be called when object properties change """
+        self.is_instance_data_valid = False
+        self.is_occlusion_data_valid = False
 
-    def draw(self):
-        batches = copy(self.batches)
+    @staticmethod
+    def get_opaque_sort_key(batch) -> Tuple:
 
-        try:
-            sorted_indices = sorted(list(range(len(self.batches))), key=cmp_to_key(partial(self.sort_elements, self)))
-        except IndexError:
-            print('Skipping frame! Iterator invalidated!')
-            self.draw()
-            #traceback.print_exc()
-            return
+        # batches without material are drawn first
+        if not batch.draw_material:
+            return 0,
 
-        #print("Began drawing")
-        for batch_index in sorted_indices:
-            batch = batches[batch_index]
+        # batches sharing shader and textures are submitted together to minimize state changes,
+        # batches sharing geometry are kept adjacent to be drawn instanced
+        return (1, batch.mesh_type, -batch.is_skybox, batch.draw_material.blend_mode.index,
+                batch.shader.program, batch.texture_key, id(batch.c_batch))
 
-            if batch.tag_free:
-                continue
+    @staticmethod
+    def get_transparent_sort_key(batch, view_position: Vector) -> Tuple:
 
-            try:
-                batch.draw()
-                #print(batch.draw_obj.bl_obj_name, batch.sort_distance)
-            except:
-                batch.free()
-                print('Debug: Freeing batch from DrawingElements!')
-                traceback.print_exc()
-                self.draw()
+        mesh_type = batch.mesh_type
+
+        if mesh_type == ElementTypes.M2Mesh:
+            return (mesh_type, -batch.is_skybox, batch.priority_plane, -batch.get_sort_distance(view_position),
+                    -batch.layer, batch.draw_material.blend_mode.index)
+
+        if mesh_type == ElementTypes.ParticleMesh:
+            return (mesh_type, -batch.is_skybox, batch.priority_plane, -batch.get_sort_distance(view_position),
+                    batch.draw_material.blend_mode.index)
+
+        return mesh_type, -batch.is_skybox, batch.draw_material.blend_mode.index
+
+    @staticmethod
+    def get_occlusion_roles(batch) -> Tuple[bool, bool]:
+        """ Return whether a batch occludes others and whether it can be occluded. Only opaque WMO group geometry
+        occludes, alpha tested and transparent surfaces have holes. Skyboxes are drawn behind the scene depth range. """
+
+        bl_obj = batch.draw_obj.bl_obj
+
+        if batch.tag_free or not bl_obj or batch.is_skybox:
+            return False, False
+
+        if bl_obj.wow_wmo_group.enabled:
+            return (batch.draw_material is not None and not batch.is_transparent
+                    and batch.draw_material.blend_mode.index == EGxBLend.Opaque.index), False
+
+        return False, True
+
+    def update_occlusion_data(self):
+
+        # the scene has changed, so depth captured before may hide batches that are visible now
+        self.occlusion_roles.clear()
+        self.hiz.invalidate()
+        self.capture_view_matrix = None
+
+        self.is_occlusion_data_valid = True
+        self.is_occlusion_masks_valid = False
+
+    def update_occlusion_masks(self):
+
+        roles = []
+
+        for batch in self.draw_order:
+            role = self.occlusion_roles.get(id(batch))
+
+            if role is None:
+                role = self.occlusion_roles[id(batch)] = self.get_occlusion_roles(batch)
+
+            roles.append(role)
+
+        self.occluders = np.array([role[0] for role in roles], dtype=np.uint8)
+        self.occludees = np.array([role[1] for role in roles], dtype=np.uint8)
+        self.is_occlusion_masks_valid = True
+
+    @property
+    def is_occlusion_pending(self) -> bool:
+        """ Depth captured for occlusion culling has not been read back yet, so another frame culls more precisely """
+        return self.hiz is not None and self.hiz.is_pending
+
+    def update_bounds(self):
+
+        # accessing deleted objects frees their batches
+        for batch in list(self.batches):
+            batch.bounding_sphere = batch.get_world_bounding_sphere()
+
+    def update_instance_data(self):
+
+        # accessing deleted objects frees their batches
+        for draw_obj in {batch.draw_obj for batch in self.batches if batch.instance_key is not None}:
+            draw_obj.update_instance_data()
+
+        self.is_instance_data_valid = True
 
     @staticmethod
-    def sort_elements(self, a, b):
+    def group_instances(batches: List['M2DrawingBatch']) -> List[List['M2DrawingBatch']]:
+        """ Split batches in draw order into runs that can be drawn with a single call """
 
-        batch_a = self.batches[a]
-        batch_b = self.batches[b]
+        runs = []
+        run_key = None
 
-        #print("Comparing:", batch_a.draw_obj.bl_obj_name, batch_b.draw_obj.bl_obj_name)
+        for batch in batches:
+            key = batch.instance_key
 
-        if not batch_a.draw_material:
-            return -1
+            if key is not None and key is run_key and batch.is_skybox == runs[-1][0].is_skybox \
+                    and batch.lod == runs[-1][0].lod:
+                runs[-1].append(batch)
+            else:
+                runs.append([batch])
+                run_key = key
 
-        if not batch_b.draw_material:
-            return 1
+        return runs
 
-        if batch_a.is_transparent > batch_b.is_transparent:
-            return 1
+    def select_lods(self, view_matrix: Matrix, lod_screen_size: float) -> np.ndarray:
+        """ Pick a detail level for each batch in draw order. Level 1 is used below the given projected size
+        of the bounding sphere, as a fraction of viewport height, and each further level below half of the previous. """
 
-        if batch_a.is_transparent < batch_b.is_transparent:
-            return -1
+        n_lods = np.array([batch.n_lods for batch in self.draw_order], dtype=np.int32)
 
-        if batch_a.mesh_type > batch_b.mesh_type:
-            return 1
+        if not lod_screen_size or not n_lods.any():
+            return np.zeros(len(self.draw_order), dtype=np.int32)
 
-        if batch_a.mesh_type < batch_b.mesh_type:
-            return -1
+        # clip w is the view depth for perspective and 1 for orthographic views, the y row of the view projection
+        # matrix is the view y axis scaled by the projection
+        w_row = np.array(view_matrix[3], dtype=np.float32)
+        scale = Vector(view_matrix[1][:3]).length
 
-        if batch_a.is_skybox > batch_b.is_skybox:
-            return -1
+        depth = np.maximum(self.bounding_spheres[:, :3] @ w_row[:3] + w_row[3], 1e-6)
+        screen_size = self.bounding_spheres[:, 3] * scale / depth
 
-        if batch_a.is_skybox < batch_b.is_skybox:
-            return 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lods = np.floor(np.log2(lod_screen_size / screen_size)) + 1
 
-        if batch_a.mesh_type == ElementTypes.M2Mesh and batch_a.is_transparent and batch_b.is_transparent:
-            if batch_a.priority_plane != batch_b.priority_plane:
-                return -1 if batch_b.priority_plane > batch_a.priority_plane else 1
+        return np.clip(np.nan_to_num(lods, nan=0.0, neginf=0.0), 0, n_lods).astype(np.int32)
 
-            if batch_a.sort_distance > batch_b.sort_distance:
-                return -1
+    def update_draw_order(self, view_matrix: Matrix):
+        """ Sort batches if needed, return True if draw order has changed """
 
-            if batch_a.sort_distance < batch_b.sort_distance:
-                return 1
+        if self.is_order_valid and self.is_transparent_order_valid and self.view_matrix == view_matrix:
+            return False
 
-            if batch_b.layer != batch_a.layer:
-                return -1 if batch_b.layer < batch_a.layer else 1
+        if not self.is_order_valid:
+            opaque = []
+            transparent = []
 
-        if batch_a.mesh_type == ElementTypes.ParticleMesh and batch_b.mesh_type == ElementTypes.ParticleMesh:
-            if batch_a.priority_plane != batch_b.priority_plane:
-                return -1 if batch_b.priority_plane > batch_a.priority_plane else 1
+            for batch in self.batches:
+                batch.update_state()
 
-            if batch_a.sort_distance > batch_b.sort_distance:
-                return -1
-            if batch_a.sort_distance < batch_b.sort_distance:
-                return 1
+                if batch.draw_material and batch.is_transparent:
+                    transparent.append(batch)
+                else:
+                    opaque.append(batch)
 
-        if batch_a.draw_material.blend_mode.index != batch_b.draw_material.blend_mode.index:
-            return -1 if batch_a.draw_material.blend_mode.index < batch_b.draw_material.blend_mode.index else 1
+            # sort keys are evaluated once per batch, sorting is stable so batch creation order breaks ties
+            keys = [self.get_opaque_sort_key(batch) for batch in opaque]
+            self.opaque_order = [opaque[i] for i in sorted(range(len(opaque)), key=keys.__getitem__)]
+            self.transparent_order = transparent
 
-        '''
-        min_tex_count = min(batch_a.texture_count, batch_b.texture_count)
-        for i in range(min_tex_count):
-            if batch_a.m_texture[i] != batch_b.m_texture[i]:
-                return batch_a.m_texture[i] < batch_b.m_texture[i]
+            self.is_order_valid = True
 
-        if batch_a.texture_count != batch_b.texture_count:
-            return batch_a.texture_count < batch_b.texture_count
+        if not self.is_transparent_order_valid or self.view_matrix != view_matrix:
+            view_position = view_matrix.to_translation()
 
-        '''
+            keys = [self.get_transparent_sort_key(batch, view_position) for batch in self.transparent_order]
+            self.transparent_order = [self.transparent_order[i]
+                                      for i in sorted(range(len(keys)), key=keys.__getitem__)]
 
-        """
-        if batch_a.m_start != batch_b.m_start:
-            return batch_a.m_start < batch_b.m_start
+            self.view_matrix = view_matrix.copy()
+            self.is_transparent_order_valid = True
 
-        if batch_a.m_end != batch_b.m_end:
-            return batch_a.m_end < batch_b.m_end
+        self.draw_order = self.opaque_order + self.transparent_order
 
-        """
+        return True
+
+    def draw(self, view_matrix: Matrix, frustum_culling: bool = True, hidden_objects: AbstractSet[str] = frozenset(),
+             lod_screen_size: float = 0.0, occlusion_culling: bool = False, viewport_size: Tuple[int, int] = (0, 0)):
+
+        profiler = self.profiler
+        occlusion_culling = occlusion_culling and self.hiz is not None
+
+        with profiler.cpu_phase('sort'):
+            is_bounds_outdated = not self.is_bounds_valid
+
+            if is_bounds_outdated:
+                self.update_bounds()
+
+            if self.update_draw_order(view_matrix) or is_bounds_outdated:
+                self.bounding_spheres = np.array([batch.bounding_sphere for batch in self.draw_order],
+                                                 dtype=np.float32).reshape(-1, 4)
+                self.visibility = np.ones(len(self.draw_order), dtype=np.uint8)
+                self.is_bounds_valid = True
+                self.is_occlusion_masks_valid = False
+
+            if not self.is_instance_data_valid:
+                self.update_instance_data()
+
+            if occlusion_culling:
+                if not self.is_occlusion_data_valid:
+                    self.update_occlusion_data()
+
+                if not self.is_occlusion_masks_valid:
+                    self.update_occlusion_masks()
+
+        with profiler.cpu_phase('cull'):
+            if frustum_culling:
+                self.frustum.update(view_matrix)
+                n_visible = self.frustum.cull_spheres(self.bounding_spheres, self.visibility)
+            else:
+                self.visibility.fill(1)
+                n_visible = len(self.draw_order)
+
+            self.n_culled = len(self.draw_order) - n_visible
+            self.n_occluded = 0
+
+            if occlusion_culling:
+                self.n_occluded = self.hiz.cull_spheres(self.bounding_spheres, self.occludees, self.visibility)
+
+            self.n_portal_culled = 0
+            self.n_lod_reduced = 0
+
+            lods = self.select_lods(view_matrix, lod_screen_size)
+
+            visible_batches = []
+            visible_occluders = []
+
+            occluders = self.occluders if occlusion_culling else np.zeros(len(self.draw_order), dtype=np.uint8)
+
+            # batches freed during drawing only invalidate the order, so cached lists are safe to iterate
+            for batch, is_visible, lod, is_occluder in zip(self.draw_order, self.visibility, lods, occluders):
+
+                if batch.tag_free or not is_visible:
+                    continue
+
+                if batch.draw_obj.bl_obj_name in hidden_objects:
+                    self.n_portal_culled += 1
+                    continue
+
+                batch.lod = int(lod)
+                self.n_lod_reduced += batch.lod > 0
+
+                if is_occluder:
+                    visible_occluders.append(batch)
+                else:
+                    visible_batches.append(batch)
+
+        self.n_submitted = len(visible_occluders) + len(visible_batches)
+        self.n_draw_calls = 0
+
+        with profiler.cpu_phase('submit'):
+            self.submit(visible_occluders)
+
+        if occlusion_culling:
+            with profiler.cpu_phase('occlusion'):
+                self.capture_occluders(view_matrix, viewport_size, bool(visible_occluders))
+
+        with profiler.cpu_phase('submit'):
+            self.submit(visible_batches)
+
+    def submit(self, batches: List['M2DrawingBatch']):
+
+        for run in self.group_instances(batches):
+
+            self.n_draw_calls += 1
+
+            try:
+                if len(run) > 1:
+                    run[0].draw_instances(run)
+                else:
+                    run[0].draw()
+            except:
+                for batch in run:
+                    batch.free()
+
+                print('Debug: Freeing batch from DrawingElements!')
+                traceback.print_exc()
+
+    def capture_occluders(self, view_matrix: Matrix, viewport_size: Tuple[int, int], has_occluders: bool):
+        """ Capture the depth of drawn occluders to be read back for culling later frames. Depth only changes with
+        the view or the scene, so it is captured once per change. """
+
+        if not has_occluders:
+            self.hiz.invalidate()
+            self.capture_view_matrix = None
+            return
+
+        if self.capture_view_matrix == view_matrix:
+            return
 
-        return 1 if a > b else -1
+        if self.hiz.capture(*viewport_size, view_matrix, *DEPTH_RANGE_SCENE):
+            self.capture_view_matrix = view_matrix.copy()
 
+    def free(self):
+        """ Free the depth pyramid, needs a GL context """
 
+        if self.hiz is not None:
+            self.hiz.free()
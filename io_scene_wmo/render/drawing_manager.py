@@ -2,18 +2,23 @@ import bpy
 import gpu
 import traceback
 
-from typing import List, Tuple, Dict, Union
+from typing import List, Tuple, Dict, Set, Union, Optional
 from mathutils import Vector
 
 from .m2.shaders import M2ShaderPermutations
+from .m2.drawing_mesh import M2DrawingMesh
 from .m2.drawing_object import M2DrawingObject
 from .m2.drawing_material import M2DrawingMaterial
 from .drawing_elements import DrawingElements
+from .portal_culling import PortalCuller
+from .render_state import RenderState
+from .texture_residency import TextureResidencyManager
+from .object_residency import ObjectResidencyManager
+from .frame_profiler import FrameProfiler
+from .shaders import SceneUniformBuffer
 from .utils import render_debug
 from .bgl_ext import glCheckError
 
-from profilehooks import profile
-
 from bgl import *
 
 
@@ -24,34 +29,56 @@ class DrawingManager:
     ambient_light: Tuple[float, float, float]
     fog_color: Tuple[float, float, float]
 
-    def __init__(self, context):
+    def __init__(self, context, is_final_render: bool = False):
         glCheckError("draw mgr init pre")
         self.context: bpy.types.Context = context
+
+        # final renders leave out overlays, do not schedule viewport redraws and test object visibility for rendering
+        self.is_final_render = is_final_render
+
         self.shaders = M2ShaderPermutations()
         self.m2_objects: Dict[str, M2DrawingObject] = {}
+        self.m2_meshes: Dict[str, M2DrawingMesh] = {}
+        self.updated_meshes: Set[str] = set()
+        self.pending_meshes: Dict[str, M2DrawingMesh] = {}
         self.draw_materials: Dict[str, M2DrawingMaterial] = {}
-        self.draw_elements = DrawingElements()
+
+        # drawing objects and materials keep references to their datablocks while this is unchanged, any depsgraph
+        # update increments it as datablocks may have been renamed, removed or reallocated by undo
+        self.datablock_generation = 0
+
+        # original object address: name of its drawing object, used to follow renames
+        self.object_names: Dict[int, str] = {}
+
+        self.profiler = FrameProfiler()
+        self.draw_elements = DrawingElements(self.profiler)
+        self.portal_culler = PortalCuller()
+        self.render_state = RenderState()
+        self.textures = TextureResidencyManager()
+        self.residency = ObjectResidencyManager()
+        self.scene_uniforms: Union[SceneUniformBuffer, None] = None
         self.update_handlers = {'MESH': self._m2_handle_mesh_update}
         self.is_dirty = True
 
         self.editable_context = context.scene.wow_scene.type
 
-        # get active viewport
-        self.region_3d: bpy.types.SpaceView3D = bpy.context.space_data.region_3d
+        # get active viewport, drawing without one (offscreen) provides the view to draw()
+        space_data = bpy.context.space_data
+        self.region_3d: bpy.types.RegionView3D = space_data.region_3d if space_data else None
         self.region: bpy.types.Region = self._get_active_region()
 
-        '''
-        # depth pass
-        self.depth_tex_id_buf = Buffer(GL_INT, 1)
-        glGenTextures(1, self.depth_tex_id_buf)
-        self.depth_tex_bindcode = self.depth_tex_id_buf.to_list()[0]
-        self.depth_buf = Buffer(GL_FLOAT, self.region.width * self.region.height)
-        
-        '''
-
         # uniform data
         self._update_global_uniforms()
 
+        # compile shader permutations ahead of first use to avoid stalls when new materials are drawn,
+        # final renders compile what they draw as they run outside of the main thread
+        shader_warm_up = context.scene.wow_render_settings.shader_warm_up if not is_final_render else 'NONE'
+
+        if shader_warm_up == 'SCENE':
+            self.shaders.warm_up(self.shaders.get_scene_permutations())
+        elif shader_warm_up == 'ALL':
+            self.shaders.warm_up(self.shaders.get_all_permutations())
+
         glCheckError("draw mgr init post")
         render_debug('Instantiated drawing manager.')
 
@@ -64,144 +91,313 @@ class DrawingManager:
         self.ambient_light = self.context.scene.wow_render_settings.ext_ambient_color
         self.fog_color = self.context.scene.wow_render_settings.fog_color
 
-    @profile
     def update_render_data(self, depsgraph: bpy.types.Depsgraph):
 
         glCheckError("update render data pre")
 
+        self.updated_meshes.clear()
+        self.datablock_generation += 1
+
         try:
+            with self.profiler.cpu_phase('update'):
+                self._process_depsgraph_updates(depsgraph)
+
+        except:
+            render_debug('Exception occured on depsgraph update of render data. Traceback is below.')
+            traceback.print_exc()  # DEBUG
+
+        finally:
+            # evaluated mesh data of queued meshes is only valid during this depsgraph update
+            with self.profiler.cpu_phase('geometry'):
+                M2DrawingMesh.update_pending(self)
+
+    def _process_depsgraph_updates(self, depsgraph: bpy.types.Depsgraph):
 
-            for update in depsgraph.updates:
+        for update in depsgraph.updates:
 
-                if isinstance(update.id, bpy.types.Scene):
-                    self._update_global_uniforms()
+            if isinstance(update.id, bpy.types.Scene):
+                self._update_global_uniforms()
+
+            elif isinstance(update.id, bpy.types.Object):
+
+                self._handle_object_rename(update.id.original)
+
+                # drawing objects are created once visible, bounds and visibility of the rest are tracked
+                if update.id.type == 'MESH':
+                    self.residency.update_candidate(update.id, self.is_object_visible(update.id))
 
-                elif isinstance(update.id, bpy.types.Object) and update.is_updated_geometry:
+                # moved or edited objects affect bounds and back to front order of transparent batches
+                if update.is_updated_transform or update.is_updated_geometry:
+                    self.draw_elements.invalidate_transforms()
+                    self.portal_culler.update_object(update.id)
+                else:
+                    # property changes such as doodad color are uploaded per instance
+                    self.draw_elements.invalidate_instances()
 
+                if update.is_updated_geometry:
                     update_handler = self.update_handlers.get(update.id.type)
 
                     if update_handler:
                         update_handler(depsgraph, update)
 
-                elif isinstance(update.id, bpy.types.Material):
+            elif isinstance(update.id, bpy.types.Material):
 
-                    render_debug('Detected update for material \"{}\"'.format(update.id.name))
-                    draw_mat = self.draw_materials.get(update.id.name)
+                render_debug('Detected update for material \"{}\"'.format(update.id.name))
+                draw_mat = self.draw_materials.get(update.id.name) or self._handle_material_rename(update.id.original)
 
-                    if draw_mat:
-                        draw_mat.update_uniform_data()
-                    else:
-                        self.draw_materials[update.id.name] = M2DrawingMaterial(update.id.original)
-                        # TODO: timer cleanup
-
-        except:
-            render_debug('Exception occured on depsgraph update of render data. Traceback is below.')
-            traceback.print_exc()  # DEBUG
+                # materials not drawn yet are created with their first batch
+                if draw_mat:
+                    draw_mat.update_uniform_data()
+                    self.draw_elements.invalidate()
 
     def init_datablocks(self, depsgraph: bpy.types.Depsgraph):
-
-        # init materials
-        for material in bpy.data.materials:
-            self.draw_materials[material.name] = M2DrawingMaterial(material)
+        """ Collect mesh objects that can be drawn, drawing objects and materials are created by the first frame
+        that sees them """
 
         for datablock in depsgraph.ids:
             if isinstance(datablock, bpy.types.Scene):
                 self._update_global_uniforms()
             elif isinstance(datablock, bpy.types.Object) and datablock.type == 'MESH':
-                self.m2_objects[datablock.name] = M2DrawingObject(datablock.original.evaluated_get(depsgraph), self, self.context)
+                self.residency.update_candidate(datablock, self.is_object_visible(datablock))
 
-    def _m2_handle_mesh_update(self, depsgraph: bpy.types.Depsgraph, update: bpy.types.DepsgraphUpdate):
-        render_debug('Detected update for mesh \"{}\"'.format(update.id.name))
+    def is_object_visible(self, bl_obj: bpy.types.Object) -> bool:
+        return not bl_obj.hide_render if self.is_final_render else bl_obj.visible_get()
 
-        glCheckError("mesh update pre")
+    def get_draw_material(self, material: Optional[bpy.types.Material]) -> Optional[M2DrawingMaterial]:
+        """ Get drawing material of a material slot, created on first use """
 
-        draw_obj = self.m2_objects.get(update.id.name)
+        if not material:
+            return None
 
-        if draw_obj:
-            draw_obj.update_geometry(update.id.original.evaluated_get(depsgraph))
+        draw_mat = self.draw_materials.get(material.name)
 
-        else:
-            self.m2_objects[update.id.name] = M2DrawingObject(update.id.original.evaluated_get(depsgraph), self, self.context)
+        if not draw_mat:
+            draw_mat = self.draw_materials[material.name] = M2DrawingMaterial(material.original, self)
 
-        glCheckError("mesh update post")
+        return draw_mat
 
-    @profile
-    def draw(self):
+    def free_unused_materials(self):
+        """ Drop drawing materials no batch refers to anymore """
 
-        self.region_3d = bpy.context.space_data.region_3d
-        self.region = self._get_active_region()
+        used = {id(batch.draw_material) for batch in self.draw_elements.batches}
 
-        for draw_obj in self.m2_objects.values():
-            if draw_obj.is_dirty:
-                draw_obj.update_geometry_opengl()
+        for name, draw_mat in list(self.draw_materials.items()):
+            if id(draw_mat) not in used:
+                del self.draw_materials[name]
 
-        self.draw_elements.draw()
+    def _handle_object_rename(self, bl_obj: bpy.types.Object):
+        """ Move the drawing object of a renamed object to its new name """
 
-        #self._render_depth_opengl()
-        #self.render_depth_texture()
+        name = bl_obj.name
 
-        #self._destroy_depthbuffer_texture()
+        if name in self.m2_objects:
+            return
 
-    def _linearize(self, depth):
-        znear = self.region_3d.clip_start
-        zfar = self.region_3d.clip_end
+        old_name = self.object_names.get(bl_obj.as_pointer())
+        draw_obj = self.m2_objects.get(old_name) if old_name else None
 
-        return (*([(-zfar * znear / (depth * (zfar - znear) - zfar)) / zfar] * 3), 1.0)
+        if draw_obj:
+            draw_obj.rename(name)
+            self.residency.rename_candidate(old_name, name)
 
-    def render_depth_texture(self):
-        """ Render scene depth_tex_bindcode into texture """
+    def _handle_material_rename(self, material: bpy.types.Material) -> Optional[M2DrawingMaterial]:
+        """ Move the drawing material of a renamed material to its new name """
 
-        width, height = self.region.width, self.region.height
+        pointer = material.as_pointer()
 
-        image_name = "DepthBuffer"
-        if image_name not in bpy.data.images:
-            image = bpy.data.images.new(image_name, width, height)
-        else:
-            return
+        for old_name, draw_mat in self.draw_materials.items():
+            if draw_mat.bl_material_pointer == pointer and old_name != material.name:
+                del self.draw_materials[old_name]
+                self.draw_materials[material.name] = draw_mat
+                draw_mat.rename(material.name)
 
-        image.scale(width, height)
+                return draw_mat
 
-        image.pixels = [y for x in [self._linearize(v) for v in self.depth_buf] for y in x]
+        return None
 
-    @staticmethod
-    def _get_active_region() -> bpy.types.Region:
+    def get_m2_mesh(self, bl_obj: bpy.types.Object) -> M2DrawingMesh:
+        """ Get drawing mesh for an evaluated object, shared with other objects using the same mesh datablock """
 
-        for region in bpy.context.area.regions:
-            if region.type == 'WINDOW':
-                return region
+        key = M2DrawingMesh.get_key(bl_obj)
+        draw_mesh = self.m2_meshes.get(key)
+
+        if not draw_mesh:
+            draw_mesh = self.m2_meshes[key] = M2DrawingMesh(key, bl_obj, self, self.context)
+            self.updated_meshes.add(key)
+
+        return draw_mesh
+
+    def _m2_handle_mesh_update(self, depsgraph: bpy.types.Depsgraph, update: bpy.types.DepsgraphUpdate):
+        render_debug('Detected update for mesh \"{}\"'.format(update.id.name))
+
+        glCheckError("mesh update pre")
+
+        draw_obj = self.m2_objects.get(update.id.name)
+
+        # objects without a drawing object are created with current geometry once visible
+        if draw_obj:
+            draw_obj.update_geometry(update.id.original.evaluated_get(depsgraph))
 
-    def _render_depth_opengl(self):
+        glCheckError("mesh update post")
+
+    def draw(self, region_3d: bpy.types.RegionView3D = None, region: bpy.types.Region = None,
+             depsgraph: bpy.types.Depsgraph = None):
+        """ Draw the scene into the bound framebuffer. View and region default to the 3D viewport being drawn,
+        offscreen drawing passes objects providing the same attributes (matrices and dimensions). """
 
-        width, height = self.region.width, self.region.height
+        self.region_3d = region_3d or bpy.context.space_data.region_3d
+        self.region = region or self._get_active_region()
+        depsgraph = depsgraph or self.context.evaluated_depsgraph_get()
 
-        glActiveTexture(GL_TEXTURE0)
-        glBindTexture(GL_TEXTURE_2D, self.depth_tex_bindcode)
+        render_settings = self.context.scene.wow_render_settings
+        self.profiler.configure(render_settings.frame_profiling)
 
-        glReadPixels(0, 0, width, height, GL_DEPTH_COMPONENT, GL_FLOAT, self.depth_buf)
+        with self.profiler.cpu_phase('frame'):
+            self._draw_frame(render_settings, depsgraph)
 
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT, width, height,
-                     0, GL_DEPTH_COMPONENT, GL_FLOAT, self.depth_buf)
+        self.profiler.end_frame(self.get_frame_counters())
 
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER,
-                        GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER,
-                        GL_NEAREST)
+        if not self.is_final_render and render_settings.frame_profiling_overlay:
+            self.profiler.draw_overlay(self.region.width, self.region.height)
 
-        glBindTexture(GL_TEXTURE_2D, self.depth_tex_bindcode)
+        render_debug('Submitted batches: {}, culled batches: {}, portal culled batches: {}, occluded batches: {}'.format(
+            self.draw_elements.n_submitted, self.draw_elements.n_culled, self.draw_elements.n_portal_culled,
+            self.draw_elements.n_occluded))
+
+        render_debug('Drawing objects: {} of {} mesh objects, GPU meshes: {}, draw calls: {}, '
+                     'batches at reduced LOD: {}'.format(
+            len(self.m2_objects), self.residency.n_candidates, len(self.m2_meshes), self.draw_elements.n_draw_calls,
+            self.draw_elements.n_lod_reduced))
+
+        render_debug('Textures resident: {} ({:.1f} / {} MB), queued: {}, uploaded: {}, evicted: {}, '
+                     'placeholder binds: {}'.format(
+            self.textures.n_resident, self.textures.resident_size / (1024 * 1024), render_settings.texture_budget,
+            self.textures.n_queued, self.textures.stats['uploads'], self.textures.stats['evictions'],
+            self.textures.stats['placeholder_binds']))
+
+        stats = self.render_state.stats
+        render_debug('Binds per frame (naive -> state sorted): programs {} -> {}, textures {} -> {}, '
+                     'uniforms {} -> {}, state changes {} -> {}'.format(
+            stats['program_binds_naive'], stats['program_binds'], stats['texture_binds_naive'], stats['texture_binds'],
+            stats['uniform_uploads_naive'], stats['uniform_uploads'],
+            stats['state_changes_naive'], stats['state_changes']))
+
+    def _draw_frame(self, render_settings: 'WoWRenderSettingsPropertyGroup', depsgraph: bpy.types.Depsgraph):
+
+        with self.profiler.cpu_phase('residency'):
+            self.residency.update(self, depsgraph, self.region_3d.perspective_matrix, render_settings.frustum_culling,
+                                  render_settings.drawing_object_lifetime)
+
+        with self.profiler.cpu_phase('upload'), self.profiler.gpu_pass('upload'):
+
+            for draw_mesh in self.m2_meshes.values():
+                if draw_mesh.is_dirty:
+                    draw_mesh.update_geometry_opengl()
+
+            for draw_obj in list(self.m2_objects.values()):
+                if not draw_obj.is_batching_valid:
+                    draw_obj.update_batches()
+
+            # images are loaded before state tracking starts, loading them changes texture bindings
+            self.textures.begin_frame(render_settings.texture_budget)
+
+        hidden_objects = frozenset()
+
+        # occlusion results lag behind by a frame, final renders draw each view once
+        occlusion_culling = render_settings.occlusion_culling and not self.is_final_render
+
+        if render_settings.portal_culling:
+            with self.profiler.cpu_phase('portal_culling'):
+                self.portal_culler.update(self.context.scene, self.region_3d.perspective_matrix,
+                                          self.region_3d.view_matrix)
+                hidden_objects = self.portal_culler.hidden_objects
+
+        if self.scene_uniforms is None:
+            self.scene_uniforms = SceneUniformBuffer()
+
+        # per-frame globals are shared by all shader programs through the uniform buffer
+        self.scene_uniforms.update(self.region_3d.perspective_matrix, self.sun_dir_and_fog_start,
+                                   self.sun_color_and_fog_end, self.ambient_light)
+        self.scene_uniforms.bind()
+
+        with self.profiler.gpu_pass('scene'):
+            self.render_state.begin_frame()
+
+            self.draw_elements.draw(self.region_3d.perspective_matrix, render_settings.frustum_culling,
+                                    hidden_objects,
+                                    render_settings.lod_screen_size if render_settings.lod_selection else 0.0,
+                                    occlusion_culling, (self.region.width, self.region.height))
+
+            self.render_state.end_frame()
+
+        # final renders load all textures themselves
+        if not self.is_final_render:
+            self.textures.end_frame()
+
+        # draw again once depth captured for occlusion culling is read back, so batches it reveals show up
+        if occlusion_culling and self.draw_elements.is_occlusion_pending \
+                and not bpy.app.timers.is_registered(self.textures.redraw_timer):
+            bpy.app.timers.register(self.textures.redraw_timer, first_interval=self.textures.redraw_interval)
+
+        if not self.is_final_render and render_settings.portal_culling and render_settings.portal_culling_overlay:
+            with self.profiler.gpu_pass('portal_overlay'):
+                self.portal_culler.draw_overlay(self.region_3d.perspective_matrix)
+
+    def get_frame_counters(self) -> Dict[str, int]:
+        """ Counters of the last drawn frame """
+
+        stats = self.render_state.stats
+
+        return {
+            'batches_submitted': self.draw_elements.n_submitted,
+            'batches_culled': self.draw_elements.n_culled,
+            'batches_portal_culled': self.draw_elements.n_portal_culled,
+            'batches_occluded': self.draw_elements.n_occluded,
+            'batches_lod_reduced': self.draw_elements.n_lod_reduced,
+            'draw_calls': self.draw_elements.n_draw_calls,
+            'drawing_objects': len(self.m2_objects),
+            'drawing_objects_created': self.residency.stats['created'],
+            'drawing_objects_freed': self.residency.stats['freed'],
+            'triangles': stats['triangles'],
+            'program_binds': stats['program_binds'],
+            'texture_binds': stats['texture_binds'],
+            'uniform_uploads': stats['uniform_uploads'],
+            'state_changes': stats['state_changes'],
+            'textures_resident': self.textures.n_resident,
+            'texture_uploads': self.textures.stats['uploads'],
+            'texture_evictions': self.textures.stats['evictions']
+        }
+
+    @staticmethod
+    def _get_active_region() -> bpy.types.Region:
 
-        return self.depth_tex_bindcode
+        if not bpy.context.area:
+            return None
 
-    def _destroy_depthbuffer_texture(self):
-        glDeleteTextures(1, self.depth_tex_id_buf)
+        for region in bpy.context.area.regions:
+            if region.type == 'WINDOW':
+                return region
 
     @staticmethod
     def _draw_callback(self):
         self.draw()
 
     def free(self):
+
+        # shader permutations are shared with viewports that may still be warming them up
+        if not self.is_final_render:
+            self.shaders.cancel_warm_up()
+
         for draw_obj in list(self.m2_objects.values()):
             draw_obj.free()
 
+        if self.scene_uniforms:
+            self.scene_uniforms.free()
+            self.scene_uniforms = None
+
+        self.draw_elements.free()
+        self.textures.free()
+        self.residency.free()
+        self.profiler.free()
+
         render_debug('Freed drawing manager.')
\ No newline at end of file
@@ -1,8 +1,14 @@
 import bpy
 import bgl
+import gpu
+import traceback
+import numpy as np
+
+from types import SimpleNamespace
+from typing import Optional
 
 from .drawing_manager import DrawingManager
-from .utils import render_debug
+from .utils import render_debug, OffscreenView
 from .bgl_ext import create_framebuffer, glCheckError
 from ..wbs_kernel.wbs_kernel import OpenGLUtils
 
@@ -15,6 +21,23 @@ class WoWRenderEngine(bpy.types.RenderEngine):
     bl_use_preview = False
     bl_use_eevee_viewport = True
 
+    # final renders draw with OpenGL, Blender versions providing a GPU context to render() need to be asked for it
+    bl_use_gpu_context = True
+
+    @staticmethod
+    def get_final_render_error() -> Optional[str]:
+        """ Return why final renders can not be drawn in this Blender session, None if they can """
+
+        if bpy.app.background:
+            return 'final renders need a display, run Blender without --background ' \
+                   '(on a headless machine under a virtual display such as xvfb-run)'
+
+        # render() runs on the render thread without a GL context before Blender 2.91
+        if 'bl_use_gpu_context' not in bpy.types.RenderEngine.bl_rna.properties:
+            return 'final renders need Blender 2.91 or newer, earlier versions provide no GPU context to render engines'
+
+        return None
+
     # Init is called whenever a new render engine instance is created. Multiple
     # instances may exist at the same time, for example for a viewport and final
     # render.
@@ -22,7 +45,9 @@ class WoWRenderEngine(bpy.types.RenderEngine):
 
         self.glew_init = False
         self.first_time = True
-        self.draw_manager = DrawingManager(bpy.context)
+
+        # created by the first viewport update, final renders use a drawing manager per frame
+        self.draw_manager = None
 
         render_debug('Instantiated render engine.')
 
@@ -31,31 +56,113 @@ class WoWRenderEngine(bpy.types.RenderEngine):
     def __del__(self):
         render_debug('Freed render engine.')
 
-    # This is the method called by Blender for both final renders (F12) and
-    # small preview for materials, world and lights.
+    # This is the method called by Blender for final renders (F12), previews are not supported.
     def render(self, depsgraph):
         scene = depsgraph.scene
         scale = scene.render.resolution_percentage / 100.0
         self.size_x = int(scene.render.resolution_x * scale)
         self.size_y = int(scene.render.resolution_y * scale)
 
-        # Fill the render result with a flat color. The framebuffer is
-        # defined as a list of pixels, each pixel itself being a list of
-        # R,G,B,A values.
-        if self.is_preview:
-            color = [0.1, 0.2, 0.1, 1.0]
-        else:
-            color = [0.2, 0.1, 0.1, 1.0]
+        error = self.get_final_render_error()
+
+        if error:
+            self.report({'ERROR'}, 'WoW render engine: {}.'.format(error))
+            return
+
+        if not scene.camera:
+            self.report({'ERROR'}, 'WoW render engine: scene has no active camera.')
+            return
 
-        pixel_count = self.size_x * self.size_y
-        rect = [color] * pixel_count
+        try:
+            pixels = self._render_offscreen(depsgraph)
+
+        except Exception as e:
+            self.report({'ERROR'}, 'WoW render engine: final render failed ({}).'.format(e))
+            traceback.print_exc()
+            return
 
-        # Here we write the pixel values to the RenderResult
         result = self.begin_result(0, 0, self.size_x, self.size_y)
-        layer = result.layers[0].passes["Combined"]
-        layer.rect = rect
+        combined = result.layers[0].passes["Combined"]
+
+        # single buffer transfer, property arrays of older Blender versions have no foreach_set()
+        if hasattr(combined.rect, 'foreach_set'):
+            combined.rect.foreach_set(pixels.ravel())
+        else:
+            combined.rect = pixels.reshape(-1, 4)
+
         self.end_result(result)
 
+    @staticmethod
+    def read_pixels(pixels: np.ndarray):
+        """ Read RGBA pixels of the bound framebuffer, bottom row first, into a (height, width, 4) array """
+
+        if hasattr(OpenGLUtils, 'read_pixels'):
+            OpenGLUtils.read_pixels(0, 0, pixels)
+            return
+
+        # prebuilt kernel predating final renders, read through a bgl buffer instead
+        height, width = pixels.shape[:2]
+        buffer = bgl.Buffer(bgl.GL_FLOAT, width * height * 4)
+
+        bgl.glReadPixels(0, 0, width, height, bgl.GL_RGBA, bgl.GL_FLOAT, buffer)
+        pixels[:] = np.array(buffer.to_list(), dtype=np.float32).reshape(pixels.shape)
+
+    def _render_offscreen(self, depsgraph: bpy.types.Depsgraph) -> np.ndarray:
+        """ Draw the scene from the active camera with the viewport pipeline into an offscreen framebuffer,
+        return (height, width, RGBA) pixels, bottom row first as render results expect them """
+
+        scene = depsgraph.scene
+        width, height = self.size_x, self.size_y
+
+        if not self.glew_init:
+            OpenGLUtils.init_glew()
+            self.glew_init = True
+
+        camera = scene.camera.evaluated_get(depsgraph)
+
+        view = OffscreenView(width, height, camera.data.clip_start, camera.data.clip_end)
+        view.set_camera(camera.matrix_world, camera.calc_matrix_camera(
+            depsgraph, x=width, y=height, scale_x=scene.render.pixel_aspect_x, scale_y=scene.render.pixel_aspect_y))
+
+        if scene.render.film_transparent:
+            clear_color = (0.0, 0.0, 0.0, 0.0)
+        elif scene.world:
+            clear_color = (*scene.world.color, 1.0)
+        else:
+            clear_color = (0.0, 0.0, 0.0, 1.0)
+
+        pixels = np.empty((height, width, 4), dtype=np.float32)
+        offscreen = gpu.types.GPUOffScreen(width, height)
+
+        # the render thread has no window context, drawing only reads the scene from it
+        draw_manager = DrawingManager(SimpleNamespace(scene=scene), is_final_render=True)
+
+        try:
+            draw_manager.init_datablocks(depsgraph)
+
+            with offscreen.bind():
+
+                # the first pass queues textures the frame draws, they are all loaded for the second one
+                for is_last_pass in (False, True):
+                    bgl.glClearColor(*clear_color)
+                    bgl.glClear(bgl.GL_COLOR_BUFFER_BIT | bgl.GL_DEPTH_BUFFER_BIT)
+
+                    draw_manager.draw(view, view, depsgraph)
+
+                    if is_last_pass or not draw_manager.textures.n_queued:
+                        break
+
+                    draw_manager.textures.upload_all()
+
+                self.read_pixels(pixels)
+
+        finally:
+            # engines of final renders are freed without a GPU context, so nothing is kept between frames
+            draw_manager.free()
+            offscreen.free()
+
+        return pixels
+
     # For viewport renders, this method gets called once at the start and
     # whenever the scene or 3D viewport changes. This method is where data
     # should be read from Blender in the same thread. Typically a render
@@ -76,6 +183,7 @@ class WoWRenderEngine(bpy.types.RenderEngine):
 
         if self.first_time:
             self.first_time = False
+            self.draw_manager = DrawingManager(context)
             self.draw_manager.init_datablocks(depsgraph)
         else:
             self.draw_manager.update_render_data(depsgraph)
@@ -122,7 +230,7 @@ class WoWRenderEngine(bpy.types.RenderEngine):
         #bgl.glBlendFunc(bgl.GL_ONE, bgl.GL_ONE_MINUS_SRC_ALPHA)
         #self.bind_display_space_shader(context.scene)
 
-        self.draw_manager.draw()
+        self.draw_manager.draw(depsgraph=depsgraph)
 
         bgl.glColorMask(False, False, False, True)
         bgl.glClearColor(0, 0, 0, 1.0)
@@ -0,0 +1,266 @@
+import bgl
+import blf
+import gpu
+import json
+
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Deque, Dict, List, Optional
+
+from mathutils import Matrix
+
+from ..utils.profiling import HandlerStats
+
+
+# not exposed by every bgl build
+GL_TIME_ELAPSED = getattr(bgl, 'GL_TIME_ELAPSED', 0x88BF)
+
+
+class GPUPassTimer:
+    """ GL_TIME_ELAPSED queries of a render pass. Results are read frames later, once the GPU has made them
+    available, so that measuring never stalls the pipeline. """
+
+    # queries waiting for results, older ones are dropped when the GPU falls further behind
+    max_pending = 8
+
+    def __init__(self):
+        self.free_queries: List[int] = []
+        self.pending: Deque[int] = deque()
+        self.active_query = 0
+
+    def begin(self):
+
+        if self.free_queries:
+            query = self.free_queries.pop()
+        else:
+            buf = bgl.Buffer(bgl.GL_INT, 1)
+            bgl.glGenQueries(1, buf)
+            query = buf[0]
+
+        bgl.glBeginQuery(GL_TIME_ELAPSED, query)
+        self.active_query = query
+
+    def end(self):
+        bgl.glEndQuery(GL_TIME_ELAPSED)
+
+        self.pending.append(self.active_query)
+        self.active_query = 0
+
+        while len(self.pending) > self.max_pending:
+            self.free_queries.append(self.pending.popleft())
+
+    def collect(self) -> List[float]:
+        """ Return durations in milliseconds of passes finished on the GPU since the last call """
+
+        durations = []
+        buf = bgl.Buffer(bgl.GL_INT, 1)
+
+        while self.pending:
+            query = self.pending[0]
+
+            bgl.glGetQueryObjectiv(query, bgl.GL_QUERY_RESULT_AVAILABLE, buf)
+
+            if not buf[0]:
+                break
+
+            bgl.glGetQueryObjectuiv(query, bgl.GL_QUERY_RESULT, buf)
+
+            # nanoseconds, read as signed 32-bit, passes over 2 seconds wrap around
+            durations.append((buf[0] & 0xFFFFFFFF) / 1000000)
+            self.free_queries.append(self.pending.popleft())
+
+        return durations
+
+    def free(self):
+        queries = self.free_queries + list(self.pending)
+
+        if queries:
+            bgl.glDeleteQueries(len(queries), bgl.Buffer(bgl.GL_INT, len(queries), queries))
+
+        self.free_queries.clear()
+        self.pending.clear()
+
+
+class FrameProfiler:
+    """ Opt-in instrumentation of the WoW viewport render engine. Collects CPU time of frame phases, GPU time of
+    render passes and per-frame counters, draws them over the viewport and exports them to JSON.
+    All methods return immediately while disabled. """
+
+    max_samples = 1024
+
+    # profiler of the last drawn viewport, used by export operators
+    active: Optional['FrameProfiler'] = None
+
+    overlay_font_size = 11
+    overlay_line_height = 14
+    overlay_margin = 10
+
+    def __init__(self):
+        self.enabled = False
+        self.n_frames = 0
+
+        self.cpu_stats: Dict[str, HandlerStats] = {}
+        self.gpu_stats: Dict[str, HandlerStats] = {}
+        self.gpu_timers: Dict[str, GPUPassTimer] = {}
+
+        # counters of the last frame, and their totals over all profiled frames
+        self.counters: Dict[str, int] = {}
+        self.counter_totals: Dict[str, int] = {}
+
+        # durations of the current frame, recorded at its end
+        self.frame_cpu: Dict[str, float] = {}
+
+    def configure(self, enabled: bool):
+
+        if self.enabled and not enabled:
+            self.free_queries()
+
+        self.enabled = enabled
+
+    @contextmanager
+    def cpu_phase(self, name: str):
+        """ Measure CPU time of the enclosed code, phases with the same name add up within a frame """
+
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self.frame_cpu[name] = self.frame_cpu.get(name, 0.0) + (perf_counter() - start) * 1000
+
+    @contextmanager
+    def gpu_pass(self, name: str):
+        """ Measure GPU time of OpenGL commands issued by the enclosed code, passes must not be nested """
+
+        if not self.enabled:
+            yield
+            return
+
+        timer = self.gpu_timers.get(name)
+
+        if timer is None:
+            timer = self.gpu_timers[name] = GPUPassTimer()
+
+        timer.begin()
+
+        try:
+            yield
+        finally:
+            timer.end()
+
+    def end_frame(self, counters: Dict[str, int]):
+        """ Record phases measured since the last frame, counters of this frame and available GPU results """
+
+        if not self.enabled:
+            return
+
+        FrameProfiler.active = self
+        self.n_frames += 1
+
+        for name, duration in self.frame_cpu.items():
+            self._get_stats(self.cpu_stats, name).add(duration, 0.0)
+
+        self.frame_cpu.clear()
+        self.collect_gpu_results()
+
+        self.counters = dict(counters)
+
+        for name, value in counters.items():
+            self.counter_totals[name] = self.counter_totals.get(name, 0) + value
+
+    def collect_gpu_results(self):
+        """ Record GPU pass durations available so far, all of them once the GPU finished (glFinish) """
+
+        for name, timer in self.gpu_timers.items():
+            for duration in timer.collect():
+                self._get_stats(self.gpu_stats, name).add(duration, 0.0)
+
+    def summary(self) -> Dict:
+
+        return {
+            'frames': self.n_frames,
+            'cpu_ms': {name: stats.summary() for name, stats in sorted(self.cpu_stats.items())},
+            'gpu_ms': {name: stats.summary() for name, stats in sorted(self.gpu_stats.items())},
+            'counters': dict(sorted(self.counters.items())),
+            'counters_mean': {name: total / self.n_frames if self.n_frames else 0.0
+                              for name, total in sorted(self.counter_totals.items())}
+        }
+
+    def dump_json(self, filepath: str):
+        with open(filepath, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def reset(self):
+        self.n_frames = 0
+        self.cpu_stats.clear()
+        self.gpu_stats.clear()
+        self.counters.clear()
+        self.counter_totals.clear()
+        self.frame_cpu.clear()
+
+    def draw_overlay(self, width: int, height: int):
+        """ Draw latest timings and counters in the top left corner of the viewport """
+
+        if not self.enabled:
+            return
+
+        lines = ['Frames: {}'.format(self.n_frames)]
+
+        for title, stats_map in (('CPU', self.cpu_stats), ('GPU', self.gpu_stats)):
+            for name, stats in sorted(stats_map.items()):
+                last = stats.samples[-1] if stats.samples else 0.0
+                lines.append('{} {}: {:.2f} ms (p95 {:.2f} ms)'.format(
+                    title, name, last, stats.percentile(sorted(stats.samples), 0.95)))
+
+        lines.extend('{}: {}'.format(name, value) for name, value in sorted(self.counters.items()))
+
+        # pixel coordinates
+        projection = Matrix(((2.0 / width, 0.0, 0.0, -1.0),
+                             (0.0, 2.0 / height, 0.0, -1.0),
+                             (0.0, 0.0, 1.0, 0.0),
+                             (0.0, 0.0, 0.0, 1.0)))
+
+        font_id = 0
+
+        with gpu.matrix.push_pop(), gpu.matrix.push_pop_projection():
+            gpu.matrix.load_matrix(Matrix.Identity(4))
+            gpu.matrix.load_projection_matrix(projection)
+
+            blf.size(font_id, self.overlay_font_size, 72)
+            blf.color(font_id, 1.0, 1.0, 1.0, 1.0)
+            blf.enable(font_id, blf.SHADOW)
+            blf.shadow(font_id, 3, 0.0, 0.0, 0.0, 1.0)
+
+            for i, line in enumerate(lines):
+                blf.position(font_id, self.overlay_margin,
+                             height - self.overlay_margin - (i + 1) * self.overlay_line_height, 0)
+                blf.draw(font_id, line)
+
+            blf.disable(font_id, blf.SHADOW)
+
+    def free_queries(self):
+
+        for timer in self.gpu_timers.values():
+            timer.free()
+
+        self.gpu_timers.clear()
+
+    def free(self):
+        self.free_queries()
+
+        if FrameProfiler.active is self:
+            FrameProfiler.active = None
+
+    def _get_stats(self, stats_map: Dict[str, HandlerStats], name: str) -> HandlerStats:
+
+        stats = stats_map.get(name)
+
+        if stats is None:
+            stats = stats_map[name] = HandlerStats(self.max_samples)
+
+        return stats
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class Frustum:
+    """ View frustum culling of bounding spheres, used with prebuilt kernels lacking CFrustum.
+    Mirrors the interface of the kernel class. """
+
+    def __init__(self):
+
+        # left, right, bottom, top, near, far planes as (a, b, c, d) rows, normals point inwards
+        self.planes = np.zeros((6, 4), dtype=np.float32)
+
+    def update(self, view_projection):
+        """ Extract clipping planes from a 4x4 view projection matrix given as a sequence of rows """
+
+        rows = np.array([row[:] for row in view_projection], dtype=np.float32)
+
+        self.planes = np.array([rows[3] + rows[0], rows[3] - rows[0],
+                                rows[3] + rows[1], rows[3] - rows[1],
+                                rows[3] + rows[2], rows[3] - rows[2]], dtype=np.float32)
+
+        # normalize, so that plane distances can be compared against sphere radii
+        lengths = np.linalg.norm(self.planes[:, :3], axis=1)
+        self.planes[lengths > 0] /= lengths[lengths > 0, None]
+
+    def intersects_sphere(self, center, radius: float) -> bool:
+        distances = self.planes[:, :3] @ np.array(center[:3], dtype=np.float32) + self.planes[:, 3]
+        return bool((distances >= -radius).all())
+
+    def cull_spheres(self, spheres: np.ndarray, visibility: np.ndarray) -> int:
+        """ Test (x, y, z, radius) rows against the frustum, fill visibility mask and return visible count """
+
+        if not len(spheres):
+            return 0
+
+        distances = spheres[:, :3] @ self.planes[:, :3].T + self.planes[:, 3]
+        is_visible = (distances >= -spheres[:, 3:4]).all(axis=1)
+
+        visibility[:len(spheres)] = is_visible
+
+        return int(np.count_nonzero(is_visible))
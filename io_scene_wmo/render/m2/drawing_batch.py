@@ -2,8 +2,9 @@ import bpy
 import gpu
 
 import mathutils
+import numpy as np
 
-from typing import Union
+from typing import Iterable, Union
 from bgl import *
 
 from ..drawing_batch import DrawingBatch
@@ -14,6 +15,17 @@ from .drawing_material import M2DrawingMaterial
 from ..drawing_elements import ElementTypes
 from ..utils import render_debug
 from ..bgl_ext import glCheckError
+from ..render_state import DEPTH_RANGE_SCENE, DEPTH_RANGE_SKYBOX
+
+
+# prebuilt kernels predating instanced drawing submit each instance with a draw call of its own
+HAS_INSTANCED_DRAWING = hasattr(CM2DrawingBatch, 'draw_instanced')
+
+# prebuilt kernels predating detail levels always draw the full geometry
+HAS_LODS = hasattr(CM2DrawingBatch, 'set_lod')
+
+# prebuilt kernels predating the frame profiler do not report drawn triangles, they are counted as 0
+HAS_TRIANGLE_COUNTS = hasattr(CM2DrawingBatch, 'n_drawn_triangles')
 
 
 class M2DrawingBatch(DrawingBatch):
@@ -25,13 +37,6 @@ class M2DrawingBatch(DrawingBatch):
     bl_batch_vert_shader_id: int
     bl_batch_frag_shader_id: int
 
-    gl_texture_slots = (
-        GL_TEXTURE0,
-        GL_TEXTURE1,
-        GL_TEXTURE2,
-        GL_TEXTURE3
-    )
-
     # uniform data
     draw_material: Union[M2DrawingMaterial, None]
 
@@ -49,8 +54,8 @@ class M2DrawingBatch(DrawingBatch):
         self.mat_id = self.c_batch.get_mat_id()
 
         try:
-            self.draw_material = self.draw_obj.draw_mgr.draw_materials.get(
-                self.draw_obj.bl_obj.data.materials[self.mat_id].name)
+            self.draw_material = self.draw_obj.draw_mgr.get_draw_material(
+                self.draw_obj.bl_obj.data.materials[self.mat_id])
 
         except IndexError:
             self.draw_material = None
@@ -86,6 +91,22 @@ class M2DrawingBatch(DrawingBatch):
     def sort_radius(self) -> float:
         return self.c_batch.sort_radius
 
+    @property
+    def n_lods(self) -> int:
+        return self.c_batch.n_lods if HAS_LODS else 0
+
+    @property
+    def n_triangles(self) -> int:
+        return self.c_batch.n_drawn_triangles if HAS_TRIANGLE_COUNTS else 0
+
+    @property
+    def instance_key(self) -> Union[CM2DrawingBatch, None]:
+
+        if not self.draw_material:
+            return None
+
+        return self.c_batch
+
     def determine_valid_shader(self) -> gpu.types.GPUShader:
 
         shaders = M2ShaderPermutations()
@@ -100,12 +121,33 @@ class M2DrawingBatch(DrawingBatch):
         else:
             return shaders.default_shader
 
+    def draw(self):
+
+        # kernel batch is shared by all objects using the mesh, so the level is selected right before drawing
+        if HAS_LODS:
+            self.c_batch.set_lod(self.lod)
+        super().draw()
+
     def draw_batch(self):
+        self._draw_instances(self.draw_obj.instance_data.reshape(1, -1))
+
+    def draw_instances(self, batches: Iterable['M2DrawingBatch']):
+        """ Draw batches sharing the instance key and detail level of this batch with a single draw call """
+
+        instances = [batch.draw_obj.instance_data for batch in batches
+                     if not batch.tag_free and self.draw_obj.draw_mgr.is_object_visible(batch.draw_obj.bl_obj)]
+
+        if instances:
+            self._draw_instances(np.stack(instances))
+
+    def _draw_instances(self, instances: np.ndarray):
 
         glCheckError('draw')
 
         #render_debug('Drawing batch for object \"{}\"'.format(self.draw_obj.bl_obj.name))
 
+        state = self.draw_obj.draw_mgr.render_state
+
         color_name = self.draw_material.bl_material.wow_m2_material.color
         transparency_name = self.draw_material.bl_material.wow_m2_material.transparency
         color = self.context.scene.wow_m2_colors[color_name].color if color_name else (1.0, 1.0, 1.0, 1.0)
@@ -121,83 +163,57 @@ class M2DrawingBatch(DrawingBatch):
         u_alpha_test = 128.0 / 255.0 * combined_color[3] \
             if self.draw_material.blend_mode.index == EGxBLend.AlphaKey.index else 1.0 / 255.0  # Maybe move this to shader logic?
 
-        self._set_active_textures()
+        if HAS_LODS:
+            self.c_batch.set_lod(self.lod)
+        state.count_batch(self.draw_material.texture_count, 4, len(instances), self.n_triangles)
 
-        self.shader = self.determine_valid_shader()
-        self.shader.bind()
-        glCheckError('Pre-link program')
-        self.c_batch.set_program(self.shader.program)
-        glCheckError('Post-link program')
+        state.use_shader(self.shader)
+        self._set_active_textures()
 
         # draw
-        if self.draw_material.depth_culling:
-            glEnable(GL_DEPTH_TEST)
-
-        glDepthMask(GL_TRUE if self.draw_material.depth_write else GL_FALSE)
-
-        if self.draw_material.backface_culling:
-            glEnable(GL_CULL_FACE)
-
-        if self.draw_material.blend_mode.blending_enabled:
-            glEnable(GL_BLEND)
+        state.set_capability(GL_DEPTH_TEST, self.draw_material.depth_culling)
+        state.set_depth_mask(self.draw_material.depth_write)
+        state.set_capability(GL_CULL_FACE, self.draw_material.backface_culling)
+        state.set_capability(GL_BLEND, self.draw_material.blend_mode.blending_enabled)
 
         if self.is_skybox:
-            glDepthRange(0.998, 1.0)
+            state.set_depth_range(*DEPTH_RANGE_SKYBOX)
+        elif state.depth_range == DEPTH_RANGE_SKYBOX:
+            state.set_depth_range(*DEPTH_RANGE_SCENE)
 
-        glBlendFunc(self.draw_material.blend_mode.src_color, self.draw_material.blend_mode.dest_color)
+        state.set_blend_func(self.draw_material.blend_mode.src_color, self.draw_material.blend_mode.dest_color)
         # OpenGLUtils.glBlendFuncSeparate(self.draw_material.blend_mode.src_color,
         #                                 self.draw_material.blend_mode.dest_color,
         #                                 self.draw_material.blend_mode.src_alpha,
         #                                 self.draw_material.blend_mode.dest_alpha)
 
-        self.shader.uniform_float('uViewProjectionMatrix', self.draw_obj.draw_mgr.region_3d.perspective_matrix)
-
-        self.shader.uniform_float('uPlacementMatrix', self.draw_obj.bl_obj.matrix_world)
-        self.shader.uniform_float('uSunDirAndFogStart', self.draw_obj.draw_mgr.sun_dir_and_fog_start)
-        self.shader.uniform_float('uSunColorAndFogEnd', self.draw_obj.draw_mgr.sun_color_and_fog_end)
-        self.shader.uniform_float('uAmbientLight', self.draw_obj.draw_mgr.ambient_light)
-        self.shader.uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, u_alpha_test))
-        self.shader.uniform_int('UnFogged_IsAffectedByLight_LightCount', (self.draw_material.is_unfogged,
-                                                                          not self.draw_material.is_unlit, 0))
-
-        try:
-            self.shader.uniform_int('uTexture', 0)
-        except ValueError:
-            pass
-
-        try:
-            self.shader.uniform_int('uTexture2', 1)
-        except ValueError:
-            pass
+        state.set_uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, u_alpha_test))
+        state.set_uniform_int('UnFogged_IsAffectedByLight_LightCount', (self.draw_material.is_unfogged,
+                                                                        not self.draw_material.is_unlit, 0))
+        state.set_uniform_float('color_Transparency', combined_color)
 
-        try:
-            self.shader.uniform_int('uTexture3', 2)
-        except ValueError:
-            pass
-
-        try:
-            self.shader.uniform_int('uTexture4', 3)
-        except ValueError:
-            pass
-
-        self.shader.uniform_float('color_Transparency', combined_color)
-
-        self.c_batch.draw()
+        if HAS_INSTANCED_DRAWING:
+            self.c_batch.draw_instanced(instances)
+        else:
+            self._draw_instances_sequential(instances)
 
-        if self.is_skybox:
-            glDepthRange(0, 0.996)
+        glCheckError('draw end')
 
-        if self.draw_material.blend_mode.blending_enabled:
-            glDisable(GL_BLEND)
+    def _draw_instances_sequential(self, instances: np.ndarray):
+        """ Draw instances one by one, passing per-instance data as constant values of the instance attributes,
+        which are not backed by arrays in VAOs of kernels lacking instanced drawing """
 
-        if self.draw_material.backface_culling:
-            glDisable(GL_CULL_FACE)
+        matrix_loc = glGetAttribLocation(self.shader.program, 'aInstanceMatrix')
+        color_loc = glGetAttribLocation(self.shader.program, 'aInstanceColor')
 
-        glDepthMask(GL_FALSE if self.draw_material.depth_write else GL_TRUE)
+        for instance in instances.tolist():
 
-        if self.draw_material.depth_culling:
-            glDisable(GL_DEPTH_TEST)
+            # a mat4 attribute occupies four consecutive vec4 locations
+            if matrix_loc >= 0:
+                for i in range(4):
+                    glVertexAttrib4f(matrix_loc + i, *instance[i * 4:i * 4 + 4])
 
-        gpu.shader.unbind()
+            if color_loc >= 0:
+                glVertexAttrib4f(color_loc, *instance[16:20])
 
-        glCheckError('draw end')
+            self.c_batch.draw()
@@ -7,6 +7,9 @@ class M2DrawingMaterial:
     __slots__ = (
         'draw_mgr',
         'bl_material_name',
+        'bl_material_pointer',
+        'bl_material_generation',
+        '_bl_material',
         'blend_mode',
         'depth_write',
         'depth_culling',
@@ -26,17 +29,33 @@ class M2DrawingMaterial:
     is_inverted: bool
     is_transformed: bool
 
-    def __init__(self, material: bpy.types.Material):
+    def __init__(self, material: bpy.types.Material, drawing_mgr: 'DrawingManager'):
+        self.draw_mgr = drawing_mgr
         self.bl_material_name = material.name
+        self.bl_material_pointer = material.as_pointer()
+
+        # reference to the material, valid until the datablock generation of the drawing manager changes
+        self._bl_material = None
+        self.bl_material_generation = -1
 
         self.update_uniform_data()
 
     @property
     def bl_material(self):
-        try:
-            return bpy.data.materials[self.bl_material_name]
-        except KeyError:
-            return None
+
+        if self.bl_material_generation != self.draw_mgr.datablock_generation:
+            self._bl_material = bpy.data.materials.get(self.bl_material_name)
+            self.bl_material_generation = self.draw_mgr.datablock_generation
+
+            # addresses change on undo
+            if self._bl_material:
+                self.bl_material_pointer = self._bl_material.as_pointer()
+
+        return self._bl_material
+
+    def rename(self, name: str):
+        self.bl_material_name = name
+        self.bl_material_generation = -1
 
     def get_texture(self, tex_index: int):
         mat = self.bl_material
@@ -73,15 +92,3 @@ class M2DrawingMaterial:
 
         self.is_inverted = '1' in bl_material.wow_m2_material.flags
         self.is_transformed = '2' in bl_material.wow_m2_material.flags
-
-    def get_bindcode(self, tex_index: int) -> int:
-
-        texture = self.get_texture(tex_index)
-
-        if texture:
-            if not texture.bindcode:
-                texture.gl_load()
-
-            return texture.bindcode
-
-        return 0
@@ -0,0 +1,153 @@
+import bpy
+import numpy as np
+
+from typing import List, Set
+
+from ..utils import render_debug
+from ...wbs_kernel.wbs_kernel import CM2DrawingMesh, CM2DrawingBatch
+
+try:
+    from ...wbs_kernel.wbs_kernel import update_m2_geometry
+
+# prebuilt kernel predating parallel geometry preparation, meshes are prepared one by one
+except ImportError:
+    def update_m2_geometry(meshes: List[CM2DrawingMesh], is_indexed: bool = True, n_threads: int = 0) -> List[bool]:
+        return [mesh.update_geometry(is_indexed) for mesh in meshes]
+
+
+# prebuilt kernels predating detail levels always draw the full geometry
+HAS_LODS = hasattr(CM2DrawingMesh, 'set_lod_triangles')
+
+
+class M2DrawingMesh:
+    """ GPU geometry of a mesh datablock, shared by all drawing objects using it and drawn instanced.
+    Objects whose evaluated geometry differs from the datablock (modifiers, edit mode) get a mesh of their own. """
+
+    c_batches: List[CM2DrawingBatch]
+
+    def __init__(self
+                 , key: str
+                 , bl_obj: bpy.types.Object
+                 , drawing_mgr: 'DrawingManager'
+                 , context: bpy.types.Context):
+
+        self.key = key
+        self.draw_mgr = drawing_mgr
+        self.context = context
+        self.users: Set[str] = set()
+        self.is_dirty = True
+        self.is_batching_valid = False
+
+        # incremented whenever batches are re-created, drawing objects compare it to refresh their batches
+        self.generation = 0
+
+        self.c_mesh = CM2DrawingMesh(bl_obj.data.as_pointer())
+        self.c_batches = []
+
+        # vertex count of the mesh LOD triangles were stored for
+        self.lod_vertex_count = 0
+
+        render_debug('Initialized drawing mesh \"{}\"'.format(self.key))
+
+        self.load_lods(bl_obj)
+        self.update_geometry(bl_obj)
+
+    @staticmethod
+    def get_key(bl_obj: bpy.types.Object) -> str:
+
+        original = bl_obj.original
+
+        if original.modifiers or original.mode != 'OBJECT':
+            return 'OBJECT:{}'.format(original.name)
+
+        return 'MESH:{}'.format(original.data.name)
+
+    def update_geometry(self, bl_obj: bpy.types.Object):
+        """ Queue geometry update, CPU-side buffers of queued meshes are prepared together by update_pending() """
+
+        self.c_mesh.update_mesh_pointer(bl_obj.data.as_pointer())
+        bl_obj.data.calc_loop_triangles()
+
+        # vertex indices of LOD triangles are meaningless once vertices were added or removed
+        if HAS_LODS and self.c_mesh.n_lods and len(bl_obj.data.vertices) != self.lod_vertex_count:
+            self.c_mesh.clear_lods()
+            render_debug('Dropped LODs of edited drawing mesh \"{}\"'.format(self.key))
+
+        self.draw_mgr.pending_meshes[self.key] = self
+
+    def load_lods(self, bl_obj: bpy.types.Object):
+        """ Pass triangles of lower detail levels, stored on the mesh by the M2 importer, to the kernel """
+
+        if not HAS_LODS:
+            return
+
+        mesh = bl_obj.original.data
+        self.lod_vertex_count = len(bl_obj.data.vertices)
+
+        lod = 1
+
+        while True:
+            triangles = mesh.get('wow_m2_lod{}'.format(lod))
+
+            if triangles is None:
+                break
+
+            self.c_mesh.set_lod_triangles(lod, np.array(triangles, dtype=np.int32).reshape(-1))
+            lod += 1
+
+        if lod > 1:
+            render_debug('Loaded {} LODs of drawing mesh \"{}\"'.format(lod - 1, self.key))
+
+    def on_geometry_updated(self, is_batching_valid: bool):
+
+        # batches re-created by an update that was not uploaded yet stay invalid
+        self.is_batching_valid = is_batching_valid and (self.is_batching_valid or not self.is_dirty)
+        self.is_dirty = True
+
+    @staticmethod
+    def update_pending(drawing_mgr: 'DrawingManager'):
+        """ Prepare geometry of all queued meshes in kernel worker threads. Evaluated mesh data must stay
+        unchanged until this returns, so it is called from the same depsgraph update that queued the meshes. """
+
+        draw_meshes = [draw_mesh for key, draw_mesh in drawing_mgr.pending_meshes.items()
+                       if drawing_mgr.m2_meshes.get(key) is draw_mesh]
+
+        drawing_mgr.pending_meshes.clear()
+
+        if not draw_meshes:
+            return
+
+        # attribute-only edits are uploaded partially, so indexed geometry is kept in edit mode and playback too
+        results = update_m2_geometry([draw_mesh.c_mesh for draw_mesh in draw_meshes], True)
+
+        for draw_mesh, is_batching_valid in zip(draw_meshes, results):
+            draw_mesh.on_geometry_updated(is_batching_valid)
+
+        render_debug('Prepared geometry of {} drawing meshes'.format(len(draw_meshes)))
+
+    def update_geometry_opengl(self):
+
+        self.c_mesh.update_buffers()
+
+        if not self.is_batching_valid:
+            self.c_batches = self.c_mesh.get_drawing_batches()
+            self.generation += 1
+
+        self.is_dirty = False
+
+    def add_user(self, obj_name: str):
+        self.users.add(obj_name)
+
+    def remove_user(self, obj_name: str):
+        self.users.discard(obj_name)
+
+        if not self.users:
+            self.free()
+
+    def free(self):
+        self.c_batches = []
+
+        if self.draw_mgr.m2_meshes.get(self.key) is self:
+            del self.draw_mgr.m2_meshes[self.key]
+
+        render_debug('Freed drawing mesh \"{}\"'.format(self.key))
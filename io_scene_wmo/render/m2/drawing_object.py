@@ -7,7 +7,7 @@ from typing import List
 
 from .drawing_batch import M2DrawingBatch
 from ..utils import render_debug
-from ...wbs_kernel.wbs_kernel import CM2DrawingMesh, CM2DrawingBatch
+from ...wbs_kernel.wbs_kernel import CM2DrawingBatch
 from ..bgl_ext import glCheckError
 
 
@@ -25,55 +25,120 @@ class M2DrawingObject:
         self.draw_mgr = drawing_mgr
         self.bl_obj_name = bl_obj.name
         self.is_skybox = is_skybox
-        self.is_dirty = True
-        self.is_batching_valid = False
 
-        self.mesh_ptr = bl_obj.data.as_pointer()
-        self.c_mesh = CM2DrawingMesh(self.mesh_ptr)
+        # reference to the original object, valid until the datablock generation of the drawing manager changes
+        self._bl_obj = None
+        self.bl_obj_generation = -1
+        self.bl_obj_pointer = bl_obj.original.as_pointer()
+        drawing_mgr.object_names[self.bl_obj_pointer] = self.bl_obj_name
+
+        # generation of the drawing mesh batches were created for
+        self.generation = -1
         self.batches = []
-        bl_obj.data.calc_loop_triangles()
+
+        # placement matrix columns and color, uploaded per instance
+        self.instance_data = np.zeros(20, dtype=np.float32)
+
+        self.draw_mesh = drawing_mgr.get_m2_mesh(bl_obj)
+        self.draw_mesh.add_user(self.bl_obj_name)
+
         render_debug('Initialized drawing object \"{}\"'.format(self.bl_obj_name))
 
-        self.update_geometry()
+    @property
+    def is_batching_valid(self) -> bool:
+        return self.generation == self.draw_mesh.generation
 
-    def update_geometry(self, bl_obj: bpy.types.Object = None):
-        if bl_obj:
-            self.c_mesh.update_mesh_pointer(bl_obj.data.as_pointer())
-            bl_obj.data.calc_loop_triangles()
+    def update_geometry(self, bl_obj: bpy.types.Object):
 
-        self.is_batching_valid = self.c_mesh.update_geometry(not(self.context.screen.is_animation_playing or self.bl_obj.mode != 'OBJECT'))
+        draw_mesh = self.draw_mgr.get_m2_mesh(bl_obj)
 
-        self.is_dirty = True
+        # object started or stopped sharing geometry with other objects
+        if draw_mesh is not self.draw_mesh:
+            self.draw_mesh.remove_user(self.bl_obj_name)
+            draw_mesh.add_user(self.bl_obj_name)
+            self.draw_mesh = draw_mesh
 
-    def update_geometry_opengl(self, bl_obj: bpy.types.Object = None):
+        # users of a shared mesh are all updated by the same depsgraph update
+        elif draw_mesh.key not in self.draw_mgr.updated_meshes:
+            draw_mesh.update_geometry(bl_obj)
 
-        self.c_mesh.update_buffers()
+        self.draw_mgr.updated_meshes.add(draw_mesh.key)
 
-        if not self.is_batching_valid:
+    def update_batches(self):
 
-            for batch in self.batches:
-                batch.free()
+        for batch in self.batches:
+            batch.free()
 
-            self.batches = \
-                [M2DrawingBatch(c_batch, self, self.context) for c_batch in self.c_mesh.get_drawing_batches()]
+        self.batches = [M2DrawingBatch(c_batch, self, self.context) for c_batch in self.draw_mesh.c_batches]
+        self.generation = self.draw_mesh.generation
 
-        self.is_dirty = False
+    def update_instance_data(self):
+
+        bl_obj = self.bl_obj
+
+        if not bl_obj:
+            return
+
+        color = bl_obj.wow_wmo_doodad.color if bl_obj.wow_wmo_doodad.enabled else (1.0, 1.0, 1.0, 1.0)
+
+        self.instance_data = np.array([value for column in bl_obj.matrix_world.col for value in column] + list(color),
+                                      dtype=np.float32)
 
     @property
     def bl_obj(self):
 
-        try:
-            return bpy.data.objects[self.bl_obj_name]
-        except KeyError:
+        # looking objects up by name is linear in their count, so it is only done once per depsgraph update
+        if self.bl_obj_generation == self.draw_mgr.datablock_generation:
+            return self._bl_obj
+
+        self._bl_obj = bpy.data.objects.get(self.bl_obj_name)
+        self.bl_obj_generation = self.draw_mgr.datablock_generation
+
+        if not self._bl_obj:
             self.free()
+            return None
+
+        # addresses change on undo
+        self._set_pointer(self._bl_obj.as_pointer())
+
+        return self._bl_obj
+
+    def rename(self, name: str):
+        """ Keep drawing data of an object renamed by the user """
+
+        # the mesh may only be used by this object, so it gets the new user first
+        self.draw_mesh.add_user(name)
+        self.draw_mesh.remove_user(self.bl_obj_name)
+
+        del self.draw_mgr.m2_objects[self.bl_obj_name]
+        self.draw_mgr.m2_objects[name] = self
+        self.draw_mgr.object_names[self.bl_obj_pointer] = name
+
+        render_debug('Renamed drawing object "{}" to "{}"'.format(self.bl_obj_name, name))
+
+        self.bl_obj_name = name
+        self.bl_obj_generation = -1
+
+    def _set_pointer(self, pointer: int):
+
+        if self.draw_mgr.object_names.get(self.bl_obj_pointer) == self.bl_obj_name:
+            del self.draw_mgr.object_names[self.bl_obj_pointer]
+
+        self.bl_obj_pointer = pointer
+        self.draw_mgr.object_names[pointer] = self.bl_obj_name
 
     def free(self):
 
         for batch in self.batches:
             batch.free()
 
+        self.draw_mesh.remove_user(self.bl_obj_name)
+
         del self.draw_mgr.m2_objects[self.bl_obj_name]
 
+        if self.draw_mgr.object_names.get(self.bl_obj_pointer) == self.bl_obj_name:
+            del self.draw_mgr.object_names[self.bl_obj_pointer]
+
         render_debug('Freed drawing object \"{}\"'.format(self.bl_obj_name))
 
     '''
@@ -1,10 +1,11 @@
 import os
+import bpy
 import gpu
 
 from enum import IntEnum
 from ctypes import c_uint, c_uint8
 from collections import namedtuple
-from typing import Dict, Tuple
+from typing import Dict, Set, Tuple
 
 from ...utils.misc import singleton, Sequence
 from ..shaders import ShaderPermutationsManager
@@ -231,6 +232,15 @@ class M2ShaderPermutations(ShaderPermutationsManager):
 
     shader_source_path = 'm2_shader'
 
+    def get_scene_permutations(self) -> Set[Tuple[int, int]]:
+        return {(int(mat.wow_m2_material.vertex_shader), int(mat.wow_m2_material.fragment_shader))
+                for mat in bpy.data.materials}
+
+    def get_all_permutations(self) -> Set[Tuple[int, int]]:
+        # vertex and fragment shaders are assigned independently in the material settings
+        return {(int(vertex_shader), int(pixel_shader)) for vertex_shader in M2VertexShader
+                for pixel_shader in M2PixelShader}
+
     @staticmethod
     def get_vertex_shader_id(texture_count: int, shader_id: int) -> int:
 
@@ -0,0 +1,175 @@
+import bpy
+import numpy as np
+
+from time import perf_counter
+from typing import Dict, Optional, Set, Tuple
+
+from mathutils import Matrix, Vector
+
+from .m2.drawing_mesh import M2DrawingMesh
+from .m2.drawing_object import M2DrawingObject
+from .utils import render_debug
+
+try:
+    from ..wbs_kernel.wbs_kernel import CFrustum as Frustum
+
+# prebuilt kernel predating frustum culling
+except ImportError:
+    from .frustum import Frustum
+
+
+class ObjectResidencyManager:
+    """ Creates drawing objects of mesh objects once they become visible, and frees them after staying out of view
+    for a configurable time. Visibility of all candidate objects is tested at once on world bounding spheres, whenever
+    the view or the candidates change, so objects never drawn cost neither geometry buffers nor batches. """
+
+    def __init__(self):
+
+        # object name: world (x, y, z, radius) of all mesh objects that can be drawn, and names of hidden ones
+        self.candidates: Dict[str, Tuple[float, float, float, float]] = {}
+        self.hidden: Set[str] = set()
+
+        # rows matching candidate names, rebuilt when candidates change
+        self.names = []
+        self.spheres = np.zeros((0, 4), dtype=np.float32)
+        self.visibility = np.zeros(0, dtype=np.uint8)
+        self.frustum = Frustum()
+
+        self.visible: Set[str] = set()
+        self.view_matrix: Optional[Matrix] = None
+        self.is_candidates_valid = False
+
+        # drawing object name: time it left the view
+        self.invisible_since: Dict[str, float] = {}
+
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            'created': 0,
+            'freed': 0
+        }
+
+    @staticmethod
+    def get_bounding_sphere(bl_obj: bpy.types.Object) -> Tuple[float, float, float, float]:
+
+        matrix_world = bl_obj.matrix_world
+        corners = [matrix_world @ Vector(corner) for corner in bl_obj.bound_box]
+
+        center = (Vector(map(min, *corners)) + Vector(map(max, *corners))) / 2
+
+        return (*center, max((corner - center).length for corner in corners))
+
+    def update_candidate(self, bl_obj: bpy.types.Object, is_visible: bool):
+        """ Add or update a mesh object, needs to be called when objects are added, transformed or edited """
+
+        name = bl_obj.name
+
+        self.candidates[name] = self.get_bounding_sphere(bl_obj)
+
+        if is_visible:
+            self.hidden.discard(name)
+        else:
+            self.hidden.add(name)
+
+        self.is_candidates_valid = False
+
+    def remove_candidate(self, name: str):
+        self.candidates.pop(name, None)
+        self.hidden.discard(name)
+        self.is_candidates_valid = False
+
+    def rename_candidate(self, old_name: str, name: str):
+        """ Keep the out of view time of a renamed object, its bounds are updated with the new name """
+
+        self.remove_candidate(old_name)
+
+        if old_name in self.invisible_since:
+            self.invisible_since[name] = self.invisible_since.pop(old_name)
+
+        if old_name in self.visible:
+            self.visible.discard(old_name)
+            self.visible.add(name)
+
+    @property
+    def n_candidates(self) -> int:
+        return len(self.candidates)
+
+    def update(self, draw_mgr: 'DrawingManager', depsgraph: bpy.types.Depsgraph, view_matrix: Matrix,
+               frustum_culling: bool, lifetime: float):
+        """ Create drawing objects of candidates that came into view and free those out of view for over
+        lifetime seconds. Geometry of created objects is prepared right away to be uploaded by the same frame. """
+
+        self.reset_stats()
+        now = perf_counter()
+
+        if not self.is_candidates_valid:
+            self.names = [name for name in self.candidates if name not in self.hidden]
+            self.spheres = np.array([self.candidates[name] for name in self.names],
+                                    dtype=np.float32).reshape(-1, 4)
+            self.visibility = np.ones(len(self.names), dtype=np.uint8)
+            self.view_matrix = None
+            self.is_candidates_valid = True
+
+        if self.view_matrix != view_matrix:
+            self.view_matrix = view_matrix.copy()
+
+            if frustum_culling:
+                self.frustum.update(view_matrix)
+                self.frustum.cull_spheres(self.spheres, self.visibility)
+            else:
+                self.visibility.fill(1)
+
+            self.visible = {self.names[i] for i in np.flatnonzero(self.visibility)}
+
+            for name in self.visible:
+                if name not in draw_mgr.m2_objects:
+                    self._create_object(draw_mgr, depsgraph, name)
+
+            for name in draw_mgr.m2_objects:
+                if name in self.visible:
+                    self.invisible_since.pop(name, None)
+                else:
+                    self.invisible_since.setdefault(name, now)
+
+            if self.stats['created']:
+                M2DrawingMesh.update_pending(draw_mgr)
+
+        for name, since in list(self.invisible_since.items()):
+
+            if now - since < lifetime:
+                continue
+
+            del self.invisible_since[name]
+            draw_obj = draw_mgr.m2_objects.get(name)
+
+            if draw_obj:
+                draw_obj.free()
+                self.stats['freed'] += 1
+
+        if self.stats['created'] or self.stats['freed']:
+            render_debug('Created {} and freed {} drawing objects, {} of {} candidates visible'.format(
+                self.stats['created'], self.stats['freed'], len(self.visible), len(self.candidates)))
+
+        if self.stats['freed']:
+            draw_mgr.free_unused_materials()
+
+    def _create_object(self, draw_mgr: 'DrawingManager', depsgraph: bpy.types.Depsgraph, name: str):
+
+        bl_obj = bpy.data.objects.get(name)
+
+        # deleted or renamed since it was added
+        if not bl_obj or bl_obj.type != 'MESH':
+            self.remove_candidate(name)
+            return
+
+        draw_mgr.m2_objects[name] = M2DrawingObject(bl_obj.evaluated_get(depsgraph), draw_mgr, draw_mgr.context)
+        self.stats['created'] += 1
+
+    def free(self):
+        self.candidates.clear()
+        self.hidden.clear()
+        self.visible.clear()
+        self.invisible_since.clear()
+        self.is_candidates_valid = False
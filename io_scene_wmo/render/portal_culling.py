@@ -0,0 +1,302 @@
+import bpy
+import gpu
+
+from gpu_extras.batch import batch_for_shader
+from mathutils import Matrix, Vector
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..wmo.utils.spatial import GroupSpatialIndex
+
+
+# screen rectangle in normalized device coordinates: x_min, y_min, x_max, y_max
+ScreenRect = Tuple[float, float, float, float]
+
+FULL_SCREEN_RECT = (-1.0, -1.0, 1.0, 1.0)
+
+
+class PortalLink:
+    """ Portal leading from one WMO group to another """
+
+    __slots__ = ('portal_name', 'target_group', 'vertices')
+
+    def __init__(self, portal_name: str, target_group: str, vertices: List[Vector]):
+        self.portal_name = portal_name
+        self.target_group = target_group
+        self.vertices = vertices
+
+
+class PortalCuller:
+    """ Determines WMO groups visible from the viewport camera by walking portals, similar to the game client.
+    Starting from the group containing the camera (or all outdoor groups if the camera is outside),
+    each portal is projected to the screen and clipped against the rectangle it was seen through.
+    Groups whose portals are not visible, their doodads, liquids and collision meshes are hidden. """
+
+    # limits traversal in scenes with many portal cycles
+    max_depth = 32
+
+    overlay_visible_color = (0.2, 0.9, 0.2, 1.0)
+    overlay_culled_color = (0.9, 0.2, 0.2, 1.0)
+
+    def __init__(self):
+        self.is_valid = False
+        self.view_projection: Optional[Matrix] = None
+
+        self.groups: Dict[str, Tuple[Vector, Vector]] = {}
+        self.outdoor_groups: Set[str] = set()
+        self.links: Dict[str, List[PortalLink]] = {}
+        self.attachments: Dict[str, List[str]] = {}
+
+        # doodad name: group it is attached to, groups are looked up in the index built by the last rebuild
+        self.doodad_groups: Dict[str, str] = {}
+        self.spatial_index: Optional[GroupSpatialIndex] = None
+
+        self.visible_groups: Set[str] = set()
+        self.culled_groups: Set[str] = set()
+        self.hidden_objects: Set[str] = set()
+
+        self.overlay_batches = None
+
+    def invalidate(self):
+        """ Request rebuilding of group and portal data, needs to be called when groups or portals are edited """
+        self.is_valid = False
+        self.spatial_index = None
+
+    def update_object(self, bl_obj: bpy.types.Object):
+        """ Update data of a moved or edited object. Only groups and portals require a full rebuild,
+        moved doodads are attached to their nearest group again. """
+
+        if bl_obj.wow_wmo_group.enabled or bl_obj.wow_wmo_portal.enabled:
+            self.invalidate()
+            return
+
+        if not self.is_valid or not bl_obj.wow_wmo_doodad.enabled:
+            return
+
+        try:
+            self._attach_doodad(bl_obj)
+
+        # group objects of the index have been freed, e.g. by undo
+        except ReferenceError:
+            self.invalidate()
+            return
+
+        # hidden objects are collected again by the next update
+        self.view_projection = None
+
+    def _attach_doodad(self, bl_obj: bpy.types.Object):
+
+        old_group = self.doodad_groups.pop(bl_obj.name, None)
+
+        if old_group:
+            self.attachments[old_group].remove(bl_obj.name)
+
+        group = self.spatial_index.find_nearest_group(bl_obj.matrix_world.translation)
+
+        if group:
+            self.attachments[group.name].append(bl_obj.name)
+            self.doodad_groups[bl_obj.name] = group.name
+
+    def rebuild(self, scene: bpy.types.Scene):
+
+        self.groups.clear()
+        self.outdoor_groups.clear()
+        self.links.clear()
+        self.attachments.clear()
+        self.doodad_groups.clear()
+
+        group_objects = []
+
+        for obj in scene.objects:
+
+            if obj.type != 'MESH':
+                continue
+
+            if obj.wow_wmo_group.enabled:
+                corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
+                self.groups[obj.name] = (Vector(min(co[i] for co in corners) for i in range(3)),
+                                         Vector(max(co[i] for co in corners) for i in range(3)))
+
+                if obj.wow_wmo_group.place_type == '8':
+                    self.outdoor_groups.add(obj.name)
+
+                # helper meshes of a group share its visibility
+                self.attachments[obj.name] = [helper.name for helper in (obj.wow_wmo_group.collision_mesh,
+                                                                         obj.wow_wmo_group.liquid_mesh) if helper]
+
+                group_objects.append(obj)
+
+            elif obj.wow_wmo_portal.enabled:
+                first, second = obj.wow_wmo_portal.first, obj.wow_wmo_portal.second
+
+                if not first or not second:
+                    continue
+
+                vertices = [obj.matrix_world @ vertex.co for vertex in obj.data.vertices]
+
+                self.links.setdefault(first.name, []).append(PortalLink(obj.name, second.name, vertices))
+                self.links.setdefault(second.name, []).append(PortalLink(obj.name, first.name, vertices))
+
+        # doodads are assigned to the nearest group, same as on export
+        self.spatial_index = GroupSpatialIndex(group_objects)
+
+        for obj in scene.objects:
+            if obj.wow_wmo_doodad.enabled:
+                self._attach_doodad(obj)
+
+        self.view_projection = None
+        self.is_valid = True
+
+    def find_camera_group(self, camera_position: Vector) -> Optional[str]:
+        """ Get the smallest group containing the camera, indoor groups are preferred """
+
+        candidates = []
+
+        for name, (corner_min, corner_max) in self.groups.items():
+
+            if all(corner_min[i] <= camera_position[i] <= corner_max[i] for i in range(3)):
+                size = corner_max - corner_min
+                candidates.append((name in self.outdoor_groups, size.x * size.y * size.z, name))
+
+        return min(candidates)[2] if candidates else None
+
+    @staticmethod
+    def project_portal(vertices: List[Vector], view_projection: Matrix, rect: ScreenRect) -> Optional[ScreenRect]:
+        """ Get the screen rectangle of a portal clipped by rect, or None if it is not visible through it """
+
+        xs = []
+        ys = []
+        n_behind = 0
+
+        for co in vertices:
+            clip = view_projection @ co.to_4d()
+
+            if clip.w <= 1e-5:
+                n_behind += 1
+                continue
+
+            xs.append(clip.x / clip.w)
+            ys.append(clip.y / clip.w)
+
+        if not xs:
+            return None
+
+        # portal crosses the camera plane, it can be seen through the whole rect
+        if n_behind:
+            return rect
+
+        x_min, y_min = max(rect[0], min(xs)), max(rect[1], min(ys))
+        x_max, y_max = min(rect[2], max(xs)), min(rect[3], max(ys))
+
+        if x_min >= x_max or y_min >= y_max:
+            return None
+
+        return x_min, y_min, x_max, y_max
+
+    def traverse(self, view_projection: Matrix, camera_position: Vector):
+
+        self.visible_groups.clear()
+
+        camera_group = self.find_camera_group(camera_position)
+
+        # all exterior groups are visible from outside
+        if camera_group and camera_group not in self.outdoor_groups:
+            start_groups = [camera_group]
+        else:
+            start_groups = self.outdoor_groups
+
+        # rects each group was already seen through, narrower ones do not need to be walked again
+        seen_rects: Dict[str, List[ScreenRect]] = {}
+        stack = [(group, FULL_SCREEN_RECT, 0) for group in start_groups]
+
+        while stack:
+            group, rect, depth = stack.pop()
+
+            group_rects = seen_rects.setdefault(group, [])
+
+            if any(seen[0] <= rect[0] and seen[1] <= rect[1] and seen[2] >= rect[2] and seen[3] >= rect[3]
+                   for seen in group_rects):
+                continue
+
+            group_rects.append(rect)
+            self.visible_groups.add(group)
+
+            if depth >= self.max_depth:
+                continue
+
+            for link in self.links.get(group, ()):
+                portal_rect = self.project_portal(link.vertices, view_projection, rect)
+
+                if portal_rect is not None:
+                    stack.append((link.target_group, portal_rect, depth + 1))
+
+        self.culled_groups = set(self.groups) - self.visible_groups
+
+        self.hidden_objects = set(self.culled_groups)
+
+        for group in self.culled_groups:
+            self.hidden_objects.update(self.attachments.get(group, ()))
+
+        self.overlay_batches = None
+
+    def update(self, scene: bpy.types.Scene, view_projection: Matrix, view_matrix: Matrix):
+
+        if not self.is_valid:
+            self.rebuild(scene)
+
+        if self.view_projection == view_projection:
+            return
+
+        # without groups or a starting point there is nothing to cull
+        if not self.groups or (not self.outdoor_groups
+                               and not self.find_camera_group(view_matrix.inverted().translation)):
+            self.visible_groups = set(self.groups)
+            self.culled_groups = set()
+            self.hidden_objects = set()
+            self.overlay_batches = None
+        else:
+            self.traverse(view_projection, view_matrix.inverted().translation)
+
+        self.view_projection = view_projection.copy()
+
+    def _create_overlay_batches(self):
+
+        shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+        edges = ((0, 1), (1, 3), (3, 2), (2, 0), (4, 5), (5, 7), (7, 6), (6, 4), (0, 4), (1, 5), (2, 6), (3, 7))
+
+        batches = []
+
+        for groups, color in ((self.visible_groups, self.overlay_visible_color),
+                              (self.culled_groups, self.overlay_culled_color)):
+            coords = []
+
+            for group in groups:
+                corner_min, corner_max = self.groups[group]
+                corners = [(x, y, z) for x in (corner_min.x, corner_max.x)
+                                     for y in (corner_min.y, corner_max.y)
+                                     for z in (corner_min.z, corner_max.z)]
+
+                for a, b in edges:
+                    coords.extend((corners[a], corners[b]))
+
+            if coords:
+                batches.append((batch_for_shader(shader, 'LINES', {"pos": coords}), color))
+
+        self.overlay_batches = shader, batches
+
+    def draw_overlay(self, view_projection: Matrix):
+        """ Draw bounding boxes of visible groups in green and culled groups in red """
+
+        if self.overlay_batches is None:
+            self._create_overlay_batches()
+
+        shader, batches = self.overlay_batches
+
+        with gpu.matrix.push_pop(), gpu.matrix.push_pop_projection():
+            gpu.matrix.load_matrix(Matrix.Identity(4))
+            gpu.matrix.load_projection_matrix(view_projection)
+
+            shader.bind()
+
+            for batch, color in batches:
+                shader.uniform_float("color", color)
+                batch.draw(shader)
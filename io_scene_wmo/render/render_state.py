@@ -0,0 +1,203 @@
+import gpu
+
+from typing import Dict, Optional
+
+from bgl import *
+
+
+DEPTH_RANGE_SCENE = (0.0, 0.996)
+DEPTH_RANGE_SKYBOX = (0.998, 1.0)
+
+
+class RenderState:
+    """ Tracks OpenGL state set by drawing batches within a frame, so that only actual changes reach the driver.
+    Counts binds issued per frame next to the binds a naive per-batch submission would have issued. """
+
+    texture_slots = (
+        GL_TEXTURE0,
+        GL_TEXTURE1,
+        GL_TEXTURE2,
+        GL_TEXTURE3
+    )
+
+    sampler_uniforms = ('uTexture', 'uTexture2', 'uTexture3', 'uTexture4')
+
+    # capabilities set by drawing batches, queried at frame start and restored at frame end
+    tracked_capabilities = (GL_DEPTH_TEST, GL_BLEND, GL_CULL_FACE)
+
+    # view projection, sun, fog and ambient uniforms, now provided by the scene uniform buffer
+    n_global_uniforms = 4
+
+    def __init__(self):
+        self.shader: Optional[gpu.types.GPUShader] = None
+        self.initialized_programs = set()
+        self.placement_objects: Dict[int, str] = {}
+        self.textures = [0] * len(self.texture_slots)
+        self.active_texture_slot = None
+        self.capabilities: Dict[int, bool] = {}
+        self.capabilities_initial: Dict[int, bool] = {}
+        self.depth_mask = None
+        self.depth_mask_initial = True
+        self.blend_func = None
+        self.depth_range = None
+        self.depth_range_initial = (0.0, 1.0)
+
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            'batches': 0,
+            'draw_calls': 0,
+            'triangles': 0,
+            'program_binds': 0,
+            'program_binds_naive': 0,
+            'texture_binds': 0,
+            'texture_binds_naive': 0,
+            'uniform_uploads': 0,
+            'uniform_uploads_naive': 0,
+            'state_changes': 0,
+            'state_changes_naive': 0
+        }
+
+    def begin_frame(self):
+        """ Forget tracked state, GL state may have been changed by Blender in between frames """
+
+        self.shader = None
+        self.initialized_programs.clear()
+        self.placement_objects.clear()
+        self.textures = [0] * len(self.texture_slots)
+        self.active_texture_slot = None
+        self.blend_func = None
+
+        self.capabilities_initial = {capability: bool(glIsEnabled(capability))
+                                     for capability in self.tracked_capabilities}
+        self.capabilities = self.capabilities_initial.copy()
+
+        buf = Buffer(GL_BYTE, 1)
+        glGetBooleanv(GL_DEPTH_WRITEMASK, buf)
+        self.depth_mask_initial = bool(buf[0])
+        self.depth_mask = self.depth_mask_initial
+
+        # batches drawn before any skybox expect the scene depth range
+        buf = Buffer(GL_FLOAT, 2)
+        glGetFloatv(GL_DEPTH_RANGE, buf)
+        self.depth_range_initial = tuple(buf)
+        self.depth_range = None
+        self.set_depth_range(*DEPTH_RANGE_SCENE)
+
+        self.reset_stats()
+
+    def end_frame(self):
+        """ Restore state expected by Blender """
+
+        for capability, is_enabled in self.capabilities_initial.items():
+            self.set_capability(capability, is_enabled)
+
+        self.set_depth_mask(self.depth_mask_initial)
+        self.set_depth_range(*self.depth_range_initial)
+
+        if self.shader:
+            gpu.shader.unbind()
+            self.shader = None
+
+    def count_batch(self, n_textures: int, n_uniforms: int, n_instances: int = 1, n_triangles: int = 0):
+        """ Account a draw call of n_instances batches, and binds they would issue without state tracking """
+
+        self.stats['batches'] += n_instances
+        self.stats['draw_calls'] += 1
+        self.stats['triangles'] += n_triangles * n_instances
+
+        # shader bind in Python and program use in the kernel
+        self.stats['program_binds_naive'] += 2 * n_instances
+        self.stats['texture_binds_naive'] += n_textures * n_instances
+        self.stats['uniform_uploads_naive'] += (n_uniforms + self.n_global_uniforms
+                                                + len(self.sampler_uniforms)) * n_instances
+
+        # depth test, depth mask, face culling, blending, blend function and their reset
+        self.stats['state_changes_naive'] += 10 * n_instances
+
+    def use_shader(self, shader: gpu.types.GPUShader):
+
+        if self.shader is not shader:
+            shader.bind()
+            self.shader = shader
+            self.stats['program_binds'] += 1
+
+        if shader.program not in self.initialized_programs:
+            self.initialized_programs.add(shader.program)
+
+            for i, name in enumerate(self.sampler_uniforms):
+                try:
+                    shader.uniform_int(name, i)
+                    self.stats['uniform_uploads'] += 1
+                except ValueError:
+                    pass
+
+    def set_uniform_float(self, name: str, value):
+        self.shader.uniform_float(name, value)
+        self.stats['uniform_uploads'] += 1
+
+    def set_uniform_int(self, name: str, value):
+        self.shader.uniform_int(name, value)
+        self.stats['uniform_uploads'] += 1
+
+    def set_placement(self, bl_obj):
+        """ Upload object matrix unless current program already uses it """
+
+        if self.placement_objects.get(self.shader.program) != bl_obj.name:
+            self.placement_objects[self.shader.program] = bl_obj.name
+            self.set_uniform_float('uPlacementMatrix', bl_obj.matrix_world)
+
+    def bind_texture(self, slot_index: int, bind_code: int):
+
+        if not bind_code or self.textures[slot_index] == bind_code:
+            return
+
+        if self.active_texture_slot != slot_index:
+            glActiveTexture(self.texture_slots[slot_index])
+            self.active_texture_slot = slot_index
+
+        glBindTexture(GL_TEXTURE_2D, bind_code)
+        self.textures[slot_index] = bind_code
+        self.stats['texture_binds'] += 1
+
+    def set_capability(self, capability: int, is_enabled: bool):
+
+        if self.capabilities.get(capability) == is_enabled:
+            return
+
+        if is_enabled:
+            glEnable(capability)
+        else:
+            glDisable(capability)
+
+        self.capabilities[capability] = is_enabled
+        self.stats['state_changes'] += 1
+
+    def set_depth_mask(self, is_enabled: bool):
+
+        if self.depth_mask == is_enabled:
+            return
+
+        glDepthMask(GL_TRUE if is_enabled else GL_FALSE)
+        self.depth_mask = is_enabled
+        self.stats['state_changes'] += 1
+
+    def set_blend_func(self, src: int, dest: int):
+
+        if self.blend_func == (src, dest):
+            return
+
+        glBlendFunc(src, dest)
+        self.blend_func = src, dest
+        self.stats['state_changes'] += 1
+
+    def set_depth_range(self, near: float, far: float):
+
+        if self.depth_range == (near, far):
+            return
+
+        glDepthRange(near, far)
+        self.depth_range = near, far
+        self.stats['state_changes'] += 1
@@ -1,7 +1,13 @@
 import os
+import bpy
 import gpu
+import hashlib
 
-from typing import Tuple, Dict, Any
+from collections import OrderedDict, deque
+from time import perf_counter
+from typing import Tuple, Dict, Any, Deque, Iterable, Optional, Set, Sequence as SequenceType
+
+from bgl import *
 
 from ..utils.misc import singleton, Sequence
 
@@ -12,46 +18,184 @@ class ShaderPermutationsFormat:
     ADT = 2
 
 
+class SceneUniformBuffer:
+    """ std140 uniform buffer holding per-frame global shader state, see shaders/glsl330/scene_data.glsl """
+
+    block_name = 'SceneData'
+    binding_point = 0
+
+    # mat4 view projection, vec4 sun direction and fog start, vec4 sun color and fog end, vec4 ambient light
+    n_floats = 16 + 4 + 4 + 4
+
+    def __init__(self):
+        self.data = Buffer(GL_FLOAT, self.n_floats)
+        self.values = None
+
+        buf = Buffer(GL_INT, 1)
+        glGenBuffers(1, buf)
+        self.ubo = buf[0]
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, self.n_floats * 4, self.data, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    def update(self
+               , view_projection
+               , sun_dir_and_fog_start: SequenceType[float]
+               , sun_color_and_fog_end: SequenceType[float]
+               , ambient_light: SequenceType[float]):
+        """ Upload values if any of them changed since the last update """
+
+        # std140 stores matrices column-major
+        values = (*(view_projection[row][col] for col in range(4) for row in range(4)),
+                  *sun_dir_and_fog_start[:4],
+                  *sun_color_and_fog_end[:4],
+                  *ambient_light[:3], ambient_light[3] if len(ambient_light) > 3 else 1.0)
+
+        if values == self.values:
+            return
+
+        for i, value in enumerate(values):
+            self.data[i] = value
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.n_floats * 4, self.data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+        self.values = values
+
+    def bind(self):
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.binding_point, self.ubo)
+
+    def free(self):
+        buf = Buffer(GL_INT, 1, [self.ubo])
+        glDeleteBuffers(1, buf)
+
+    @classmethod
+    def bind_shader_block(cls, shader: gpu.types.GPUShader):
+        """ Connect uniform block of a shader program to the buffer binding point """
+
+        block_index = glGetUniformBlockIndex(shader.program, cls.block_name)
+
+        if block_index != GL_INVALID_INDEX:
+            glUniformBlockBinding(shader.program, block_index, cls.binding_point)
+
+
+class ShaderSourceCache:
+    """ Shader file contents and preprocessed permutation sources, keyed by hash of the shader file contents.
+    Files are only re-read when their modification time or size changes. """
+
+    max_permutations = 128
+
+    # path: ((modification time, size), content hash, source)
+    files: Dict[str, Tuple[Tuple[float, int], str, str]] = {}
+
+    # (content hash, vertex shader id, fragment shader id): (vertex source, fragment source)
+    permutations: 'OrderedDict[Tuple[str, int, int], Tuple[str, str]]' = OrderedDict()
+
+    @classmethod
+    def read(cls, rel_path: str) -> Tuple[str, str]:
+        """ Get content hash and source of a shader file relative to this module """
+
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), rel_path)
+        stat = os.stat(path)
+        stat_key = stat.st_mtime, stat.st_size
+
+        entry = cls.files.get(path)
+
+        if entry is None or entry[0] != stat_key:
+            with open(path) as f:
+                source = "".join(f.readlines())
+
+            entry = cls.files[path] = stat_key, hashlib.md5(source.encode()).hexdigest(), source
+
+        return entry[1], entry[2]
+
+    @classmethod
+    def get_permutation(cls
+                        , source_hash: str
+                        , source: str
+                        , vert_shader_id: int
+                        , frag_shader_id: int) -> Tuple[str, str]:
+
+        key = source_hash, vert_shader_id, frag_shader_id
+        sources = cls.permutations.get(key)
+
+        if sources is not None:
+            cls.permutations.move_to_end(key)
+            return sources
+
+        vert_shader_string_perm = "#define COMPILING_VS {}\n" \
+                                  "#define VERTEXSHADER {}\n" \
+                                  "{}".format(1, vert_shader_id, source)
+        frag_shader_string_perm = "#define COMPILING_FS {}\n" \
+                                  "#define FRAGMENTSHADER {}\n" \
+                                  "{}".format(1, frag_shader_id, source)
+
+        sources = cls.permutations[key] = vert_shader_string_perm, frag_shader_string_perm
+
+        if len(cls.permutations) > cls.max_permutations:
+            cls.permutations.popitem(last=False)
+
+        return sources
+
+
 class ShaderPermutationsManager:
 
     shader_source_path: str
     extra_defines: Dict[str, Any]
 
+    # seconds of compilation per warm-up timer step and pause between steps, keeps the UI responsive
+    warm_up_time_slice = 0.008
+    warm_up_interval = 0.01
+
     def __init__(self):
         self.shader_permutations: Dict = {}
         self.shader_source: str
+        self.shader_source_hash: str
         self.default_shader: gpu.types.GPUShader
 
+        self.warm_up_queue: Deque[Tuple[int, int]] = deque()
+        self.warm_up_timer = self._warm_up_step
+        self.is_warming_up = False
+        self.n_warmed_up = 0
+        self.warm_up_start = 0.0
+
         rel_path = 'shaders\\glsl330\\{}.glsl'.format(self.shader_source_path) if os.name == 'nt'\
             else 'shaders/glsl330/{}.glsl'.format(self.shader_source_path)
 
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), rel_path)) as f:
-            self.shader_source = "".join(f.readlines())
+        # shared declarations are prepended to every shader, including the fallback one
+        scene_data_rel_path = 'shaders\\glsl330\\scene_data.glsl' if os.name == 'nt' \
+            else 'shaders/glsl330/scene_data.glsl'
+
+        scene_data_hash, scene_data_source = ShaderSourceCache.read(scene_data_rel_path)
+        source_hash, source = ShaderSourceCache.read(rel_path)
+
+        self.shader_source = scene_data_source + source
+        self.shader_source_hash = scene_data_hash + source_hash
 
         rel_path = 'shaders\\glsl330\\default.glsl' if os.name == 'nt' else 'shaders/glsl330/default.glsl'
 
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),  rel_path)) as f:
-            shader_source_fallback = "".join(f.readlines())
+        _, source = ShaderSourceCache.read(rel_path)
+        shader_source_fallback = scene_data_source + source
 
-            vert_shader_string_perm = "#define COMPILING_VS {}\n" \
-                                      "{}".format(1, shader_source_fallback)
-            frag_shader_string_perm = "#define COMPILING_FS {}\n" \
-                                      "{}".format(1, shader_source_fallback)
+        vert_shader_string_perm = "#define COMPILING_VS {}\n" \
+                                  "{}".format(1, shader_source_fallback)
+        frag_shader_string_perm = "#define COMPILING_FS {}\n" \
+                                  "{}".format(1, shader_source_fallback)
 
-            self.default_shader = gpu.types.GPUShader(vert_shader_string_perm, frag_shader_string_perm)
+        self.default_shader = gpu.types.GPUShader(vert_shader_string_perm, frag_shader_string_perm)
+        SceneUniformBuffer.bind_shader_block(self.default_shader)
 
     def _compile_shader_permutation(self
                                     , vert_shader_id: int
                                     , frag_shader_id: int) -> gpu.types.GPUShader:
 
-        vert_shader_string_perm = "#define COMPILING_VS {}\n" \
-                                  "#define VERTEXSHADER {}\n" \
-                                  "{}".format(1, vert_shader_id, self.shader_source)
-        frag_shader_string_perm = "#define COMPILING_FS {}\n" \
-                                  "#define FRAGMENTSHADER {}\n" \
-                                  "{}".format(1, frag_shader_id, self.shader_source)
+        vert_shader_string_perm, frag_shader_string_perm = ShaderSourceCache.get_permutation(
+            self.shader_source_hash, self.shader_source, vert_shader_id, frag_shader_id)
 
         shader = gpu.types.GPUShader(vert_shader_string_perm, frag_shader_string_perm)
+        SceneUniformBuffer.bind_shader_block(shader)
         self.shader_permutations[vert_shader_id, frag_shader_id] = shader
 
         return shader
@@ -66,3 +210,54 @@ class ShaderPermutationsManager:
             shader = self._compile_shader_permutation(vert_shader_id, frag_shader_id)
 
         return shader
+
+    def get_scene_permutations(self) -> Set[Tuple[int, int]]:
+        """ Get (vertex shader id, fragment shader id) pairs referenced by materials of the current file """
+        raise NotImplementedError()
+
+    def get_all_permutations(self) -> Set[Tuple[int, int]]:
+        """ Get all (vertex shader id, fragment shader id) pairs that can be assigned to a material """
+        raise NotImplementedError()
+
+    def warm_up(self, permutations: Iterable[Tuple[int, int]]):
+        """ Compile given permutations in the background using a time-sliced timer """
+
+        self.warm_up_queue.extend(ids for ids in permutations if ids not in self.shader_permutations)
+
+        if self.warm_up_queue and not self.is_warming_up:
+            self.is_warming_up = True
+            self.n_warmed_up = 0
+            self.warm_up_start = perf_counter()
+            bpy.app.timers.register(self.warm_up_timer, first_interval=self.warm_up_interval)
+
+    def cancel_warm_up(self):
+
+        self.warm_up_queue.clear()
+        self.is_warming_up = False
+
+        if bpy.app.timers.is_registered(self.warm_up_timer):
+            bpy.app.timers.unregister(self.warm_up_timer)
+
+    def _warm_up_step(self) -> Optional[float]:
+
+        step_start = perf_counter()
+
+        while self.warm_up_queue and perf_counter() - step_start < self.warm_up_time_slice:
+            ids = self.warm_up_queue.popleft()
+
+            if ids in self.shader_permutations:
+                continue
+
+            try:
+                self._compile_shader_permutation(*ids)
+                self.n_warmed_up += 1
+            except Exception:
+                print('Warning: failed to compile shader permutation {} of \"{}\".'
+                      .format(ids, self.shader_source_path))
+
+        if self.warm_up_queue:
+            return self.warm_up_interval
+
+        self.is_warming_up = False
+        print('Compiled {} permutations of \"{}\" shader in {:.2f} seconds.'
+              .format(self.n_warmed_up, self.shader_source_path, perf_counter() - self.warm_up_start))
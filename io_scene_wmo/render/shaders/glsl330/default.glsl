@@ -6,7 +6,6 @@ in vec3 aPosition;
 in vec3 aNormal;
 
 // Whole model
-uniform mat4 uViewProjectionMatrix;
 uniform mat4 uPlacementMatrix;
 
 //Individual meshes
@@ -52,13 +51,7 @@ in vec3 vNormal;
 
 out vec4 outputColor;
 
-//Whole model
-uniform mat4 uViewProjectionMatrix;
-
-uniform vec4 uSunDirAndFogStart;
-uniform vec4 uSunColorAndFogEnd;
-uniform vec4 uAmbientLight;
-
+//Whole model globals are provided by the SceneData uniform block
 
 uniform ivec3 UnFogged_IsAffectedByLight_LightCount;
 uniform vec4 uFogColorAndAlphaTest;
@@ -37,10 +37,9 @@ in vec3 aNormal;
 in vec2 aTexCoord;
 in vec2 aTexCoord2;
 
-
-// Whole model
-uniform mat4 uViewProjectionMatrix;
-uniform mat4 uPlacementMatrix;
+// Per instance, placement and doodad color of each object sharing the mesh
+in mat4 aInstanceMatrix;
+in vec4 aInstanceColor;
 
 //Individual meshes
 uniform vec4 color_Transparency;
@@ -58,16 +57,16 @@ void main() {
 
     vec4 aPositionVec4 = vec4(aPosition, 1.0f);
 
-    vec4 lDiffuseColor = color_Transparency;
+    vec4 lDiffuseColor = color_Transparency * aInstanceColor;
     vec4 combinedColor = clamp(lDiffuseColor /*+ vc_matEmissive*/, 0.000000, 1.000000);
     vec4 combinedColorHalved = combinedColor * 0.5;
 
     mat3 viewModelMatTransposed = mat3(uViewProjectionMatrix);
     mat4 cameraMatrix = uViewProjectionMatrix;
-    vec4 cameraPoint = cameraMatrix * (uPlacementMatrix * aPositionVec4);
+    vec4 cameraPoint = cameraMatrix * (aInstanceMatrix * aPositionVec4);
 
     // Handle normals
-    vec3 normal = normalize(viewModelMatTransposed * (mat3(uPlacementMatrix) * aNormal));
+    vec3 normal = normalize(viewModelMatTransposed * (mat3(aInstanceMatrix) * aNormal));
 
     vec2 envCoord = posToTexCoord(cameraPoint.xyz, normal);
     float edgeScanVal = edgeScan(cameraPoint.xyz, normal);
@@ -213,14 +212,7 @@ uniform sampler2D uTexture4;
 
 out vec4 outputColor;
 
-//Whole model
-uniform mat4 uViewProjectionMatrix;
-
-uniform vec4 uSunDirAndFogStart;
-uniform vec4 uSunColorAndFogEnd;
-uniform vec4 uAmbientLight;
-
-
+//Whole model globals are provided by the SceneData uniform block
 
 uniform ivec3 UnFogged_IsAffectedByLight_LightCount;
 uniform vec4 uFogColorAndAlphaTest;
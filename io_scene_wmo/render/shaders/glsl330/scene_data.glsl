@@ -0,0 +1,11 @@
+// Per-frame global state shared by all shader permutations, updated once per frame.
+// Uses std140 layout, must be kept in sync with SceneUniformBuffer in render/shaders.py.
+
+layout (std140) uniform SceneData
+{
+    mat4 uViewProjectionMatrix;
+    vec4 uSunDirAndFogStart;
+    vec4 uSunColorAndFogEnd;
+    vec4 uAmbientLight;
+};
+
@@ -9,7 +9,6 @@ layout (location = 4) in vec2 aTexCoord3;
 layout (location = 5) in vec4 aColor;
 layout (location = 6) in vec4 aColor2;
 
-uniform mat4 uViewProjectionMatrix;
 uniform mat4 uPlacementMat;
 uniform vec4 uAmbientBakedTerm; // color to subtract in FixColorVertexAlpha, see CMapObjGroup::FixColorVertexAlpha(CMapObjGroup *mapObjGroup)
 
@@ -182,9 +181,6 @@ in vec4 vColor2;
 in vec4 vPosition;
 in vec3 vNormal;
 
-uniform vec4 uSunDir_FogStart;
-uniform vec4 uSunColor_uFogEnd;
-uniform vec4 uAmbientLight;
 uniform vec4 uAmbientLight2AndIsBatchA;
 uniform ivec4 UseLitColor_EnableAlpha_PixelShader;
 uniform vec4 FogColor_AlphaTest;
@@ -203,7 +199,7 @@ vec3 makeDiffTerm(vec3 matDiffuse) {
     if (UseLitColor_EnableAlpha_PixelShader.x == 1) {
         //vec3 viewUp = normalize(vec3(0, 0.9, 0.1));
         vec3 normalizedN = normalize(vNormal);
-        float nDotL = dot(normalizedN, -(uSunDir_FogStart.xyz));
+        float nDotL = dot(normalizedN, -(uSunDirAndFogStart.xyz));
         float nDotUp = dot(normalizedN, ViewUp.xyz);
 
         vec3 precomputed = vColor2.rgb;
@@ -229,7 +225,7 @@ vec3 makeDiffTerm(vec3 matDiffuse) {
         vec3 skyColor = (currColor * 1.10000002);
         vec3 groundColor = (currColor* 0.699999988);
         currColor = mix(groundColor, skyColor, vec3((0.5 + (0.5 * nDotL))));
-        lDiffuse = (uSunColor_uFogEnd.xyz * clamp(nDotL, 0.0, 1.0));
+        lDiffuse = (uSunColorAndFogEnd.xyz * clamp(nDotL, 0.0, 1.0));
     } else {
         currColor = vec3 (1.0, 1.0, 1.0) * uAmbientLight.rgb;
     }
@@ -380,8 +376,8 @@ void main() {
         discard;
 
     vec3 fogColor = FogColor_AlphaTest.xyz;
-    float fog_start = uSunDir_FogStart.w;
-    float fog_end = uSunColor_uFogEnd.w;
+    float fog_start = uSunDirAndFogStart.w;
+    float fog_end = uSunColorAndFogEnd.w;
     float fog_rate = 1.5;
     float fog_bias = 0.01;
 
@@ -0,0 +1,205 @@
+import bpy
+
+from collections import OrderedDict
+from time import perf_counter
+from typing import Dict, Optional, Set
+
+from bgl import *
+
+from .utils import render_debug
+
+
+class TextureResidencyManager:
+    """ Keeps images drawn by the render engine loaded on the GPU within a memory budget.
+    Images are loaded by a time-sliced queue at the start of each frame, a placeholder texture is bound until then.
+    Images drawn least recently are freed when the estimated size of loaded images exceeds the budget. """
+
+    # seconds of image loading per frame, and delay of the redraw requested while images are queued
+    upload_time_slice = 0.004
+    redraw_interval = 0.01
+
+    # RGBA8 with a full mipmap chain
+    bytes_per_pixel = 4 * 4 / 3
+
+    def __init__(self):
+        self.budget = 512 * 1024 * 1024
+
+        # image name: estimated size in bytes, least recently drawn first
+        self.resident: Dict[str, int] = OrderedDict()
+        self.last_drawn: Dict[str, int] = {}
+        self.upload_queue: Dict[str, None] = OrderedDict()
+        self.failed: Set[str] = set()
+
+        self.resident_size = 0
+        self.frame = 0
+        self.placeholder = 0
+        self.redraw_timer = self._request_redraw
+
+        self.stats: Dict[str, int] = {}
+        self.n_evicted = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            'uploads': 0,
+            'evictions': 0,
+            'placeholder_binds': 0
+        }
+
+    def get_bindcode(self, image: Optional[bpy.types.Image]) -> int:
+        """ Get bindcode of an image to draw it with, or the placeholder one while the image is not loaded """
+
+        if not image:
+            return 0
+
+        name = image.name
+
+        if image.bindcode:
+
+            # images loaded by Blender, for example in the image editor, are adopted and budgeted too
+            if name not in self.resident:
+                self._add_resident(image)
+
+            self.resident.move_to_end(name)
+            self.last_drawn[name] = self.frame
+
+            return image.bindcode
+
+        # freed by Blender, for example on image reload
+        if name in self.resident:
+            self._remove_resident(name)
+
+        if name not in self.failed:
+            self.upload_queue[name] = None
+
+        self.stats['placeholder_binds'] += 1
+
+        return self.placeholder
+
+    def begin_frame(self, budget_mb: int):
+        """ Load queued images within the time slice, then free least recently drawn images over the budget """
+
+        self.frame += 1
+        self.budget = budget_mb * 1024 * 1024
+        self.reset_stats()
+
+        if not self.placeholder:
+            self.placeholder = self._create_placeholder()
+
+        self._upload(self.upload_time_slice)
+        self._evict()
+
+    def upload_all(self):
+        """ Load all queued images at once, used by final renders that cannot draw placeholders """
+        self._upload(float('inf'))
+
+    def end_frame(self):
+        """ Schedule another frame while images are waiting to be loaded """
+
+        if self.upload_queue and not bpy.app.timers.is_registered(self.redraw_timer):
+            bpy.app.timers.register(self.redraw_timer, first_interval=self.redraw_interval)
+
+    @property
+    def n_queued(self) -> int:
+        return len(self.upload_queue)
+
+    @property
+    def n_resident(self) -> int:
+        return len(self.resident)
+
+    def free(self):
+        """ Free images loaded by this manager and the placeholder texture """
+
+        if bpy.app.timers.is_registered(self.redraw_timer):
+            bpy.app.timers.unregister(self.redraw_timer)
+
+        for name in list(self.resident.keys()):
+            image = bpy.data.images.get(name)
+
+            if image:
+                image.gl_free()
+
+        self.resident.clear()
+        self.last_drawn.clear()
+        self.upload_queue.clear()
+        self.resident_size = 0
+
+        if self.placeholder:
+            glDeleteTextures(1, Buffer(GL_INT, 1, [self.placeholder]))
+            self.placeholder = 0
+
+    def _upload(self, time_slice: float):
+
+        start = perf_counter()
+
+        while self.upload_queue and perf_counter() - start < time_slice:
+            name, _ = self.upload_queue.popitem(last=False)
+            image = bpy.data.images.get(name)
+
+            if not image or image.bindcode:
+                continue
+
+            if image.gl_load():
+                print('Warning: failed to load image \"{}\" to the GPU.'.format(name))
+                self.failed.add(name)
+                continue
+
+            self._add_resident(image)
+            self.stats['uploads'] += 1
+
+    def _add_resident(self, image: bpy.types.Image):
+        size = int(image.size[0] * image.size[1] * self.bytes_per_pixel)
+
+        self.resident[image.name] = size
+        self.last_drawn[image.name] = self.frame
+        self.resident_size += size
+
+    def _remove_resident(self, name: str):
+        self.resident_size -= self.resident.pop(name)
+        self.last_drawn.pop(name, None)
+
+    def _evict(self):
+
+        while self.resident_size > self.budget and self.resident:
+            name = next(iter(self.resident))
+
+            # textures drawn by the previous frame stay loaded even over the budget, evicting them would thrash
+            if self.last_drawn.get(name, 0) >= self.frame - 1:
+                break
+
+            image = bpy.data.images.get(name)
+
+            if image:
+                image.gl_free()
+
+            self._remove_resident(name)
+            self.stats['evictions'] += 1
+            self.n_evicted += 1
+
+            render_debug('Evicted texture \"{}\"'.format(name))
+
+    @staticmethod
+    def _create_placeholder() -> int:
+        """ 1x1 mid-grey opaque texture """
+
+        buf = Buffer(GL_INT, 1)
+        glGenTextures(1, buf)
+        bindcode = buf[0]
+
+        glBindTexture(GL_TEXTURE_2D, bindcode)
+        # bgl has no unsigned byte buffers, -1 is read as 255
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, 1, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     Buffer(GL_BYTE, 4, [127, 127, 127, -1]))
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        return bindcode
+
+    @staticmethod
+    def _request_redraw() -> None:
+
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
@@ -6,3 +6,20 @@ def render_debug(message: str):
 
     if RENDER_ENGINE_DEBUG:
         print('Debug:', message)
+
+
+class OffscreenView:
+    """ Stand-in for the region and 3D view DrawingManager reads in a viewport, for drawing from a camera into
+    an offscreen framebuffer """
+
+    def __init__(self, width: int, height: int, clip_start: float = 0.1, clip_end: float = 5000.0):
+        self.width = width
+        self.height = height
+        self.view_matrix = None
+        self.perspective_matrix = None
+        self.clip_start = clip_start
+        self.clip_end = clip_end
+
+    def set_camera(self, camera_matrix: 'Matrix', projection: 'Matrix'):
+        self.view_matrix = camera_matrix.inverted()
+        self.perspective_matrix = projection @ self.view_matrix
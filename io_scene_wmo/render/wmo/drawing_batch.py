@@ -3,7 +3,7 @@ import gpu
 
 import mathutils
 
-from typing import Union
+from typing import Tuple, Union
 from bgl import *
 
 from ...wbs_kernel.wbs_kernel import CWMODrawingBatch
@@ -13,6 +13,7 @@ from .drawing_material import WMODrawingMaterial
 from ..drawing_elements import ElementTypes
 from ..utils import render_debug
 from ..bgl_ext import glCheckError
+from ..render_state import DEPTH_RANGE_SCENE, DEPTH_RANGE_SKYBOX
 
 
 class WMODrawingBatch:
@@ -41,8 +42,8 @@ class WMODrawingBatch:
         self.mat_id = self.c_batch.get_mat_id()
 
         try:
-            self.draw_material = self.draw_obj.draw_mgr.draw_materials.get(
-                self.draw_obj.bl_obj.data.materials[self.mat_id].name)
+            self.draw_material = self.draw_obj.draw_mgr.get_draw_material(
+                self.draw_obj.bl_obj.data.materials[self.mat_id])
 
         except IndexError:
             self.draw_material = None
@@ -77,18 +78,34 @@ class WMODrawingBatch:
     def sort_radius(self) -> float:
         return self.c_batch.sort_radius
 
+    @property
+    def instance_key(self):
+        """ Batches with the same key share GPU geometry and material, and can be drawn in one instanced call """
+        return None
+
+    @property
+    def texture_key(self) -> Tuple[str, ...]:
+        """ Names of bound textures, used to group batches sharing them """
+
+        if not self.draw_material:
+            return ()
+
+        return tuple(texture.name if texture else '' for texture in map(self.draw_material.get_texture, range(4)))
+
     @property
     def sort_distance(self):
+        return self.get_sort_distance(self.draw_obj.draw_mgr.region_3d.perspective_matrix.to_translation())
+
+    def get_sort_distance(self, view_position: mathutils.Vector) -> float:
 
-        perspective_mat = self.draw_obj.draw_mgr.region_3d.perspective_matrix
         bb_center = self.draw_obj.bl_obj.matrix_world @ self.bb_center
 
-        value = (perspective_mat.to_translation() - bb_center).length
+        value = (view_position - bb_center).length
 
         if self.draw_material.is_inverted or self.draw_material.is_transformed:
             result_point = bb_center * (1.0 / value) if value > 0.00000023841858 else bb_center
 
-            sort_dist = perspective_mat.to_translation().length * self.sort_radius
+            sort_dist = view_position.length * self.sort_radius
 
             result_point *= sort_dist
 
@@ -97,12 +114,32 @@ class WMODrawingBatch:
 
         return value
 
+    def get_world_bounding_sphere(self) -> Tuple[float, float, float, float]:
+
+        bl_obj = self.draw_obj.bl_obj
+
+        if not bl_obj:
+            return 0.0, 0.0, 0.0, 0.0
+
+        # skybox is always drawn
+        if self.is_skybox:
+            return 0.0, 0.0, 0.0, float('inf')
+
+        matrix_world = bl_obj.matrix_world
+        radius = self.sort_radius * max(abs(scale) for scale in matrix_world.to_scale())
+
+        return (*(matrix_world @ self.bb_center), radius)
+
     def create_vao(self):
-        self.shader = self.determine_valid_shader()
-        self.c_batch.set_program(self.shader.program)
+        self.update_state()
         self.c_batch.create_vao()
         glCheckError('Create VAO')
 
+    def update_state(self):
+        """ Cache shader of the batch, needs to be called when its material changes """
+        self.shader = self.determine_valid_shader()
+        self.c_batch.set_program(self.shader.program)
+
     def ensure_context(self):
         mat_test = self.draw_material.bl_material
 
@@ -113,19 +150,11 @@ class WMODrawingBatch:
 
     def _set_active_textures(self):
 
-        gl_texture_slots = (
-            GL_TEXTURE0,
-            GL_TEXTURE1,
-            GL_TEXTURE2,
-            GL_TEXTURE3
-        )
+        state = self.draw_obj.draw_mgr.render_state
+        textures = self.draw_obj.draw_mgr.textures
 
-        for i, gl_slot in enumerate(gl_texture_slots):
-            bind_code = self.draw_material.get_bindcode(i)
-
-            if bind_code:
-                glActiveTexture(gl_slot)
-                glBindTexture(GL_TEXTURE_2D, bind_code)
+        for i in range(len(state.texture_slots)):
+            state.bind_texture(i, textures.get_bindcode(self.draw_material.get_texture(i)))
 
     def determine_valid_shader(self) -> gpu.types.GPUShader:
 
@@ -148,7 +177,7 @@ class WMODrawingBatch:
 
         bl_obj = self.draw_obj.bl_obj
 
-        if not bl_obj.visible_get():
+        if not self.draw_obj.draw_mgr.is_object_visible(bl_obj):
             return
 
         if self.tag_free:
@@ -163,27 +192,20 @@ class WMODrawingBatch:
 
         glCheckError('drawfallback pre')
 
-        self.shader = self.determine_valid_shader()
-        self.shader.bind()
-        self.c_batch.set_program(self.shader.program)
-
-        self.shader.uniform_float('uViewProjectionMatrix', self.draw_obj.draw_mgr.region_3d.perspective_matrix)
+        state = self.draw_obj.draw_mgr.render_state
+        state.count_batch(0, 2)
 
-        self.shader.uniform_float('uPlacementMatrix', self.draw_obj.bl_obj.matrix_world)
-        self.shader.uniform_float('uSunDirAndFogStart', self.draw_obj.draw_mgr.sun_dir_and_fog_start)
-        self.shader.uniform_float('uSunColorAndFogEnd', self.draw_obj.draw_mgr.sun_color_and_fog_end)
-        self.shader.uniform_float('uAmbientLight', self.draw_obj.draw_mgr.ambient_light)
-        self.shader.uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, 1.0 / 255.0))
-        self.shader.uniform_int('UnFogged_IsAffectedByLight_LightCount', (False, True, 0))
+        state.use_shader(self.shader)
+        state.set_placement(self.draw_obj.bl_obj)
+        state.set_uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, 1.0 / 255.0))
+        state.set_uniform_int('UnFogged_IsAffectedByLight_LightCount', (False, True, 0))
 
-        glEnable(GL_DEPTH_TEST)
+        state.set_capability(GL_DEPTH_TEST, True)
+        state.set_capability(GL_CULL_FACE, False)
+        state.set_capability(GL_BLEND, False)
 
         self.c_batch.draw()
 
-        glDisable(GL_DEPTH_TEST)
-
-        gpu.shader.unbind()
-
         glCheckError('draw fallback post')
 
     def draw_wmo_batch(self):
@@ -192,6 +214,8 @@ class WMODrawingBatch:
 
         #render_debug('Drawing batch for object \"{}\"'.format(self.draw_obj.bl_obj.name))
 
+        state = self.draw_obj.draw_mgr.render_state
+
         color_name = self.draw_material.bl_material.wow_m2_material.color
         transparency_name = self.draw_material.bl_material.wow_m2_material.transparency
         color = self.context.scene.wow_m2_colors[color_name].color if color_name else (1.0, 1.0, 1.0, 1.0)
@@ -207,85 +231,36 @@ class WMODrawingBatch:
         u_alpha_test = 128.0 / 255.0 * combined_color[3] \
             if self.draw_material.blend_mode.index == EGxBLend.AlphaKey.index else 1.0 / 255.0  # Maybe move this to shader logic?
 
-        self._set_active_textures()
+        state.count_batch(self.draw_material.texture_count, 4)
 
-        self.shader = self.determine_valid_shader()
-        self.shader.bind()
-        glCheckError('Pre-link program')
-        self.c_batch.set_program(self.shader.program)
-        glCheckError('Post-link program')
+        state.use_shader(self.shader)
+        self._set_active_textures()
 
         # draw
-        if self.draw_material.depth_culling:
-            glEnable(GL_DEPTH_TEST)
-
-        glDepthMask(GL_TRUE if self.draw_material.depth_write else GL_FALSE)
-
-        if self.draw_material.backface_culling:
-            glEnable(GL_CULL_FACE)
-
-        if self.draw_material.blend_mode.blending_enabled:
-            glEnable(GL_BLEND)
+        state.set_capability(GL_DEPTH_TEST, self.draw_material.depth_culling)
+        state.set_depth_mask(self.draw_material.depth_write)
+        state.set_capability(GL_CULL_FACE, self.draw_material.backface_culling)
+        state.set_capability(GL_BLEND, self.draw_material.blend_mode.blending_enabled)
 
         if self.is_skybox:
-            glDepthRange(0.998, 1.0)
+            state.set_depth_range(*DEPTH_RANGE_SKYBOX)
+        elif state.depth_range == DEPTH_RANGE_SKYBOX:
+            state.set_depth_range(*DEPTH_RANGE_SCENE)
 
-        glBlendFunc(self.draw_material.blend_mode.src_color, self.draw_material.blend_mode.dest_color)
+        state.set_blend_func(self.draw_material.blend_mode.src_color, self.draw_material.blend_mode.dest_color)
         # OpenGLUtils.glBlendFuncSeparate(self.draw_material.blend_mode.src_color,
         #                                 self.draw_material.blend_mode.dest_color,
         #                                 self.draw_material.blend_mode.src_alpha,
         #                                 self.draw_material.blend_mode.dest_alpha)
 
-        self.shader.uniform_float('uViewProjectionMatrix', self.draw_obj.draw_mgr.region_3d.perspective_matrix)
-
-        self.shader.uniform_float('uPlacementMatrix', self.draw_obj.bl_obj.matrix_world)
-        self.shader.uniform_float('uSunDirAndFogStart', self.draw_obj.draw_mgr.sun_dir_and_fog_start)
-        self.shader.uniform_float('uSunColorAndFogEnd', self.draw_obj.draw_mgr.sun_color_and_fog_end)
-        self.shader.uniform_float('uAmbientLight', self.draw_obj.draw_mgr.ambient_light)
-        self.shader.uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, u_alpha_test))
-        self.shader.uniform_int('UnFogged_IsAffectedByLight_LightCount', (self.draw_material.is_unfogged,
-                                                                          not self.draw_material.is_unlit, 0))
-
-        try:
-            self.shader.uniform_int('uTexture', 0)
-        except ValueError:
-            pass
-
-        try:
-            self.shader.uniform_int('uTexture2', 1)
-        except ValueError:
-            pass
-
-        try:
-            self.shader.uniform_int('uTexture3', 2)
-        except ValueError:
-            pass
-
-        try:
-            self.shader.uniform_int('uTexture4', 3)
-        except ValueError:
-            pass
-
-        self.shader.uniform_float('color_Transparency', combined_color)
+        state.set_placement(self.draw_obj.bl_obj)
+        state.set_uniform_float('uFogColorAndAlphaTest', (*self.draw_obj.draw_mgr.fog_color, u_alpha_test))
+        state.set_uniform_int('UnFogged_IsAffectedByLight_LightCount', (self.draw_material.is_unfogged,
+                                                                        not self.draw_material.is_unlit, 0))
+        state.set_uniform_float('color_Transparency', combined_color)
 
         self.c_batch.draw()
 
-        if self.is_skybox:
-            glDepthRange(0, 0.996)
-
-        if self.draw_material.blend_mode.blending_enabled:
-            glDisable(GL_BLEND)
-
-        if self.draw_material.backface_culling:
-            glDisable(GL_CULL_FACE)
-
-        glDepthMask(GL_FALSE if self.draw_material.depth_write else GL_TRUE)
-
-        if self.draw_material.depth_culling:
-            glDisable(GL_DEPTH_TEST)
-
-        gpu.shader.unbind()
-
         glCheckError('draw end')
 
     def free(self):
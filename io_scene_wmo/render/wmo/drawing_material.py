@@ -75,15 +75,3 @@ class WMODrawingMaterial:
         self.is_window = '32' in bl_material.wow_wmo_material.render_flags
         self.clamp_s = '64' in bl_material.wow_wmo_material.render_flags
         self.clamp_t = '128' in bl_material.wow_wmo_material.render_flags
-
-    def get_bindcode(self, tex_index: int) -> int:
-
-        texture = self.get_texture(tex_index)
-
-        if texture:
-            if not texture.bindcode:
-                texture.gl_load()
-
-            return texture.bindcode
-
-        return 0
@@ -1,10 +1,11 @@
 import os
+import bpy
 import gpu
 
 from enum import IntEnum
 from ctypes import c_uint, c_uint8
 from collections import namedtuple
-from typing import Dict, Tuple
+from typing import Dict, Set, Tuple
 
 from ...utils.misc import singleton, Sequence
 from ..shaders import ShaderPermutationsManager
@@ -153,6 +154,15 @@ class WMOShaderPermutations(ShaderPermutationsManager):
 
     shader_source_path = 'wmo_shader'
 
+    def get_scene_permutations(self) -> Set[Tuple[int, int]]:
+        records = [record.value for record in WMOShaderTable]
+        shader_ids = {int(mat.wow_wmo_material.shader) for mat in bpy.data.materials if mat.wow_wmo_material.enabled}
+
+        return {(records[i].vertex_shader, records[i].pixel_shader) for i in shader_ids if i < len(records)}
+
+    def get_all_permutations(self) -> Set[Tuple[int, int]]:
+        return {(record.value.vertex_shader, record.value.pixel_shader) for record in WMOShaderTable}
+
     @staticmethod
     def get_shader_combo_index(vertex_shader_id: int, pixel_shader_id: int):
 
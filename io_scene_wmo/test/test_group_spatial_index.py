@@ -0,0 +1,131 @@
+""" Tests of nearest WMO group queries against a brute-force search over all groups.
+
+Run from Blender with the addon installed:
+    blender --background --factory-startup --python test/test_group_spatial_index.py -- [addon_module_name]
+"""
+
+import sys
+import bpy
+import random
+import unittest
+import importlib
+
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+
+
+ADDON_NAME = 'io_scene_wmo'
+
+BOX_FACES = ((0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3))
+
+
+def create_box_group(name: str, center, half_size) -> bpy.types.Object:
+    """ Create a closed box mesh object, groups are hollow so points inside have a positive surface distance """
+
+    verts = [(x, y, z) for x in (-half_size[0], half_size[0])
+                       for y in (-half_size[1], half_size[1])
+                       for z in (-half_size[2], half_size[2])]
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], BOX_FACES)
+
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = center
+    bpy.context.scene.collection.objects.link(obj)
+
+    return obj
+
+
+class GroupSpatialIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        spatial = importlib.import_module('{}.wmo.utils.spatial'.format(ADDON_NAME))
+        misc = importlib.import_module('{}.utils.misc'.format(ADDON_NAME))
+
+        self.index_type = spatial.GroupSpatialIndex
+        self.get_mesh_world_data = misc.get_mesh_world_data
+        self.objects = []
+
+    def tearDown(self):
+        for obj in self.objects:
+            mesh = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            bpy.data.meshes.remove(mesh)
+
+    def add_group(self, center, half_size) -> bpy.types.Object:
+        obj = create_box_group('Group{}'.format(len(self.objects)), center, half_size)
+        self.objects.append(obj)
+
+        return obj
+
+    def get_surface_distances(self, point: Vector):
+        """ Get the distance from a point to the surface of every group with a BVH tree of its own """
+
+        distances = []
+
+        for obj in self.objects:
+            co, polygons, _, _ = self.get_mesh_world_data(obj)
+            bvh_tree = BVHTree.FromPolygons(co.tolist(), polygons, all_triangles=False)
+            distances.append(bvh_tree.find_nearest(point)[3])
+
+        return distances
+
+    def assert_matches_brute_force(self, index, point: Vector, count: int):
+
+        distances = self.get_surface_distances(point)
+        expected = sorted(distances)[:count]
+        result = index.find_nearest(point, count)
+
+        self.assertEqual(len(result), len(expected))
+
+        # equally distant groups may be returned in either order, so distances are compared
+        for (obj, dist), expected_dist in zip(result, expected):
+            self.assertAlmostEqual(dist, expected_dist, places=4, msg='point {}'.format(tuple(point)))
+            self.assertAlmostEqual(distances[self.objects.index(obj)], dist, places=4)
+
+    def test_group_inside_group(self):
+        """ Point inside a large group is nearer to a small group whose box does not contain it """
+
+        outer = self.add_group((0.0, 0.0, 0.0), (10.0, 10.0, 10.0))
+        inner = self.add_group((6.5, 0.0, 0.0), (0.5, 0.5, 0.5))
+        bpy.context.view_layer.update()
+
+        index = self.index_type(self.objects)
+        point = Vector((8.0, 0.0, 0.0))
+
+        self.assertIs(index.find_nearest_group(point), inner)
+        self.assertEqual([obj for obj, _ in index.find_nearest(point, 2)], [inner, outer])
+
+    def test_overlapping_groups_random(self):
+        """ Random overlapping groups, as groups of a WMO are, compared to a brute-force search """
+
+        rng = random.Random(0)
+
+        for _ in range(12):
+            self.add_group([rng.uniform(-5.0, 5.0) for _ in range(3)],
+                           [rng.choice((0.5, 1.0, 2.0, 4.0, 8.0)) for _ in range(3)])
+
+        bpy.context.view_layer.update()
+        index = self.index_type(self.objects)
+
+        for _ in range(200):
+            point = Vector([rng.uniform(-10.0, 10.0) for _ in range(3)])
+
+            for count in (1, 2):
+                self.assert_matches_brute_force(index, point, count)
+
+
+def main():
+    global ADDON_NAME
+
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    ADDON_NAME = argv[0] if argv else ADDON_NAME
+
+    result = unittest.TextTestRunner(verbosity=2).run(
+        unittest.defaultTestLoader.loadTestsFromTestCase(GroupSpatialIndexTest))
+
+    sys.exit(not result.wasSuccessful())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+""" Tests of doodad color and portal relation baking against the linear nearest group search they replaced.
+
+Run from Blender with the addon installed:
+    blender --background --factory-startup --python test/test_nearest_group_assignment.py -- [addon_module_name]
+"""
+
+import sys
+import bpy
+import random
+import unittest
+import importlib
+import addon_utils
+
+from mathutils import Vector
+from mathutils.kdtree import KDTree
+
+
+ADDON_NAME = 'io_scene_wmo'
+
+BOX_FACES = ((0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3))
+
+# baked colors are opaque, so a transparent color marks doodads left unbaked
+UNBAKED_COLOR = (0.0, 0.0, 0.0, 0.0)
+
+
+def create_box(name: str, center, half_size) -> bpy.types.Object:
+
+    verts = [(x, y, z) for x in (-half_size[0], half_size[0])
+                       for y in (-half_size[1], half_size[1])
+                       for z in (-half_size[2], half_size[2])]
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], BOX_FACES)
+
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = center
+    bpy.context.scene.collection.objects.link(obj)
+
+    return obj
+
+
+def find_nearest_object(obj_, objects):
+    """ Nearest group of a doodad, as found before the spatial index """
+
+    dist = sys.float_info.max
+    result = None
+
+    for obj in objects:
+        obj_location_relative = obj.matrix_world.inverted() @ obj_.location
+        hit = obj.closest_point_on_mesh(obj_location_relative)
+        hit_dist = (obj_location_relative - hit[1]).length
+        if hit_dist < dist:
+            dist = hit_dist
+            result = obj
+
+    return result
+
+
+def find_nearest_objects_pair(object, objects):
+    """ Two nearest groups of a portal, as found before the spatial index """
+
+    pairs = []
+
+    for obj in objects:
+        hit = obj.closest_point_on_mesh(
+            obj.matrix_world.inverted() @ (object.matrix_world @ object.data.polygons[0].center))
+        hit_dist = (obj.matrix_world @ hit[1] - object.matrix_world @ object.data.polygons[0].center).length
+        pairs.append((obj, hit_dist))
+
+    pairs.sort(key=lambda x: x[1])
+
+    return pairs[0][0], pairs[1][0]
+
+
+def get_object_radius(obj):
+
+    corner_min = [32767, 32767, 32767]
+    corner_max = [0, 0, 0]
+
+    for vertex in obj.data.vertices:
+        for i in range(3):
+            corner_min[i] = min(corner_min[i], vertex.co[i])
+            corner_max[i] = max(corner_max[i], vertex.co[i])
+
+    result = (Vector(corner_min) - Vector(corner_max))
+    return (abs(result.x) + abs(result.y) + abs(result.z)) / 3
+
+
+def gen_doodad_color(obj, group):
+    """ Doodad color, as calculated before the doodad color baker """
+
+    mesh = group.data
+
+    kd_tree = KDTree(len(mesh.polygons))
+
+    for index, poly in enumerate(mesh.polygons):
+        kd_tree.insert(group.matrix_world @ poly.center, index)
+
+    kd_tree.balance()
+
+    polygons = kd_tree.find_range(obj.location, get_object_radius(obj))
+
+    if not polygons:
+        polygons.append(kd_tree.find(obj.location))
+
+    colors = []
+
+    for poly in polygons:
+        for loop_index in mesh.polygons[poly[1]].loop_indices:
+            colors.append(mesh.vertex_colors['Col'].data[loop_index].color)
+
+    final_color = Vector((0, 0, 0, 0))
+
+    for color in colors:
+        final_color += Vector(color)
+
+    final_color = final_color / len(colors)
+
+    root = bpy.context.scene.wow_wmo_root
+
+    if "2" in root.flags and group.wow_wmo_group.place_type == '8192':
+        final_color += Vector(tuple([c / 2 for c in root.ambient_color]))
+
+    return [pow(x, 2.2) for x in final_color]
+
+
+class NearestGroupAssignmentTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        addon_utils.enable(ADDON_NAME, default_set=True)
+
+    def setUp(self):
+        doodad_colors = importlib.import_module('{}.wmo.utils.doodad_colors'.format(ADDON_NAME))
+        spatial = importlib.import_module('{}.wmo.utils.spatial'.format(ADDON_NAME))
+
+        self.baker_type = doodad_colors.DoodadColorBaker
+        self.index_type = spatial.GroupSpatialIndex
+        self.rng = random.Random(0)
+        self.objects = []
+        self.groups = []
+
+        scene = bpy.context.scene
+        scene.wow_wmo_root.flags = {'2'}
+        scene.wow_wmo_root.ambient_color = (0.2, 0.1, 0.3, 1.0)
+
+    def tearDown(self):
+        for obj in self.objects:
+            mesh = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            bpy.data.meshes.remove(mesh)
+
+    def add_object(self, center, half_size) -> bpy.types.Object:
+        obj = create_box('Object{}'.format(len(self.objects)), center, half_size)
+        self.objects.append(obj)
+
+        return obj
+
+    def add_groups(self, n_groups: int):
+        """ Add overlapping groups with random vertex colors, some of them indoor or without vertex colors """
+
+        for i in range(n_groups):
+            obj = self.add_object([self.rng.uniform(-5.0, 5.0) for _ in range(3)],
+                                  [self.rng.choice((0.5, 1.0, 2.0, 4.0, 8.0)) for _ in range(3)])
+
+            mesh = obj.data
+            mesh.vertex_colors.new(name='Col')
+
+            for loop_color in mesh.vertex_colors['Col'].data:
+                loop_color.color = [self.rng.random() for _ in range(3)] + [1.0]
+
+            obj.wow_wmo_group.enabled = True
+            obj.wow_wmo_group.flags = set() if i % 5 == 4 else {'0'}
+            obj.wow_wmo_group.place_type = '8192' if i % 2 else '8'
+
+            self.groups.append(obj)
+
+    def test_doodad_colors(self):
+        """ Baked doodad colors equal colors found with the linear nearest group search """
+
+        self.add_groups(12)
+        doodads = []
+
+        for _ in range(300):
+            obj = self.add_object([self.rng.uniform(-10.0, 10.0) for _ in range(3)],
+                                  [self.rng.uniform(0.1, 3.0)] * 3)
+            obj.wow_wmo_doodad.enabled = True
+            obj.wow_wmo_doodad.self_pointer = obj
+            obj.wow_wmo_doodad.color = UNBAKED_COLOR
+            doodads.append(obj)
+
+        bpy.context.view_layer.update()
+
+        expected = []
+
+        for obj in doodads:
+            group = find_nearest_object(obj, self.groups)
+
+            if '0' not in group.wow_wmo_group.flags:
+                expected.append(UNBAKED_COLOR)
+            else:
+                # doodad color property is clamped to [0, 1]
+                expected.append(tuple(min(max(x, 0.0), 1.0) for x in gen_doodad_color(obj, group)))
+
+        n_baked = self.baker_type(bpy.context.scene).bake(doodads)
+
+        self.assertEqual(n_baked, sum(1 for color in expected if color != UNBAKED_COLOR))
+
+        for obj, color in zip(doodads, expected):
+            for value, expected_value in zip(obj.wow_wmo_doodad.color, color):
+                self.assertAlmostEqual(value, expected_value, places=4, msg=obj.name)
+
+    def test_portal_relations(self):
+        """ Portal relations equal the two nearest groups found with the linear search """
+
+        self.add_groups(12)
+        portals = []
+
+        for _ in range(200):
+            obj = self.add_object([self.rng.uniform(-10.0, 10.0) for _ in range(3)], (1.0, 1.0, 1.0))
+            portals.append(obj)
+
+        bpy.context.view_layer.update()
+
+        index = self.index_type(self.groups)
+
+        for obj in portals:
+            expected = find_nearest_objects_pair(obj, self.groups)
+            result = index.find_nearest(obj.matrix_world @ obj.data.polygons[0].center, count=2)
+
+            self.assertEqual(tuple(group for group, _ in result), expected, msg=obj.name)
+
+
+def main():
+    global ADDON_NAME
+
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    ADDON_NAME = argv[0] if argv else ADDON_NAME
+
+    result = unittest.TextTestRunner(verbosity=2).run(
+        unittest.defaultTestLoader.loadTestsFromTestCase(NearestGroupAssignmentTest))
+
+    sys.exit(not result.wasSuccessful())
+
+
+if __name__ == '__main__':
+    main()
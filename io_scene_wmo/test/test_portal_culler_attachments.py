@@ -0,0 +1,165 @@
+""" Tests of doodads attached to WMO groups by the viewport portal culler.
+
+Run from Blender with the addon installed:
+    blender --background --factory-startup --python test/test_portal_culler_attachments.py -- [addon_module_name]
+"""
+
+import sys
+import bpy
+import random
+import unittest
+import importlib
+import addon_utils
+
+from mathutils import Vector
+
+
+ADDON_NAME = 'io_scene_wmo'
+
+BOX_FACES = ((0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3))
+
+
+def create_box(name: str, center, half_size) -> bpy.types.Object:
+
+    verts = [(x, y, z) for x in (-half_size[0], half_size[0])
+                       for y in (-half_size[1], half_size[1])
+                       for z in (-half_size[2], half_size[2])]
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts, [], BOX_FACES)
+
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = center
+    bpy.context.scene.collection.objects.link(obj)
+
+    return obj
+
+
+def find_nearest_group(point: Vector, groups):
+    """ Group with the nearest surface, searched linearly, the first one wins ties """
+
+    result = None
+    dist = float('inf')
+
+    for obj in groups:
+        local_point = obj.matrix_world.inverted() @ point
+        hit = obj.closest_point_on_mesh(local_point)
+        hit_dist = (obj.matrix_world @ hit[1] - point).length
+
+        if hit_dist < dist:
+            dist = hit_dist
+            result = obj
+
+    return result
+
+
+class PortalCullerAttachmentTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        addon_utils.enable(ADDON_NAME, default_set=True)
+
+    def setUp(self):
+        portal_culling = importlib.import_module('{}.render.portal_culling'.format(ADDON_NAME))
+
+        self.culler = portal_culling.PortalCuller()
+        self.rng = random.Random(0)
+        self.objects = []
+        self.groups = []
+        self.doodads = []
+
+    def tearDown(self):
+        for obj in self.objects:
+            mesh = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            bpy.data.meshes.remove(mesh)
+
+    def add_object(self, center, half_size) -> bpy.types.Object:
+        obj = create_box('Object{}'.format(len(self.objects)), center, half_size)
+        self.objects.append(obj)
+
+        return obj
+
+    def add_group(self, center, half_size) -> bpy.types.Object:
+        obj = self.add_object(center, half_size)
+        obj.wow_wmo_group.enabled = True
+        self.groups.append(obj)
+
+        return obj
+
+    def add_doodad(self, center) -> bpy.types.Object:
+        obj = self.add_object(center, (0.1, 0.1, 0.1))
+        obj.wow_wmo_doodad.enabled = True
+        self.doodads.append(obj)
+
+        return obj
+
+    def assert_attached_to_nearest(self):
+
+        for obj in self.doodads:
+            group = find_nearest_group(obj.matrix_world.translation, self.groups)
+
+            self.assertEqual(self.culler.doodad_groups.get(obj.name), group.name, msg=obj.name)
+            self.assertIn(obj.name, self.culler.attachments[group.name])
+
+        n_attached = sum(len(names) for names in self.culler.attachments.values())
+        self.assertEqual(n_attached, len(self.doodads))
+
+    def test_doodad_near_group_inside_group(self):
+        """ Doodad inside a large group is attached to a nearer small group whose box does not contain it """
+
+        outer = self.add_group((0.0, 0.0, 0.0), (10.0, 10.0, 10.0))
+        inner = self.add_group((6.5, 0.0, 0.0), (0.5, 0.5, 0.5))
+        doodad = self.add_doodad((8.0, 0.0, 0.0))
+        bpy.context.view_layer.update()
+
+        self.culler.rebuild(bpy.context.scene)
+        self.assertEqual(self.culler.doodad_groups[doodad.name], inner.name)
+
+        doodad.location = (-8.0, 0.0, 0.0)
+        bpy.context.view_layer.update()
+
+        self.culler.update_object(doodad)
+        self.assertEqual(self.culler.doodad_groups[doodad.name], outer.name)
+        self.assertEqual(self.culler.attachments[inner.name], [])
+
+    def test_overlapping_groups_random(self):
+        """ Doodads among random overlapping groups, attached on rebuild and after being moved """
+
+        for _ in range(12):
+            self.add_group([self.rng.uniform(-5.0, 5.0) for _ in range(3)],
+                           [self.rng.choice((0.5, 1.0, 2.0, 4.0, 8.0)) for _ in range(3)])
+
+        for _ in range(100):
+            self.add_doodad([self.rng.uniform(-10.0, 10.0) for _ in range(3)])
+
+        bpy.context.view_layer.update()
+
+        self.culler.rebuild(bpy.context.scene)
+        self.assert_attached_to_nearest()
+
+        for obj in self.doodads[:50]:
+            obj.location = [self.rng.uniform(-10.0, 10.0) for _ in range(3)]
+
+        bpy.context.view_layer.update()
+
+        for obj in self.doodads[:50]:
+            self.culler.update_object(obj)
+
+        self.assert_attached_to_nearest()
+
+
+def main():
+    global ADDON_NAME
+
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    ADDON_NAME = argv[0] if argv else ADDON_NAME
+
+    result = unittest.TextTestRunner(verbosity=2).run(
+        unittest.defaultTestLoader.loadTestsFromTestCase(PortalCullerAttachmentTest))
+
+    sys.exit(not result.wasSuccessful())
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,11 @@ import bpy
 from bpy.app.handlers import persistent
 
 from ..utils.misc import load_game_data
+from ..utils.profiling import profile_handler
 
 
 @persistent
+@profile_handler()
 def _load_game_data(scene):
     load_game_data()
 
@@ -7,6 +7,8 @@ from ..wmo.export_wmo import export_wmo_from_blender_scene
 from ..m2.import_m2 import import_m2
 from ..m2.export_m2 import export_m2
 from ..utils.misc import load_game_data
+from ..utils.profiling import HandlerProfiler
+from ..render.frame_profiler import FrameProfiler
 
 #############################################################
 ######                 Common operators                ######
@@ -35,6 +37,27 @@ class WBS_OT_texture_transparency_toggle(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class WBS_OT_message_box(bpy.types.Operator):
+    bl_idname = 'wow.message_box'
+    bl_label = 'Message Box'
+    bl_description = 'Show a message popup in the window of the given context'
+    bl_options = {'INTERNAL'}
+
+    message: StringProperty()
+    title: StringProperty(default='Message Box')
+    icon: StringProperty(default='INFO')
+
+    def execute(self, context):
+        message = self.message
+
+        def draw(self, context):
+            self.layout.label(text=message)
+
+        context.window_manager.popup_menu(draw, title=self.title, icon=self.icon)
+
+        return {'FINISHED'}
+
+
 class WBS_OT_reload_game_data(bpy.types.Operator):
     bl_idname = 'scene.reload_wow_filesystem'
     bl_label = 'Reoad WoW filesystem'
@@ -62,6 +85,78 @@ class WBS_OT_reload_game_data(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class WBS_OT_handler_stats_dump(bpy.types.Operator, ExportHelper):
+    """Save handler execution time statistics to a JSON file"""
+    bl_idname = 'wow.dump_handler_stats'
+    bl_label = 'Dump Handler Statistics'
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".json"
+
+    filter_glob: StringProperty(
+        default="*.json",
+        options={'HIDDEN'}
+    )
+
+    def execute(self, context):
+        HandlerProfiler.dump_json(self.filepath)
+        self.report({'INFO'}, "Handler statistics saved to \"{}\".".format(self.filepath))
+
+        return {'FINISHED'}
+
+
+class WBS_OT_handler_stats_reset(bpy.types.Operator):
+    bl_idname = 'wow.reset_handler_stats'
+    bl_label = 'Reset Handler Statistics'
+    bl_description = 'Discard recorded handler execution times'
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        HandlerProfiler.reset()
+
+        return {'FINISHED'}
+
+
+class WBS_OT_frame_stats_dump(bpy.types.Operator, ExportHelper):
+    """Save frame timings and counters of the WoW viewport render engine to a JSON file"""
+    bl_idname = 'wow.dump_frame_stats'
+    bl_label = 'Dump Frame Statistics'
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".json"
+
+    filter_glob: StringProperty(
+        default="*.json",
+        options={'HIDDEN'}
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return FrameProfiler.active is not None
+
+    def execute(self, context):
+        FrameProfiler.active.dump_json(self.filepath)
+        self.report({'INFO'}, "Frame statistics saved to \"{}\".".format(self.filepath))
+
+        return {'FINISHED'}
+
+
+class WBS_OT_frame_stats_reset(bpy.types.Operator):
+    bl_idname = 'wow.reset_frame_stats'
+    bl_label = 'Reset Frame Statistics'
+    bl_description = 'Discard recorded frame timings and counters'
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return FrameProfiler.active is not None
+
+    def execute(self, context):
+        FrameProfiler.active.reset()
+
+        return {'FINISHED'}
+
+
 #############################################################
 ######             Import/Export Operators             ######
 #############################################################
@@ -1,6 +1,7 @@
 import bpy
 from .. import ui_icons
 from ..utils.callbacks import on_release
+from ..utils.profiling import HandlerProfiler
 
 
 class WBS_PT_wow_scene(bpy.types.Panel):
@@ -71,12 +72,87 @@ class WOW_PT_render_settings(bpy.types.Panel):
         col.label(text='Sun Direciton:')
         col.prop(context.scene.wow_render_settings, "sun_direction", text='')
 
+        col.label(text='Viewport:')
+        col.prop(context.scene.wow_render_settings, "frustum_culling")
+        col.prop(context.scene.wow_render_settings, "portal_culling")
+
+        row = col.row()
+        row.enabled = context.scene.wow_render_settings.portal_culling
+        row.prop(context.scene.wow_render_settings, "portal_culling_overlay")
+
+        col.prop(context.scene.wow_render_settings, "shader_warm_up")
+        col.prop(context.scene.wow_render_settings, "texture_budget")
+        col.prop(context.scene.wow_render_settings, "drawing_object_lifetime")
+        col.prop(context.scene.wow_render_settings, "lod_selection")
+
+        row = col.row()
+        row.enabled = context.scene.wow_render_settings.lod_selection
+        row.prop(context.scene.wow_render_settings, "lod_screen_size")
+
+        col.prop(context.scene.wow_render_settings, "occlusion_culling")
+
+        col.label(text='Profiling:')
+        col.prop(context.scene.wow_render_settings, "frame_profiling")
+
+        row = col.row()
+        row.enabled = context.scene.wow_render_settings.frame_profiling
+        row.prop(context.scene.wow_render_settings, "frame_profiling_overlay")
+
+        row = col.row(align=True)
+        row.enabled = context.scene.wow_render_settings.frame_profiling
+        row.operator("wow.dump_frame_stats", icon='EXPORT')
+        row.operator("wow.reset_frame_stats", icon='TRASH')
+
 
     @classmethod
     def poll(cls, context):
         return context.scene is not None
 
 
+class WBS_PT_handler_profiling(bpy.types.Panel):
+    bl_space_type = "PROPERTIES"
+    bl_region_type = "WINDOW"
+    bl_context = "scene"
+    bl_label = "WoW Handler Profiling"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+
+        col = layout.column()
+        col.label(text='Budget: {:.2f} ms'.format(HandlerProfiler.budget_ms))
+
+        summary = HandlerProfiler.summary()
+
+        if not summary:
+            col.label(text='No handler invocations recorded.')
+
+        for name, stats in summary.items():
+            box = col.box()
+            box.label(text=name, icon='TIME')
+
+            row = box.row()
+            row.label(text='Calls: {}'.format(stats['count']))
+            row.label(text='Over budget: {}'.format(stats['over_budget']))
+
+            row = box.row()
+            row.label(text='Mean: {:.2f} ms'.format(stats['mean']))
+            row.label(text='Max: {:.2f} ms'.format(stats['max']))
+
+            row = box.row()
+            row.label(text='P50: {:.2f} ms'.format(stats['p50']))
+            row.label(text='P95: {:.2f} ms'.format(stats['p95']))
+            row.label(text='P99: {:.2f} ms'.format(stats['p99']))
+
+        row = layout.row(align=True)
+        row.operator("wow.dump_handler_stats", icon='EXPORT')
+        row.operator("wow.reset_handler_stats", icon='TRASH')
+
+    @classmethod
+    def poll(cls, context):
+        return HandlerProfiler.enabled
+
+
 @on_release()
 def update_ext_ambient_color(self, context):
     properties = bpy.data.node_groups.get('MO_Properties')
@@ -165,6 +241,84 @@ class WoWRenderSettingsPropertyGroup(bpy.types.PropertyGroup):
         default=1000.0
     )
 
+    frustum_culling: bpy.props.BoolProperty(
+        name='Frustum Culling',
+        description='Skip drawing of batches outside of the view in the WoW viewport render engine',
+        default=True
+    )
+
+    portal_culling: bpy.props.BoolProperty(
+        name='Portal Culling',
+        description='Draw only WMO groups and their doodads reachable from the camera through portals',
+        default=False
+    )
+
+    portal_culling_overlay: bpy.props.BoolProperty(
+        name='Portal Culling Overlay',
+        description='Display bounding boxes of visible (green) and culled (red) WMO groups',
+        default=False
+    )
+
+    shader_warm_up: bpy.props.EnumProperty(
+        name='Shader Warm-up',
+        description='Compile shader permutations in the background when the WoW viewport render engine starts',
+        items=[('NONE', 'None', 'Compile shaders on first use'),
+               ('SCENE', 'Scene', 'Compile shaders used by materials of the current file'),
+               ('ALL', 'All', 'Compile every shader combination')],
+        default='SCENE'
+    )
+
+    texture_budget: bpy.props.IntProperty(
+        name='Texture Budget (MB)',
+        description='Estimated GPU memory for textures of the WoW viewport render engine, '
+                    'least recently drawn textures over it are unloaded',
+        min=16,
+        default=512
+    )
+
+    drawing_object_lifetime: bpy.props.FloatProperty(
+        name='Unload Delay (s)',
+        description='Seconds an object stays out of view before its drawing data is freed by the WoW viewport '
+                    'render engine, objects are loaded again when they come back into view',
+        min=0.0,
+        default=10.0
+    )
+
+    lod_selection: bpy.props.BoolProperty(
+        name='LOD Selection',
+        description='Draw distant M2 geosets with lower detail levels imported from skin profiles',
+        default=False
+    )
+
+    lod_screen_size: bpy.props.FloatProperty(
+        name='LOD Screen Size',
+        description='Projected size, as a fraction of viewport height, below which the first lower detail level '
+                    'is drawn, every further level is drawn below half of the previous size',
+        subtype='FACTOR',
+        min=0.001,
+        max=1.0,
+        default=0.2
+    )
+
+    occlusion_culling: bpy.props.BoolProperty(
+        name='Occlusion Culling',
+        description='Skip doodads and M2 models hidden behind opaque WMO group geometry drawn in the previous frame',
+        default=False
+    )
+
+    frame_profiling: bpy.props.BoolProperty(
+        name='Frame Profiling',
+        description='Measure CPU time of frame phases, GPU time of render passes and per-frame counters '
+                    'of the WoW viewport render engine',
+        default=False
+    )
+
+    frame_profiling_overlay: bpy.props.BoolProperty(
+        name='Profiling Overlay',
+        description='Display frame timings and counters in the viewport',
+        default=True
+    )
+
 
 def update_screen_3d(self, context):
 
@@ -1,9 +1,10 @@
 import bpy
 import os
-import sys
+import numpy as np
 
 from mathutils import Vector
 from collections import namedtuple
+from typing import List, Tuple
 
 from ..pywowlib import WoWVersionManager
 from ..pywowlib.archives.wow_filesystem import WoWFileData
@@ -51,23 +52,6 @@ def singleton(class_):
     return getinstance
 
 
-def find_nearest_object(obj_, objects):
-    """Get closest object to another object"""
-
-    dist = sys.float_info.max
-    result = None
-
-    for obj in objects:
-        obj_location_relative = obj.matrix_world.inverted() @ obj_.location
-        hit = obj.closest_point_on_mesh(obj_location_relative)
-        hit_dist = (obj_location_relative - hit[1]).length
-        if hit_dist < dist:
-            dist = hit_dist
-            result = obj
-
-    return result
-
-
 def parse_bitfield(bitfield, last_flag=0x1000):
 
     flags = set()
@@ -188,6 +172,47 @@ def get_obj_boundbox_world(obj):
     return tuple(obj.matrix_world @ Vector(obj.bound_box[0])), tuple(obj.matrix_world @ Vector(obj.bound_box[6]))
 
 
+def get_mesh_world_data(obj: bpy.types.Object) -> Tuple[np.ndarray, List[List[int]], np.ndarray, np.ndarray]:
+    """ Get world-space copies of vertex positions, polygon indices, polygon centers and normals of a mesh object """
+
+    mesh = obj.data
+
+    n_verts = len(mesh.vertices)
+    n_polys = len(mesh.polygons)
+
+    co = np.empty(n_verts * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+
+    centers = np.empty(n_polys * 3, dtype=np.float32)
+    mesh.polygons.foreach_get('center', centers)
+
+    normals = np.empty(n_polys * 3, dtype=np.float32)
+    mesh.polygons.foreach_get('normal', normals)
+
+    loop_starts = np.empty(n_polys, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_starts)
+
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_verts)
+
+    matrix = np.array(obj.matrix_world, dtype=np.float32)
+    rot_scale = matrix[:3, :3]
+    translation = matrix[:3, 3]
+    normal_matrix = np.array(obj.matrix_world.to_3x3().inverted_safe().transposed(), dtype=np.float32)
+
+    co = co.reshape(-1, 3) @ rot_scale.T + translation
+    centers = centers.reshape(-1, 3) @ rot_scale.T + translation
+
+    normals = normals.reshape(-1, 3) @ normal_matrix.T
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    normals /= lengths[:, None]
+
+    polygons = [indices.tolist() for indices in np.split(loop_verts, loop_starts[1:])] if n_polys else []
+
+    return co, polygons, centers, normals
+
+
 def get_objs_boundbox_world(objects):
     corner1 = [32768, 32768, 32768]
     corner2 = [-32768, -32768, -32768]
@@ -269,7 +294,17 @@ def draw_spoiler(layout, data, toggle_prop_name, name="", data1=None, layout_ena
         return content
 
 
-def show_message_box(message = "", title = "Message Box", icon = 'INFO'):
+def show_message_box(message = "", title = "Message Box", icon = 'INFO', override = None):
+    """ Show a popup, code running without a window (timers) passes a context override containing one """
+
+    if override is not None:
+
+        if 'window' not in override:
+            print('{}: {}'.format(title, message))
+            return
+
+        bpy.ops.wow.message_box(override, message=message, title=title, icon=icon)
+        return
 
     def draw(self, context):
         self.layout.label(text=message)
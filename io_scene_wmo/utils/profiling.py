@@ -0,0 +1,112 @@
+import json
+
+from collections import deque
+from time import perf_counter
+from typing import Dict, List
+
+from ..third_party.boltons.funcutils import wraps
+from .callbacks import parametrized
+
+
+class HandlerStats:
+    """ Execution time samples of a single handler, in milliseconds """
+
+    def __init__(self, max_samples: int):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.over_budget = 0
+
+    def add(self, duration: float, budget: float):
+        self.samples.append(duration)
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+        if budget and duration > budget:
+            self.over_budget += 1
+
+    @staticmethod
+    def percentile(sorted_samples: List[float], fraction: float) -> float:
+        if not sorted_samples:
+            return 0.0
+
+        return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+
+    def summary(self) -> Dict[str, float]:
+        samples = sorted(self.samples)
+
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(samples, 0.5),
+            'p95': self.percentile(samples, 0.95),
+            'p99': self.percentile(samples, 0.99),
+            'max': self.max,
+            'over_budget': self.over_budget
+        }
+
+
+class HandlerProfiler:
+    """ Collects per-invocation durations of the addon's persistent handlers. Disabled by default. """
+
+    enabled = False
+    budget_ms = 16.0
+    max_samples = 1024
+
+    stats : Dict[str, HandlerStats] = {}
+
+    @classmethod
+    def configure(cls, enabled: bool, budget_ms: float):
+        cls.enabled = enabled
+        cls.budget_ms = budget_ms
+
+    @classmethod
+    def record(cls, name: str, duration: float):
+
+        stats = cls.stats.get(name)
+
+        if stats is None:
+            stats = cls.stats[name] = HandlerStats(cls.max_samples)
+
+        stats.add(duration, cls.budget_ms)
+
+        if cls.budget_ms and duration > cls.budget_ms:
+            print('Warning: handler \"{}\" took {:.2f} ms, exceeding the budget of {:.2f} ms.'
+                  .format(name, duration, cls.budget_ms))
+
+    @classmethod
+    def reset(cls):
+        cls.stats.clear()
+
+    @classmethod
+    def summary(cls) -> Dict[str, Dict[str, float]]:
+        return {name: stats.summary() for name, stats in sorted(cls.stats.items())}
+
+    @classmethod
+    def dump_json(cls, filepath: str):
+        with open(filepath, 'w') as f:
+            json.dump({'budget_ms': cls.budget_ms, 'handlers': cls.summary()}, f, indent=2)
+
+
+@parametrized
+def profile_handler(func, name=None):
+    """ Record handler execution time when handler profiling is enabled. Apply below @persistent. """
+
+    handler_name = name or '{}.{}'.format(func.__module__.split('.', 1)[-1], func.__name__)
+
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+
+        if not HandlerProfiler.enabled:
+            return func(*args, **kwargs)
+
+        start = perf_counter()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            HandlerProfiler.record(handler_name, (perf_counter() - start) * 1000)
+
+    return wrapped
@@ -0,0 +1,238 @@
+// Benchmark of vertex deduplication used to build indexed geometry of drawing meshes.
+//
+// Compares the previous per-vertex std::unordered_map of attribute tuples, which also needed a search through
+// loop triangle users to fill the index buffer, against VertexDedupMap. Meshes are synthetic grids with
+// a vertex per loop corner, several materials and UV seams, no Blender or OpenGL is required.
+//
+// Build and run from this directory:
+//     g++ -O2 -std=c++17 -I../src/render vertex_dedup_map.cpp -o vertex_dedup_map && ./vertex_dedup_map
+
+#include <vertex_dedup_map.hpp>
+
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <cstdio>
+#include <tuple>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+using namespace wbs_kernel;
+
+#define STD_UV_CONNECT_LIMIT 0.0001f
+
+static const int GRID_SIZES[] = {16, 64, 256, 512};
+static const int N_MATERIALS = 4;
+static const int REPEATS = 5;
+
+
+struct SyntheticMesh
+{
+  int n_vertices;
+
+  // per loop
+  std::vector<unsigned int> loop_vertices;
+  std::vector<float> loop_uvs;
+
+  // per loop triangle, sorted by material as in drawing meshes
+  std::vector<unsigned int> tri_loops;
+  std::vector<int> tri_materials;
+};
+
+// Grid of quads split into triangles. Each quad column band uses its own material, and every 8th row
+// has a UV seam, so that some vertices get duplicated by material and some by UVs.
+static SyntheticMesh create_grid(int size)
+{
+  SyntheticMesh mesh;
+  mesh.n_vertices = (size + 1) * (size + 1);
+
+  for (int material = 0; material < N_MATERIALS; ++material)
+  {
+    for (int y = 0; y < size; ++y)
+    {
+      for (int x = material * size / N_MATERIALS; x < (material + 1) * size / N_MATERIALS; ++x)
+      {
+        unsigned int quad[4] = {static_cast<unsigned int>(y * (size + 1) + x),
+                                static_cast<unsigned int>(y * (size + 1) + x + 1),
+                                static_cast<unsigned int>((y + 1) * (size + 1) + x + 1),
+                                static_cast<unsigned int>((y + 1) * (size + 1) + x)};
+
+        unsigned int loop_start = static_cast<unsigned int>(mesh.loop_vertices.size());
+        float v_offset = (y % 8 == 7) ? 0.5f : 0.0f;
+
+        for (int i = 0; i < 4; ++i)
+        {
+          unsigned int vertex = quad[i];
+          mesh.loop_vertices.push_back(vertex);
+          mesh.loop_uvs.push_back(static_cast<float>(vertex % (size + 1)) / size);
+          mesh.loop_uvs.push_back(static_cast<float>(vertex / (size + 1)) / size + (i >= 2 ? v_offset : 0.0f));
+        }
+
+        unsigned int tris[6] = {0, 1, 2, 0, 2, 3};
+
+        for (int i = 0; i < 6; ++i)
+        {
+          mesh.tri_loops.push_back(loop_start + tris[i]);
+        }
+
+        mesh.tri_materials.push_back(material);
+        mesh.tri_materials.push_back(material);
+      }
+    }
+  }
+
+  return mesh;
+}
+
+// Previous implementation: linear search over duplicates of a vertex, then a search through loop triangle
+// users of every duplicate to find the output vertex of each corner.
+static int build_legacy(const SyntheticMesh& mesh, std::vector<int>& tri_indices)
+{
+  std::unordered_map<int, std::vector<std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<int>>>>
+      vertex_map;
+  vertex_map.reserve(mesh.n_vertices);
+
+  int v_index_global_counter = 0;
+  int n_tris = static_cast<int>(mesh.tri_materials.size());
+
+  for (int tri = 0; tri < n_tris; ++tri)
+  {
+    for (int corner = 0; corner < 3; ++corner)
+    {
+      unsigned int loop_index = mesh.tri_loops[tri * 3 + corner];
+      int vertex = mesh.loop_vertices[loop_index];
+      const float* uv = &mesh.loop_uvs[loop_index * 2];
+
+      bool has_matching_dupli = false;
+      auto it = vertex_map.find(vertex);
+
+      if (it != vertex_map.end())
+      {
+        for (auto& iter : it->second)
+        {
+          auto& uv_layers_data = std::get<2>(iter);
+
+          if (std::get<1>(iter) == mesh.tri_materials[tri]
+              && std::fabs(uv_layers_data[0].first - uv[0]) <= STD_UV_CONNECT_LIMIT
+              && std::fabs(uv_layers_data[0].second - uv[1]) <= STD_UV_CONNECT_LIMIT)
+          {
+            std::get<3>(iter).push_back(tri);
+            has_matching_dupli = true;
+            break;
+          }
+        }
+      }
+
+      if (has_matching_dupli)
+      {
+        continue;
+      }
+
+      std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<int>> vertex_dupli =
+          {v_index_global_counter++, mesh.tri_materials[tri],
+           std::vector<std::pair<float, float>>{{uv[0], uv[1]}, {0.0f, 0.0f}}, std::vector<int>{tri}};
+
+      vertex_map[vertex].push_back(std::move(vertex_dupli));
+    }
+  }
+
+  for (int tri = 0; tri < n_tris; ++tri)
+  {
+    for (int corner = 0; corner < 3; ++corner)
+    {
+      auto vertex_duplis = vertex_map[mesh.loop_vertices[mesh.tri_loops[tri * 3 + corner]]];
+
+      for (auto& vertex_dupli : vertex_duplis)
+      {
+        auto& users = std::get<3>(vertex_dupli);
+
+        if (std::find(users.begin(), users.end(), tri) != users.end())
+        {
+          tri_indices[tri * 3 + corner] = std::get<0>(vertex_dupli);
+          break;
+        }
+      }
+    }
+  }
+
+  return v_index_global_counter;
+}
+
+static int build_dedup_map(const SyntheticMesh& mesh, VertexDedupMap& vertex_map, std::vector<int>& tri_indices,
+                           std::vector<unsigned int>& vertex_loops)
+{
+  std::size_t n_corners = mesh.tri_loops.size();
+  vertex_map.reset(mesh.n_vertices, 4);
+  vertex_loops.clear();
+
+  uint32_t attributes[4] = {0, 0, 0, 0};
+
+  for (std::size_t corner = 0; corner < n_corners; ++corner)
+  {
+    unsigned int loop_index = mesh.tri_loops[corner];
+    attributes[0] = VertexDedupMap::quantize(mesh.loop_uvs[loop_index * 2], STD_UV_CONNECT_LIMIT);
+    attributes[1] = VertexDedupMap::quantize(mesh.loop_uvs[loop_index * 2 + 1], STD_UV_CONNECT_LIMIT);
+
+    bool is_new;
+    tri_indices[corner] = vertex_map.insert(mesh.loop_vertices[loop_index], mesh.tri_materials[corner / 3],
+                                            attributes, is_new);
+
+    if (is_new)
+    {
+      vertex_loops.push_back(loop_index);
+    }
+  }
+
+  return static_cast<int>(vertex_map.size());
+}
+
+template <typename Function>
+static double time_ms(Function function)
+{
+  double best = 0.0;
+
+  for (int i = 0; i < REPEATS; ++i)
+  {
+    auto start = std::chrono::steady_clock::now();
+    function();
+    std::chrono::duration<double, std::milli> elapsed = std::chrono::steady_clock::now() - start;
+
+    best = i ? std::min(best, elapsed.count()) : elapsed.count();
+  }
+
+  return best;
+}
+
+int main()
+{
+  std::printf("%10s %10s %10s %12s %12s %8s\n", "triangles", "vertices", "output", "legacy ms", "dedup ms", "speedup");
+
+  VertexDedupMap vertex_map;
+  std::vector<unsigned int> vertex_loops;
+
+  for (int size : GRID_SIZES)
+  {
+    SyntheticMesh mesh = create_grid(size);
+
+    std::vector<int> legacy_indices(mesh.tri_loops.size());
+    std::vector<int> dedup_indices(mesh.tri_loops.size());
+
+    int n_legacy = 0;
+    int n_dedup = 0;
+
+    double legacy_ms = time_ms([&]() { n_legacy = build_legacy(mesh, legacy_indices); });
+    double dedup_ms = time_ms([&]() { n_dedup = build_dedup_map(mesh, vertex_map, dedup_indices, vertex_loops); });
+
+    if (n_legacy != n_dedup || legacy_indices != dedup_indices)
+    {
+      std::printf("Mismatch on %d x %d grid: %d and %d output vertices\n", size, size, n_legacy, n_dedup);
+      return 1;
+    }
+
+    std::printf("%10zu %10d %10d %12.3f %12.3f %7.1fx\n", mesh.tri_materials.size(), mesh.n_vertices, n_dedup,
+                legacy_ms, dedup_ms, legacy_ms / dedup_ms);
+  }
+
+  return 0;
+}
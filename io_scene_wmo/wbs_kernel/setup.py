@@ -13,6 +13,11 @@ else:
 
 extra_compile_args.extend(['-std=c++17'])
 
+# geometry of drawing meshes is prepared in worker threads
+if platform.system() == 'Linux':
+    extra_compile_args.append('-pthread')
+    extra_link_args.append('-pthread')
+
 glew = ('glew', {'sources': ["src/extern/glew/src/glew.c"], 'include_dirs': ["src/extern/glew/include/"]})
 
 
@@ -26,7 +31,9 @@ setup(
             "src/render/m2_drawing_mesh.cpp",
             "src/render/wmo_drawing_mesh.cpp",
             "src/render/wmo_drawing_batch.cpp",
-            "src/render/opengl_utils.cpp"
+            "src/render/opengl_utils.cpp",
+            "src/render/frustum.cpp",
+            "src/render/hiz_culler.cpp"
         ],
 
         include_dirs=[
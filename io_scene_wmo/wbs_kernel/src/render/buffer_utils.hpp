@@ -0,0 +1,64 @@
+#ifndef WBS_KERNEL_RENDER_BUFFER_UTILS_HPP
+#define WBS_KERNEL_RENDER_BUFFER_UTILS_HPP
+
+#define GLEW_STATIC
+#include <glew.h>
+
+#include <algorithm>
+#include <cstddef>
+#include <vector>
+
+
+namespace wbs_kernel
+{
+  // Uploads the span of data that differs from the copy uploaded last time, and updates the copy.
+  // Buffer storage must already be allocated for n_values. Returns the number of uploaded values.
+  template <typename T>
+  std::size_t upload_dirty_range(GLenum target, GLuint buffer, const T* data, std::vector<T>& uploaded,
+                                 std::size_t n_values)
+  {
+    std::size_t begin = 0;
+    std::size_t end = n_values;
+
+    if (uploaded.size() == n_values)
+    {
+      while (begin < end && uploaded[begin] == data[begin])
+      {
+        begin++;
+      }
+
+      while (end > begin && uploaded[end - 1] == data[end - 1])
+      {
+        end--;
+      }
+
+      if (begin == end)
+      {
+        return 0;
+      }
+
+      std::copy(data + begin, data + end, uploaded.begin() + begin);
+    }
+    else
+    {
+      uploaded.assign(data, data + n_values);
+    }
+
+    glBindBuffer(target, buffer);
+    glBufferSubData(target, begin * sizeof(T), (end - begin) * sizeof(T), data + begin);
+
+    return end - begin;
+  }
+
+  // Uploads the whole data, reallocating buffer storage, and stores the copy used to find dirty ranges later.
+  template <typename T>
+  void upload_buffer(GLenum target, GLuint buffer, const T* data, std::vector<T>& uploaded, std::size_t n_values)
+  {
+    glBindBuffer(target, buffer);
+    glBufferData(target, n_values * sizeof(T), data, GL_DYNAMIC_DRAW);
+
+    uploaded.assign(data, data + n_values);
+  }
+}
+
+#endif //WBS_KERNEL_RENDER_BUFFER_UTILS_HPP
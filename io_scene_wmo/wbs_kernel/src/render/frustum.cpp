@@ -0,0 +1,66 @@
+#include "frustum.hpp"
+
+#include <cmath>
+
+using namespace wbs_kernel;
+
+void Frustum::update(const float* view_projection)
+{
+  const float* row_x = view_projection;
+  const float* row_y = view_projection + 4;
+  const float* row_z = view_projection + 8;
+  const float* row_w = view_projection + 12;
+
+  for (int i = 0; i < 4; ++i)
+  {
+    this->planes[0][i] = row_w[i] + row_x[i];
+    this->planes[1][i] = row_w[i] - row_x[i];
+    this->planes[2][i] = row_w[i] + row_y[i];
+    this->planes[3][i] = row_w[i] - row_y[i];
+    this->planes[4][i] = row_w[i] + row_z[i];
+    this->planes[5][i] = row_w[i] - row_z[i];
+  }
+
+  // normalize, so that plane distances can be compared against sphere radii
+  for (auto& plane : this->planes)
+  {
+    float length = std::sqrt(plane[0] * plane[0] + plane[1] * plane[1] + plane[2] * plane[2]);
+
+    if (length > 0.0f)
+    {
+      for (float& component : plane)
+      {
+        component /= length;
+      }
+    }
+  }
+}
+
+bool Frustum::intersects_sphere(const float* center, float radius) const
+{
+  for (const auto& plane : this->planes)
+  {
+    if (plane[0] * center[0] + plane[1] * center[1] + plane[2] * center[2] + plane[3] < -radius)
+    {
+      return false;
+    }
+  }
+
+  return true;
+}
+
+int Frustum::cull_spheres(const float* spheres, int n_spheres, std::uint8_t* visibility) const
+{
+  int n_visible = 0;
+
+  for (int i = 0; i < n_spheres; ++i)
+  {
+    const float* sphere = spheres + i * 4;
+    bool is_visible = this->intersects_sphere(sphere, sphere[3]);
+
+    visibility[i] = is_visible;
+    n_visible += is_visible;
+  }
+
+  return n_visible;
+}
@@ -0,0 +1,30 @@
+#ifndef WBS_KERNEL_FRUSTUM_HPP
+#define WBS_KERNEL_FRUSTUM_HPP
+
+#include <cstdint>
+
+
+namespace wbs_kernel
+{
+  class Frustum
+  {
+  // Members
+  private:
+    // left, right, bottom, top, near, far planes as (a, b, c, d), normals point inwards
+    float planes[6][4] = {};
+
+  // Methods
+  public:
+    // Extract clipping planes from a row-major view projection matrix.
+    void update(const float* view_projection);
+
+    bool intersects_sphere(const float* center, float radius) const;
+
+    // Test packed (x, y, z, radius) spheres, write 1 for visible and 0 for culled ones.
+    // Returns the number of visible spheres.
+    int cull_spheres(const float* spheres, int n_spheres, std::uint8_t* visibility) const;
+  };
+
+}
+
+#endif //WBS_KERNEL_FRUSTUM_HPP
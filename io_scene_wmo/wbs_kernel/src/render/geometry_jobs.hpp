@@ -0,0 +1,78 @@
+#ifndef WBS_KERNEL_RENDER_GEOMETRY_JOBS_HPP
+#define WBS_KERNEL_RENDER_GEOMETRY_JOBS_HPP
+
+#include <algorithm>
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <exception>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+
+namespace wbs_kernel
+{
+  // Runs update_geometry() of drawing meshes in worker threads, the calling thread works too and returns when
+  // all meshes are processed. Only CPU-side buffers are prepared, OpenGL uploads are left to run_buffer_updates()
+  // on the thread owning the context. Blender data of the meshes must not be modified until this returns.
+  template <typename DrawingMesh>
+  void update_geometry_parallel(DrawingMesh* const* meshes, std::size_t n_meshes, bool use_indexed,
+                                uint8_t* results, unsigned int n_threads)
+  {
+    if (!n_threads)
+    {
+      n_threads = std::max(std::thread::hardware_concurrency(), 1u);
+    }
+
+    n_threads = static_cast<unsigned int>(std::min<std::size_t>(n_threads, n_meshes));
+
+    std::atomic<std::size_t> next_mesh(0);
+    std::exception_ptr error = nullptr;
+    std::mutex error_mutex;
+
+    auto worker = [&]()
+    {
+      for (std::size_t i = next_mesh++; i < n_meshes; i = next_mesh++)
+      {
+        try
+        {
+          results[i] = meshes[i]->update_geometry(use_indexed);
+        }
+        catch (...)
+        {
+          std::lock_guard<std::mutex> lock(error_mutex);
+
+          if (!error)
+          {
+            error = std::current_exception();
+          }
+
+          results[i] = false;
+        }
+      }
+    };
+
+    std::vector<std::thread> threads;
+    threads.reserve(n_threads ? n_threads - 1 : 0);
+
+    for (unsigned int i = 1; i < n_threads; ++i)
+    {
+      threads.emplace_back(worker);
+    }
+
+    worker();
+
+    for (auto& thread : threads)
+    {
+      thread.join();
+    }
+
+    if (error)
+    {
+      std::rethrow_exception(error);
+    }
+  }
+}
+
+#endif //WBS_KERNEL_RENDER_GEOMETRY_JOBS_HPP
@@ -0,0 +1,582 @@
+#include "hiz_culler.hpp"
+
+#include <algorithm>
+#include <cmath>
+#include <cstdio>
+#include <cstring>
+
+using namespace wbs_kernel;
+
+namespace
+{
+  const char* fullscreen_vertex_source = R"(
+#version 330
+
+void main()
+{
+  // triangle covering the viewport
+  vec2 position = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+  gl_Position = vec4(position * 2.0 - 1.0, 0.0, 1.0);
+}
+)";
+
+  const char* reduce_fragment_source = R"(
+#version 330
+
+uniform sampler2D source;
+uniform ivec2 source_size;
+
+out float max_depth;
+
+void main()
+{
+  ivec2 source_texel = ivec2(gl_FragCoord.xy) * 2;
+  ivec2 last = source_size - 1;
+
+  // with odd source sizes the last texel of a row or column also covers the remaining source texel
+  ivec2 extent = ivec2(source_texel.x + 2 == last.x ? 2 : 1, source_texel.y + 2 == last.y ? 2 : 1);
+
+  float depth = 0.0;
+
+  for (int y = 0; y <= extent.y; ++y)
+  {
+    for (int x = 0; x <= extent.x; ++x)
+    {
+      depth = max(depth, texelFetch(source, min(source_texel + ivec2(x, y), last), 0).r);
+    }
+  }
+
+  max_depth = depth;
+}
+)";
+
+  GLuint compile_shader(GLenum type, const char* source)
+  {
+    GLuint shader = glCreateShader(type);
+    glShaderSource(shader, 1, &source, nullptr);
+    glCompileShader(shader);
+
+    GLint status = GL_FALSE;
+    glGetShaderiv(shader, GL_COMPILE_STATUS, &status);
+
+    if (status != GL_TRUE)
+    {
+      char log[1024];
+      glGetShaderInfoLog(shader, sizeof(log), nullptr, log);
+      fprintf(stderr, "Error: failed to compile depth pyramid shader: %s\n", log);
+
+      glDeleteShader(shader);
+      return 0;
+    }
+
+    return shader;
+  }
+
+  // Farthest depth of each 2x2 block, the last row and column also cover the remaining texel of odd sizes.
+  void reduce_level(const std::vector<float>& source, int source_width, int source_height,
+                    std::vector<float>& target, int target_width, int target_height)
+  {
+    target.resize(target_width * target_height);
+
+    for (int y = 0; y < target_height; ++y)
+    {
+      int y_start = y * 2;
+      int y_end = std::min(y == target_height - 1 ? source_height - 1 : y_start + 1, source_height - 1);
+
+      for (int x = 0; x < target_width; ++x)
+      {
+        int x_start = x * 2;
+        int x_end = std::min(x == target_width - 1 ? source_width - 1 : x_start + 1, source_width - 1);
+
+        float depth = 0.0f;
+
+        for (int source_y = y_start; source_y <= y_end; ++source_y)
+        {
+          for (int source_x = x_start; source_x <= x_end; ++source_x)
+          {
+            depth = std::max(depth, source[source_y * source_width + source_x]);
+          }
+        }
+
+        target[y * target_width + x] = depth;
+      }
+    }
+  }
+}
+
+HiZCuller::~HiZCuller()
+{
+  this->free();
+}
+
+bool HiZCuller::capture(int width, int height, const float* view_projection, float depth_near, float depth_far)
+{
+  if (width <= 0 || height <= 0)
+  {
+    return false;
+  }
+
+  if (!this->program)
+  {
+    this->create_program();
+
+    if (!this->program)
+    {
+      return false;
+    }
+  }
+
+  this->collect_readbacks();
+
+  // both read backs are still in flight, the GPU is too far behind to capture another frame
+  Readback& readback = this->readbacks[this->next_readback];
+
+  if (readback.fence)
+  {
+    return false;
+  }
+
+  // multisampled framebuffers can not be copied from
+  GLint sample_buffers = 0;
+  glGetIntegerv(GL_SAMPLE_BUFFERS, &sample_buffers);
+
+  if (sample_buffers)
+  {
+    return false;
+  }
+
+  // state changed by the passes, restored afterwards so that state tracking of the caller stays valid
+  GLint draw_fbo, read_fbo, viewport[4], program, vao, active_texture, texture, pack_buffer;
+  GLboolean color_mask[4];
+
+  glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING, &draw_fbo);
+  glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING, &read_fbo);
+  glGetIntegerv(GL_VIEWPORT, viewport);
+  glGetIntegerv(GL_CURRENT_PROGRAM, &program);
+  glGetIntegerv(GL_VERTEX_ARRAY_BINDING, &vao);
+  glGetIntegerv(GL_ACTIVE_TEXTURE, &active_texture);
+  glGetIntegerv(GL_PIXEL_PACK_BUFFER_BINDING, &pack_buffer);
+  glGetBooleanv(GL_COLOR_WRITEMASK, color_mask);
+
+  const GLenum capabilities[] = {GL_DEPTH_TEST, GL_BLEND, GL_CULL_FACE, GL_SCISSOR_TEST, GL_STENCIL_TEST};
+  GLboolean is_enabled[5];
+
+  for (int i = 0; i < 5; ++i)
+  {
+    is_enabled[i] = glIsEnabled(capabilities[i]);
+    glDisable(capabilities[i]);
+  }
+
+  glActiveTexture(GL_TEXTURE0);
+  glGetIntegerv(GL_TEXTURE_BINDING_2D, &texture);
+
+  if (width != this->width || height != this->height || !this->depth_texture)
+  {
+    this->create_resources(width, height);
+  }
+
+  // level 0 is a copy of the depth buffer
+  glBindFramebuffer(GL_READ_FRAMEBUFFER, draw_fbo);
+  glBindTexture(GL_TEXTURE_2D, this->depth_texture);
+  glCopyTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, viewport[0], viewport[1], width, height);
+
+  glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE);
+  glUseProgram(this->program);
+  glBindVertexArray(this->vao);
+
+  GLuint source = this->depth_texture;
+  int source_width = width;
+  int source_height = height;
+
+  for (std::size_t i = 0; i < this->level_fbos.size(); ++i)
+  {
+    auto [level_width, level_height] = this->level_sizes[i];
+
+    glBindFramebuffer(GL_DRAW_FRAMEBUFFER, this->level_fbos[i]);
+    glViewport(0, 0, level_width, level_height);
+    glBindTexture(GL_TEXTURE_2D, source);
+    glUniform2i(this->source_size_location, source_width, source_height);
+    glDrawArrays(GL_TRIANGLES, 0, 3);
+
+    source = this->level_textures[i];
+    source_width = level_width;
+    source_height = level_height;
+  }
+
+  // the coarsest level is read back asynchronously, results are collected by a later frame
+  glBindFramebuffer(GL_READ_FRAMEBUFFER, this->level_fbos.back());
+  glBindBuffer(GL_PIXEL_PACK_BUFFER, readback.pbo);
+  glBufferData(GL_PIXEL_PACK_BUFFER, source_width * source_height * sizeof(float), nullptr, GL_STREAM_READ);
+  glReadPixels(0, 0, source_width, source_height, GL_RED, GL_FLOAT, nullptr);
+
+  readback.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0);
+  readback.width = source_width;
+  readback.height = source_height;
+  readback.depth_near = depth_near;
+  readback.depth_far = depth_far;
+  std::memcpy(readback.view_projection, view_projection, sizeof(readback.view_projection));
+
+  this->next_readback ^= 1;
+
+  // restore state
+  glBindBuffer(GL_PIXEL_PACK_BUFFER, pack_buffer);
+  glBindFramebuffer(GL_DRAW_FRAMEBUFFER, draw_fbo);
+  glBindFramebuffer(GL_READ_FRAMEBUFFER, read_fbo);
+  glViewport(viewport[0], viewport[1], viewport[2], viewport[3]);
+  glUseProgram(program);
+  glBindVertexArray(vao);
+  glBindTexture(GL_TEXTURE_2D, texture);
+  glActiveTexture(active_texture);
+  glColorMask(color_mask[0], color_mask[1], color_mask[2], color_mask[3]);
+
+  for (int i = 0; i < 5; ++i)
+  {
+    if (is_enabled[i])
+    {
+      glEnable(capabilities[i]);
+    }
+  }
+
+  return true;
+}
+
+int HiZCuller::cull_spheres(const float* spheres, int n_spheres, const std::uint8_t* test_mask,
+                            std::uint8_t* visibility)
+{
+  this->collect_readbacks();
+
+  if (!this->has_results())
+  {
+    return 0;
+  }
+
+  int n_culled = 0;
+
+  for (int i = 0; i < n_spheres; ++i)
+  {
+    if (visibility[i] && test_mask[i] && this->is_sphere_occluded(spheres + i * 4))
+    {
+      visibility[i] = 0;
+      ++n_culled;
+    }
+  }
+
+  return n_culled;
+}
+
+bool HiZCuller::has_results() const
+{
+  return !this->levels.empty();
+}
+
+bool HiZCuller::is_pending() const
+{
+  for (const auto& readback : this->readbacks)
+  {
+    if (readback.fence)
+    {
+      return true;
+    }
+  }
+
+  return false;
+}
+
+void HiZCuller::invalidate()
+{
+  for (auto& readback : this->readbacks)
+  {
+    if (readback.fence)
+    {
+      glDeleteSync(readback.fence);
+      readback.fence = nullptr;
+    }
+  }
+
+  this->levels.clear();
+  this->cpu_level_sizes.clear();
+}
+
+void HiZCuller::free()
+{
+  // nothing to free, possibly without a GL context, if nothing was ever captured
+  if (!this->program)
+  {
+    return;
+  }
+
+  this->invalidate();
+  this->free_textures();
+
+  for (auto& readback : this->readbacks)
+  {
+    glDeleteBuffers(1, &readback.pbo);
+    readback.pbo = 0;
+  }
+
+  glDeleteProgram(this->program);
+  glDeleteVertexArrays(1, &this->vao);
+
+  this->program = 0;
+  this->vao = 0;
+}
+
+bool HiZCuller::is_sphere_occluded(const float* sphere) const
+{
+  float radius = sphere[3];
+
+  if (!std::isfinite(radius))
+  {
+    return false;
+  }
+
+  const float* m = this->view_projection;
+
+  float x_min = INFINITY, y_min = INFINITY, z_min = INFINITY;
+  float x_max = -INFINITY, y_max = -INFINITY;
+
+  // corners of the bounding box of the sphere, its screen rectangle and nearest depth contain those of the sphere
+  for (int i = 0; i < 8; ++i)
+  {
+    float x = sphere[0] + (i & 1 ? radius : -radius);
+    float y = sphere[1] + (i & 2 ? radius : -radius);
+    float z = sphere[2] + (i & 4 ? radius : -radius);
+
+    float w = m[12] * x + m[13] * y + m[14] * z + m[15];
+
+    // crosses the near plane
+    if (w <= 1e-5f)
+    {
+      return false;
+    }
+
+    float ndc_x = (m[0] * x + m[1] * y + m[2] * z + m[3]) / w;
+    float ndc_y = (m[4] * x + m[5] * y + m[6] * z + m[7]) / w;
+    float ndc_z = (m[8] * x + m[9] * y + m[10] * z + m[11]) / w;
+
+    x_min = std::min(x_min, ndc_x);
+    x_max = std::max(x_max, ndc_x);
+    y_min = std::min(y_min, ndc_y);
+    y_max = std::max(y_max, ndc_y);
+    z_min = std::min(z_min, ndc_z);
+  }
+
+  // depth is only known within the captured view, the view may have changed since
+  if (x_min < -1.0f || x_max > 1.0f || y_min < -1.0f || y_max > 1.0f)
+  {
+    return false;
+  }
+
+  float depth = this->depth_near + (this->depth_far - this->depth_near) * (z_min * 0.5f + 0.5f);
+
+  auto [width, height] = this->cpu_level_sizes[0];
+
+  auto to_texel = [](float ndc, int size)
+  {
+    return std::clamp(static_cast<int>(std::floor((ndc * 0.5f + 0.5f) * size)), 0, size - 1);
+  };
+
+  int x0 = to_texel(x_min, width), x1 = to_texel(x_max, width);
+  int y0 = to_texel(y_min, height), y1 = to_texel(y_max, height);
+
+  // finest level the rectangle covers at most 4x4 texels in
+  std::size_t level = 0;
+
+  while (level + 1 < this->levels.size() && ((x1 >> level) - (x0 >> level) > 3 || (y1 >> level) - (y0 >> level) > 3))
+  {
+    ++level;
+  }
+
+  auto [level_width, level_height] = this->cpu_level_sizes[level];
+  const std::vector<float>& texels = this->levels[level];
+
+  // texels past the end of odd sized levels are covered by the last one
+  int level_x1 = std::min(x1 >> level, level_width - 1);
+  int level_y1 = std::min(y1 >> level, level_height - 1);
+
+  for (int y = std::min(y0 >> level, level_height - 1); y <= level_y1; ++y)
+  {
+    for (int x = std::min(x0 >> level, level_width - 1); x <= level_x1; ++x)
+    {
+      if (depth <= texels[y * level_width + x])
+      {
+        return false;
+      }
+    }
+  }
+
+  return true;
+}
+
+void HiZCuller::collect_readbacks()
+{
+  // read backs complete in order, the slot used next holds the older one
+  for (int i = 0; i < 2; ++i)
+  {
+    Readback& readback = this->readbacks[(this->next_readback + i) % 2];
+
+    if (!readback.fence)
+    {
+      continue;
+    }
+
+    GLenum status = glClientWaitSync(readback.fence, 0, 0);
+
+    if (status != GL_ALREADY_SIGNALED && status != GL_CONDITION_SATISFIED)
+    {
+      break;
+    }
+
+    glDeleteSync(readback.fence);
+    readback.fence = nullptr;
+
+    GLint pack_buffer;
+    glGetIntegerv(GL_PIXEL_PACK_BUFFER_BINDING, &pack_buffer);
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, readback.pbo);
+
+    std::size_t n_texels = readback.width * readback.height;
+    auto data = static_cast<const float*>(glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, n_texels * sizeof(float),
+                                                           GL_MAP_READ_BIT));
+
+    if (data)
+    {
+      this->levels.resize(1);
+      this->levels[0].assign(data, data + n_texels);
+      this->cpu_level_sizes.assign(1, {readback.width, readback.height});
+
+      std::memcpy(this->view_projection, readback.view_projection, sizeof(this->view_projection));
+      this->depth_near = readback.depth_near;
+      this->depth_far = readback.depth_far;
+
+      glUnmapBuffer(GL_PIXEL_PACK_BUFFER);
+      this->build_cpu_pyramid();
+    }
+
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, pack_buffer);
+  }
+}
+
+void HiZCuller::build_cpu_pyramid()
+{
+  auto [width, height] = this->cpu_level_sizes[0];
+
+  while (width > 1 || height > 1)
+  {
+    int level_width = std::max(1, width / 2);
+    int level_height = std::max(1, height / 2);
+
+    this->levels.emplace_back();
+    reduce_level(this->levels[this->levels.size() - 2], width, height, this->levels.back(), level_width,
+                 level_height);
+    this->cpu_level_sizes.emplace_back(level_width, level_height);
+
+    width = level_width;
+    height = level_height;
+  }
+}
+
+void HiZCuller::create_resources(int width, int height)
+{
+  this->free_textures();
+  this->invalidate();
+
+  this->width = width;
+  this->height = height;
+
+  glGenTextures(1, &this->depth_texture);
+  glBindTexture(GL_TEXTURE_2D, this->depth_texture);
+  glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT24, width, height, 0, GL_DEPTH_COMPONENT, GL_FLOAT, nullptr);
+  glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST);
+  glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST);
+  glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_COMPARE_MODE, GL_NONE);
+
+  int level_width = width;
+  int level_height = height;
+
+  do
+  {
+    level_width = std::max(1, level_width / 2);
+    level_height = std::max(1, level_height / 2);
+
+    GLuint texture, fbo;
+
+    glGenTextures(1, &texture);
+    glBindTexture(GL_TEXTURE_2D, texture);
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, level_width, level_height, 0, GL_RED, GL_FLOAT, nullptr);
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST);
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST);
+
+    glGenFramebuffers(1, &fbo);
+    glBindFramebuffer(GL_DRAW_FRAMEBUFFER, fbo);
+    glFramebufferTexture2D(GL_DRAW_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, texture, 0);
+
+    this->level_textures.push_back(texture);
+    this->level_fbos.push_back(fbo);
+    this->level_sizes.emplace_back(level_width, level_height);
+  }
+  while (std::max(level_width, level_height) > readback_size);
+
+  for (auto& readback : this->readbacks)
+  {
+    if (!readback.pbo)
+    {
+      glGenBuffers(1, &readback.pbo);
+    }
+  }
+}
+
+void HiZCuller::free_textures()
+{
+  glDeleteTextures(1, &this->depth_texture);
+  glDeleteTextures(static_cast<GLsizei>(this->level_textures.size()), this->level_textures.data());
+  glDeleteFramebuffers(static_cast<GLsizei>(this->level_fbos.size()), this->level_fbos.data());
+
+  this->depth_texture = 0;
+  this->level_textures.clear();
+  this->level_fbos.clear();
+  this->level_sizes.clear();
+  this->width = 0;
+  this->height = 0;
+}
+
+void HiZCuller::create_program()
+{
+  GLuint vertex_shader = compile_shader(GL_VERTEX_SHADER, fullscreen_vertex_source);
+  GLuint fragment_shader = compile_shader(GL_FRAGMENT_SHADER, reduce_fragment_source);
+
+  if (vertex_shader && fragment_shader)
+  {
+    GLuint program = glCreateProgram();
+    glAttachShader(program, vertex_shader);
+    glAttachShader(program, fragment_shader);
+    glBindFragDataLocation(program, 0, "max_depth");
+    glLinkProgram(program);
+
+    GLint status = GL_FALSE;
+    glGetProgramiv(program, GL_LINK_STATUS, &status);
+
+    if (status == GL_TRUE)
+    {
+      this->program = program;
+      this->source_size_location = glGetUniformLocation(program, "source_size");
+
+      // sampler of the source level is bound to unit 0, set once while the program is in use
+      GLint current_program;
+      glGetIntegerv(GL_CURRENT_PROGRAM, &current_program);
+      glUseProgram(program);
+      glUniform1i(glGetUniformLocation(program, "source"), 0);
+      glUseProgram(current_program);
+
+      // attribute-less draws still need a vertex array bound in core profiles
+      glGenVertexArrays(1, &this->vao);
+    }
+    else
+    {
+      fprintf(stderr, "Error: failed to link depth pyramid shader.\n");
+      glDeleteProgram(program);
+    }
+  }
+
+  glDeleteShader(vertex_shader);
+  glDeleteShader(fragment_shader);
+}
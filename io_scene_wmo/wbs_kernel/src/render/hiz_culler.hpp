@@ -0,0 +1,97 @@
+#ifndef WBS_KERNEL_HIZ_CULLER_HPP
+#define WBS_KERNEL_HIZ_CULLER_HPP
+
+#define GLEW_STATIC
+#include <glew.h>
+
+#include <cstdint>
+#include <utility>
+#include <vector>
+
+
+namespace wbs_kernel
+{
+  // Hierarchical-Z occlusion culling. Depth of occluders drawn to the bound framebuffer is reduced on the GPU to a
+  // pyramid of farthest depths by fragment shader passes, its coarsest level is read back asynchronously and extended
+  // to a full pyramid on the CPU. Bounding spheres are tested against the last pyramid read back with the view
+  // projection of the frame it was captured in, so results have (at least) one frame of latency.
+  class HiZCuller
+  {
+  // Members
+  public:
+    // largest dimension of the pyramid level read back to the CPU
+    static const int readback_size = 256;
+
+  private:
+    struct Readback
+    {
+      GLuint pbo = 0;
+      GLsync fence = nullptr;
+      int width = 0;
+      int height = 0;
+      float view_projection[16] = {};
+      float depth_near = 0.0f;
+      float depth_far = 1.0f;
+    };
+
+    // GPU pyramid, level 0 is a copy of the depth buffer
+    int width = 0;
+    int height = 0;
+    GLuint depth_texture = 0;
+    std::vector<GLuint> level_textures;
+    std::vector<GLuint> level_fbos;
+    std::vector<std::pair<int, int>> level_sizes;
+    GLuint program = 0;
+    GLint source_size_location = -1;
+    GLuint vao = 0;
+
+    // double buffered asynchronous read back of the coarsest GPU level
+    Readback readbacks[2];
+    int next_readback = 0;
+
+    // CPU pyramid of the last completed read back, level 0 is the read back level
+    std::vector<std::vector<float>> levels;
+    std::vector<std::pair<int, int>> cpu_level_sizes;
+    float view_projection[16] = {};
+    float depth_near = 0.0f;
+    float depth_far = 1.0f;
+
+  // Methods
+  public:
+    HiZCuller() = default;
+    HiZCuller(const HiZCuller&) = delete;
+    HiZCuller& operator=(const HiZCuller&) = delete;
+    ~HiZCuller();
+
+    // Build the pyramid from the depth buffer of the bound framebuffer and start reading it back.
+    // view_projection is row-major, depth range is the one occludees are drawn with. GL state is restored.
+    // Returns false if the framebuffer can not be captured (multisampled) or the GPU is too far behind.
+    bool capture(int width, int height, const float* view_projection, float depth_near, float depth_far);
+
+    // Clear visibility of spheres occluded in the last pyramid read back, only spheres with test_mask set and
+    // visibility set are tested. Returns the number of spheres culled.
+    int cull_spheres(const float* spheres, int n_spheres, const std::uint8_t* test_mask,
+                     std::uint8_t* visibility);
+
+    bool has_results() const;
+
+    // A captured pyramid has not been read back yet.
+    bool is_pending() const;
+
+    // Drop the pyramid and pending read backs, until the next capture nothing is culled.
+    void invalidate();
+
+    void free();
+
+  private:
+    bool is_sphere_occluded(const float* sphere) const;
+    void collect_readbacks();
+    void build_cpu_pyramid();
+    void create_resources(int width, int height);
+    void free_textures();
+    void create_program();
+  };
+
+}
+
+#endif //WBS_KERNEL_HIZ_CULLER_HPP
@@ -1,7 +1,9 @@
 #include "m2_drawing_batch.hpp"
 #include <render/m2_drawing_mesh.hpp>
 
+#include <algorithm>
 #include <iostream>
+#include <utility>
 
 using namespace wbs_kernel;
 
@@ -20,6 +22,24 @@ void M2DrawingBatch::set_tri_start(int triangle_start)
 
 void M2DrawingBatch::create_vao()
 {
+  // attribute locations depend on the program, VAO is only re-created when it changes
+  if (this->vao && this->vao_program == this->shader_program)
+  {
+    return;
+  }
+
+  if (this->vao)
+  {
+    glDeleteVertexArrays(1, &this->vao);
+  }
+
+  if (!this->vbo_instances)
+  {
+    glGenBuffers(1, &this->vbo_instances);
+  }
+
+  this->vao_program = this->shader_program;
+
   glGenVertexArrays(1, &this->vao);
   glBindVertexArray(this->vao);
 
@@ -53,6 +73,31 @@ void M2DrawingBatch::create_vao()
     glEnableVertexAttribArray(tex_coord_2_loc);
   }
 
+  // per-instance attributes, a mat4 attribute occupies four consecutive vec4 locations
+  int instance_matrix_loc = glGetAttribLocation(this->shader_program, "aInstanceMatrix");
+  int instance_color_loc = glGetAttribLocation(this->shader_program, "aInstanceColor");
+
+  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_instances);
+
+  if (instance_matrix_loc >= 0)
+  {
+    for (int i = 0; i < 4; ++i)
+    {
+      glVertexAttribPointer(instance_matrix_loc + i, 4, GL_FLOAT, GL_FALSE, instance_stride * sizeof(GLfloat),
+                            (void*)(i * 4 * sizeof(GLfloat)));
+      glEnableVertexAttribArray(instance_matrix_loc + i);
+      glVertexAttribDivisor(instance_matrix_loc + i, 1);
+    }
+  }
+
+  if (instance_color_loc >= 0)
+  {
+    glVertexAttribPointer(instance_color_loc, 4, GL_FLOAT, GL_FALSE, instance_stride * sizeof(GLfloat),
+                          (void*)(16 * sizeof(GLfloat)));
+    glEnableVertexAttribArray(instance_color_loc);
+    glVertexAttribDivisor(instance_color_loc, 1);
+  }
+
   glBindVertexArray(0);
 
 }
@@ -64,16 +109,25 @@ void M2DrawingBatch::set_program(int shader_program)
 
 void M2DrawingBatch::draw()
 {
+  this->create_vao();
 
   glDisable(GL_PRIMITIVE_RESTART);
 
-  glUseProgram(this->shader_program);
+  // program is bound by the caller, which skips redundant binds
   glBindVertexArray(this->vao);
 
   if (this->is_nonindexed)
   {
     glDrawArrays(GL_TRIANGLES, this->tri_start * 3, this->n_tris * 3);
   }
+  else if (this->lod)
+  {
+    const std::pair<int, int>& lod_range = this->lod_ranges[this->lod - 1];
+
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, this->draw_mesh->ibo_lods);
+    glDrawElements(GL_TRIANGLES, lod_range.second * 3, GL_UNSIGNED_INT,
+                   (void *) (lod_range.first * 3 * sizeof(GLuint)));
+  }
   else
   {
     glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, this->draw_mesh->ibo);
@@ -85,6 +139,43 @@ void M2DrawingBatch::draw()
   glBindVertexArray(0);
 }
 
+void M2DrawingBatch::draw_instanced(const float* instance_data, int n_instances)
+{
+  this->create_vao();
+
+  // instance data is re-specified every draw, new storage avoids waiting for previous draws reading it
+  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_instances);
+  glBufferData(GL_ARRAY_BUFFER, n_instances * instance_stride * sizeof(GLfloat), instance_data, GL_STREAM_DRAW);
+
+  glDisable(GL_PRIMITIVE_RESTART);
+
+  // program is bound by the caller, which skips redundant binds
+  glBindVertexArray(this->vao);
+
+  if (this->is_nonindexed)
+  {
+    glDrawArraysInstanced(GL_TRIANGLES, this->tri_start * 3, this->n_tris * 3, n_instances);
+  }
+  else if (this->lod)
+  {
+    const std::pair<int, int>& lod_range = this->lod_ranges[this->lod - 1];
+
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, this->draw_mesh->ibo_lods);
+    glDrawElementsInstanced(GL_TRIANGLES, lod_range.second * 3, GL_UNSIGNED_INT,
+                            (void *) (lod_range.first * 3 * sizeof(GLuint)), n_instances);
+  }
+  else
+  {
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, this->draw_mesh->ibo);
+    glDrawElementsInstanced(GL_TRIANGLES, this->n_tris * 3, GL_UNSIGNED_INT,
+                            (void *) (this->tri_start * 3 * sizeof(GLuint)), n_instances);
+  }
+
+  glEnable(GL_PRIMITIVE_RESTART);
+
+  glBindVertexArray(0);
+}
+
 
 int M2DrawingBatch::get_mat_id()
 {
@@ -111,6 +202,7 @@ M2DrawingBatch::~M2DrawingBatch()
 {
   //std::cout << "Destroyed CM2DrawingBatch from C++" << std::endl;
   glDeleteVertexArrays(1, &this->vao);
+  glDeleteBuffers(1, &this->vbo_instances);
 }
 
 float* M2DrawingBatch::get_bb_center()
@@ -123,4 +215,24 @@ float M2DrawingBatch::get_sort_radius()
   return this->sort_radius;
 }
 
+void M2DrawingBatch::set_lod_ranges(std::vector<std::pair<int, int>> lod_ranges)
+{
+  this->lod_ranges = std::move(lod_ranges);
+  this->lod = std::min(this->lod, static_cast<int>(this->lod_ranges.size()));
+}
 
+int M2DrawingBatch::get_n_lods()
+{
+  return static_cast<int>(this->lod_ranges.size());
+}
+
+void M2DrawingBatch::set_lod(int lod)
+{
+  // LODs missing for this batch fall back to the closest available one
+  this->lod = std::max(0, std::min(lod, static_cast<int>(this->lod_ranges.size())));
+}
+
+int M2DrawingBatch::get_n_drawn_tris()
+{
+  return this->lod ? this->lod_ranges[this->lod - 1].second : this->n_tris;
+}
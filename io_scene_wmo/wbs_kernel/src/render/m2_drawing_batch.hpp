@@ -4,6 +4,9 @@
 #define GLEW_STATIC
 #include <glew.h>
 
+#include <utility>
+#include <vector>
+
 
 namespace wbs_kernel
 {
@@ -12,6 +15,10 @@ namespace wbs_kernel
   class M2DrawingBatch
   {
   // Members
+  public:
+    // floats per instance: placement matrix (column-major) followed by RGBA color
+    static const int instance_stride = 20;
+
   private:
     M2DrawingMesh* draw_mesh;
     int mat_id;
@@ -19,8 +26,14 @@ namespace wbs_kernel
     int n_tris = 0;
     bool is_nonindexed = false;
 
-    GLuint vao;
-    GLuint shader_program;
+    // (first triangle, triangle count) of each LOD in the LOD index buffer of the mesh, LOD 0 is the full geometry
+    std::vector<std::pair<int, int>> lod_ranges;
+    int lod = 0;
+
+    GLuint vao = 0;
+    GLuint vao_program = 0;
+    GLuint vbo_instances = 0;
+    GLuint shader_program = 0;
 
   public:
     float sort_radius = 0.0f;
@@ -36,10 +49,15 @@ namespace wbs_kernel
     int get_tri_start();
     void create_vao();
     void draw();
+    void draw_instanced(const float* instance_data, int n_instances);
     void set_program(int shader_program);
     int get_mat_id();
     float* get_bb_center();
     float get_sort_radius();
+    void set_lod_ranges(std::vector<std::pair<int, int>> lod_ranges);
+    int get_n_lods();
+    void set_lod(int lod);
+    int get_n_drawn_tris();
     ~M2DrawingBatch();
 
   };
@@ -14,6 +14,7 @@ extern "C"
 #include <algorithm>
 #include <cstring>
 #include <limits>
+#include <unordered_map>
 
 #include "glm/glm.hpp"
 
@@ -48,7 +49,7 @@ int M2DrawingMesh::CustomData_get_named_layer_index(const CustomData *data, int
 
   for (i = 0; i < data->totlayer; i++) {
     if (data->layers[i].type == type) {
-      if (strcmp(data->layers[i].name, name)) {
+      if (!strcmp(data->layers[i].name, name)) {
         return i;
       }
     }
@@ -73,134 +74,334 @@ void M2DrawingMesh::init_looptris()
   {
     return this->mesh->mpoly[p_a->poly].mat_nr < this->mesh->mpoly[p_b->poly].mat_nr;
   });
+
+  // loop triangle array is reallocated on re-evaluation, order is kept as indices to be reused
+  this->loop_tri_order.resize(this->loop_tris.size());
+
+  for (std::size_t i = 0; i < this->loop_tris.size(); ++i)
+  {
+    this->loop_tri_order[i] = static_cast<int>(this->loop_tris[i] - this->mesh->runtime.looptris.array);
+  }
 }
 
-int M2DrawingMesh::create_vertex_map()
+uint64_t M2DrawingMesh::compute_topology_hash()
 {
-  this->init_looptris();
-  this->vertex_map.clear();
-  this->vertex_map.reserve(this->mesh->totvert);
+  // FNV-1a style hash of connectivity and material assignment, loop attributes are validated separately
+  uint64_t hash = 14695981039346656037ULL;
+
+  auto hash_value = [&hash](uint32_t value)
+  {
+    hash ^= value;
+    hash *= 1099511628211ULL;
+  };
+
+  hash_value(this->mesh->totvert);
+  hash_value(this->mesh->totcol);
+  hash_value(this->mesh->runtime.looptris.len);
+  hash_value(M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata, CustomDataType::CD_MLOOPUV, "UVMap"));
+  hash_value(M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata, CustomDataType::CD_MLOOPUV,
+                                                             "UVMap.001"));
+
+  for (int i = 0; i < this->mesh->runtime.looptris.len; ++i)
+  {
+    MLoopTri* loop_tri = this->mesh->runtime.looptris.array + i;
+
+    hash_value(this->mesh->mpoly[loop_tri->poly].mat_nr);
+
+    for (unsigned int loop_index : loop_tri->tri)
+    {
+      hash_value(loop_index);
+      hash_value(this->mesh->mloop[loop_index].v);
+    }
+  }
+
+  return hash;
+}
+
+const float* M2DrawingMesh::get_loop_uv(const std::vector<int>& uv_layers, int layer, unsigned int loop_index)
+{
+  static const float no_uv[2] = {0.0f, 0.0f};
+
+  if (uv_layers[layer] < 0)
+  {
+    return no_uv;
+  }
+
+  // named layer indices are absolute, CustomData_get_n() expects an index among layers of the type
+  int n = uv_layers[layer] - this->mesh->ldata.typemap[CD_MLOOPUV];
+
+  return static_cast<MLoopUV*>(M2DrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPUV, loop_index, n))->uv;
+}
 
+bool M2DrawingMesh::update_attributes_indexed()
+{
   std::vector<int> uv_layers = {M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
                                                                  CustomDataType::CD_MLOOPUV, "UVMap"),
                                 M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
                                                                  CustomDataType::CD_MLOOPUV, "UVMap.001")};
 
-  int v_index_global_counter = 0;
+  std::vector<float*> uv_buffers = {this->tex_coords, this->tex_coords2};
 
-  this->n_materials = 0;
-  int cur_mat_id = -1;
+  // loops sharing a vertex must still have matching UVs, otherwise the vertex split has to be rebuilt
+  std::vector<bool> is_written(this->n_vertices, false);
 
-  int loop_tri_counter = 0;
-  for (auto& loop_tri : loop_tris)
+  for (std::size_t tri_index = 0; tri_index < this->loop_tri_order.size(); ++tri_index)
   {
-    MPoly* poly = &this->mesh->mpoly[loop_tri->poly];
-
-    if (cur_mat_id != poly->mat_nr)
-    {
-      cur_mat_id = poly->mat_nr;
-      this->n_materials++;
-    }
+    MLoopTri* loop_tri = this->mesh->runtime.looptris.array + this->loop_tri_order[tri_index];
 
-    for (unsigned int loop_index : loop_tri->tri)
+    for (int corner = 0; corner < 3; ++corner)
     {
+      unsigned int loop_index = loop_tri->tri[corner];
       MLoop* loop = &this->mesh->mloop[loop_index];
+      int vertex_index = this->tri_indices[tri_index * 3 + corner];
 
-      // check if we already registered the vertex of that index
-
-      bool has_matching_dupli = false;
-      auto it = vertex_map.find(loop->v);
-      if(it != vertex_map.end())
+      for (int j = 0; j < 2; ++j)
       {
-        // check if registered dupli vertices have matching attributes
-        for (auto & iter : it->second)
-        {
-          auto& uv_layers_data = std::get<2>(iter);
+        const float* uv = this->get_loop_uv(uv_layers, j, loop_index);
+        float* uv_buffer = uv_buffers[j] + vertex_index * 2;
 
-          if (std::get<1>(iter) == poly->mat_nr)
-          {
-            bool is_uv_shared = true;
-            for (int j = 0; j < 2; ++j)
-            {
-              int uv_layer_index = uv_layers[j];
-
-              if (uv_layer_index < 0)
-              {
-                continue;
-              }
-
-              auto uv_loop = static_cast<MLoopUV *>(M2DrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPUV,
-                                                                                    loop_index, uv_layer_index));
-
-              float uv_diff[2];
-              uv_diff[0] = std::fabs(uv_layers_data[j].first) - std::fabs(uv_loop->uv[0]);
-              uv_diff[1] = std::fabs(uv_layers_data[j].second) - std::fabs(uv_loop->uv[1]);
-
-              if ((std::fabs(uv_diff[0]) > STD_UV_CONNECT_LIMIT) && std::fabs(uv_diff[1]) > STD_UV_CONNECT_LIMIT)
-              {
-                is_uv_shared = false;
-                break;
-              }
-
-            }
-
-            if (is_uv_shared)
-            {
-              auto& loop_tri_users = std::get<3>(iter);
-              loop_tri_users.push_back(loop_tri_counter);
-              has_matching_dupli = true;
-              break;
-            }
-          }
+        if (!is_written[vertex_index])
+        {
+          uv_buffer[0] = uv[0];
+          uv_buffer[1] = uv[1];
+        }
+        // same quantization as create_vertex_map(), so the split is kept exactly when a rebuild would keep it
+        else if (VertexDedupMap::quantize(uv_buffer[0], STD_UV_CONNECT_LIMIT)
+                 != VertexDedupMap::quantize(uv[0], STD_UV_CONNECT_LIMIT)
+                 || VertexDedupMap::quantize(uv_buffer[1], STD_UV_CONNECT_LIMIT)
+                 != VertexDedupMap::quantize(uv[1], STD_UV_CONNECT_LIMIT))
+        {
+          return false;
         }
       }
 
-      // do not add new vertex dupli if we found a matching one already
-      if (has_matching_dupli)
+      if (is_written[vertex_index])
       {
         continue;
       }
 
-      // handle registering new duplicate vertex
-      std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<int>> vertex_dupli =
-          {0, 0, std::vector<std::pair<float, float>>{static_cast<size_t>(2)}, std::vector<int>{}};
+      for (int j = 0; j < 3; ++j)
+      {
+        this->vertices_co[vertex_index * 3 + j] = this->mesh->mvert[loop->v].co[j];
+        this->normals[vertex_index * 3 + j] = this->mesh->mvert[loop->v].no[j];
+      }
+
+      is_written[vertex_index] = true;
+    }
+  }
+
+  return true;
+}
+
+void M2DrawingMesh::update_batch_bounds()
+{
+  for (auto batch : this->drawing_batches)
+  {
+    glm::vec3 bound_box[2] = {glm::vec3(std::numeric_limits<float>::max()),
+                              glm::vec3(std::numeric_limits<float>::lowest())};
 
-      std::get<0>(vertex_dupli) = v_index_global_counter;
-      std::get<1>(vertex_dupli) = poly->mat_nr;
+    int index_end = (batch->get_tri_start() + batch->get_n_tris()) * 3;
 
-      auto& uv_layers_data = std::get<2>(vertex_dupli);
+    for (int i = batch->get_tri_start() * 3; i < index_end; ++i)
+    {
+      int vertex_index = this->is_indexed ? this->tri_indices[i] : i;
+      glm::vec3 co(this->vertices_co[vertex_index * 3],
+                   this->vertices_co[vertex_index * 3 + 1],
+                   this->vertices_co[vertex_index * 3 + 2]);
 
-      for (int j = 0; j < 2; ++j)
+      bound_box[0] = glm::min(bound_box[0], co);
+      bound_box[1] = glm::max(bound_box[1], co);
+    }
+
+    if (!batch->get_n_tris())
+    {
+      bound_box[0] = bound_box[1] = glm::vec3(0.0f);
+    }
+
+    glm::vec3 bb_center = 0.5f * (bound_box[0] + bound_box[1]);
+    batch->bb_center[0] = bb_center.x;
+    batch->bb_center[1] = bb_center.y;
+    batch->bb_center[2] = bb_center.z;
+    batch->sort_radius = glm::length(bound_box[1] - bb_center);
+  }
+}
+
+void M2DrawingMesh::update_lods()
+{
+  this->are_lods_dirty = false;
+  this->are_lods_uploaded = false;
+  this->lod_indices.clear();
+
+  std::vector<std::vector<std::pair<int, int>>> batch_ranges(this->drawing_batches.size());
+
+  if (!this->is_indexed || this->lod_sources.empty())
+  {
+    for (std::size_t i = 0; i < this->drawing_batches.size(); ++i)
+    {
+      this->drawing_batches[i]->set_lod_ranges(std::move(batch_ranges[i]));
+    }
+
+    return;
+  }
+
+  // output vertex of each (Blender vertex, material) pair, vertices split by UVs only differ in UVs,
+  // so LOD triangles may use any of them
+  std::unordered_map<uint64_t, int> vertex_outputs;
+  vertex_outputs.reserve(this->n_vertices);
+
+  for (std::size_t tri_index = 0; tri_index < this->loop_tri_order.size(); ++tri_index)
+  {
+    MLoopTri* loop_tri = this->mesh->runtime.looptris.array + this->loop_tri_order[tri_index];
+    uint64_t material = static_cast<uint16_t>(this->mesh->mpoly[loop_tri->poly].mat_nr);
+
+    for (int corner = 0; corner < 3; ++corner)
+    {
+      uint64_t vertex = this->mesh->mloop[loop_tri->tri[corner]].v;
+      vertex_outputs.emplace(vertex << 16 | material, this->tri_indices[tri_index * 3 + corner]);
+    }
+  }
+
+  std::vector<bool> is_assigned;
+
+  for (const auto& lod_source : this->lod_sources)
+  {
+    // LOD triangles are stored for the topology they were imported with, stale levels and the ones after are dropped
+    if (std::any_of(lod_source.begin(), lod_source.end(),
+                    [this](int vertex) { return vertex < 0 || vertex >= this->mesh->totvert; }))
+    {
+      break;
+    }
+
+    std::size_t n_lod_tris = lod_source.size() / 3;
+    is_assigned.assign(n_lod_tris, false);
+
+    // each triangle goes to the first batch having output vertices for all of its corners
+    for (std::size_t batch_index = 0; batch_index < this->drawing_batches.size(); ++batch_index)
+    {
+      uint64_t material = static_cast<uint16_t>(this->drawing_batches[batch_index]->get_mat_id());
+      int tri_start = static_cast<int>(this->lod_indices.size() / 3);
+
+      for (std::size_t tri = 0; tri < n_lod_tris; ++tri)
       {
-        int uv_layer_index = uv_layers[j];
+        if (is_assigned[tri])
+        {
+          continue;
+        }
+
+        int outputs[3];
+        int n_found = 0;
 
-        if (uv_layer_index < 0)
+        for (; n_found < 3; ++n_found)
         {
-          uv_layers_data[j] = std::pair<float, float>(0.0f, 0.0f);
+          auto it = vertex_outputs.find(static_cast<uint64_t>(lod_source[tri * 3 + n_found]) << 16 | material);
+
+          if (it == vertex_outputs.end())
+          {
+            break;
+          }
+
+          outputs[n_found] = it->second;
         }
-        else
+
+        if (n_found < 3)
         {
-          auto uv_loop = static_cast<MLoopUV*>(M2DrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPUV,
-                                                                               loop_index, j));
-          uv_layers_data[j] = std::pair<float, float>(uv_loop->uv[0], uv_loop->uv[1]);
+          continue;
         }
 
+        this->lod_indices.insert(this->lod_indices.end(), outputs, outputs + 3);
+        is_assigned[tri] = true;
       }
 
-      auto& loop_tri_users = std::get<3>(vertex_dupli);
-      loop_tri_users.push_back(loop_tri_counter);
+      batch_ranges[batch_index].emplace_back(tri_start, static_cast<int>(this->lod_indices.size() / 3) - tri_start);
+    }
+  }
+
+  for (std::size_t i = 0; i < this->drawing_batches.size(); ++i)
+  {
+    this->drawing_batches[i]->set_lod_ranges(std::move(batch_ranges[i]));
+  }
+}
+
+void M2DrawingMesh::set_lod_triangles(int lod, const int* vertex_indices, std::size_t n_indices)
+{
+  if (lod < 1)
+  {
+    return;
+  }
+
+  if (this->lod_sources.size() < static_cast<std::size_t>(lod))
+  {
+    this->lod_sources.resize(lod);
+  }
+
+  this->lod_sources[lod - 1].assign(vertex_indices, vertex_indices + n_indices - n_indices % 3);
+  this->are_lods_dirty = true;
+}
+
+void M2DrawingMesh::clear_lods()
+{
+  this->lod_sources.clear();
+  this->are_lods_dirty = true;
+}
 
-      v_index_global_counter++;
+int M2DrawingMesh::get_n_lods()
+{
+  return static_cast<int>(this->lod_sources.size());
+}
 
-      vertex_map[loop->v].push_back(std::move(vertex_dupli));
+int M2DrawingMesh::create_vertex_map()
+{
+  this->init_looptris();
 
+  std::vector<int> uv_layers = {M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
+                                                                 CustomDataType::CD_MLOOPUV, "UVMap"),
+                                M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
+                                                                 CustomDataType::CD_MLOOPUV, "UVMap.001")};
+
+  // a loop corner shares an output vertex with corners of the same blender vertex, material and quantized UVs
+  std::size_t n_corners = this->loop_tris.size() * 3;
+  this->vertex_map.reset(this->mesh->totvert, 4);
+  this->corner_vertices.resize(n_corners);
+  this->vertex_loops.clear();
+
+  this->n_materials = 0;
+  int cur_mat_id = -1;
+
+  uint32_t attributes[4];
+  std::size_t corner_index = 0;
+
+  for (auto loop_tri : this->loop_tris)
+  {
+    MPoly* poly = &this->mesh->mpoly[loop_tri->poly];
+
+    if (cur_mat_id != poly->mat_nr)
+    {
+      cur_mat_id = poly->mat_nr;
+      this->n_materials++;
     }
 
-    loop_tri_counter++;
-  }
+    for (unsigned int loop_index : loop_tri->tri)
+    {
+      for (int j = 0; j < 2; ++j)
+      {
+        const float* uv = this->get_loop_uv(uv_layers, j, loop_index);
+        attributes[j * 2] = VertexDedupMap::quantize(uv[0], STD_UV_CONNECT_LIMIT);
+        attributes[j * 2 + 1] = VertexDedupMap::quantize(uv[1], STD_UV_CONNECT_LIMIT);
+      }
+
+      bool is_new;
+      int vertex_index = this->vertex_map.insert(this->mesh->mloop[loop_index].v, poly->mat_nr, attributes, is_new);
 
-  return v_index_global_counter;
+      if (is_new)
+      {
+        this->vertex_loops.push_back(loop_index);
+      }
+
+      this->corner_vertices[corner_index++] = vertex_index;
+    }
+  }
 
+  return static_cast<int>(this->vertex_map.size());
 }
 
 void M2DrawingMesh::update_mesh_pointer(uintptr_t mesh_pointer)
@@ -238,7 +439,10 @@ bool M2DrawingMesh::update_geometry_nonindexed()
   this->init_looptris();
 
   bool is_batching_valid = this->is_indexed ? false : this->validate_batches(this->mesh->runtime.looptris.len * 3);
+  this->is_batching_valid = is_batching_valid;
+  this->is_gpu_storage_valid = this->is_gpu_storage_valid && is_batching_valid;
   this->is_indexed = false;
+  this->has_vertex_split = false;
 
   this->bl_n_materials = this->mesh->totcol;
 
@@ -246,11 +450,9 @@ bool M2DrawingMesh::update_geometry_nonindexed()
 
   if (!is_batching_valid)
   {
-    for (auto batch_ptr : this->drawing_batches)
-    {
-      delete batch_ptr;
-    }
-
+    // batches own OpenGL objects, they are deleted with the next buffer update on the context thread
+    this->retired_batches.insert(this->retired_batches.end(), this->drawing_batches.begin(),
+                                 this->drawing_batches.end());
     this->drawing_batches.clear();
     this->drawing_batches.reserve(this->mesh->totcol);
   }
@@ -266,8 +468,6 @@ bool M2DrawingMesh::update_geometry_nonindexed()
 
   std::vector<float*> uv_buffers = {this->tex_coords, this->tex_coords2};
 
-  glm::vec3 bound_box[2];
-
   int global_tri_index = 0;
   int global_vertex_index = 0;
   for (auto loop_tri : this->loop_tris)
@@ -279,13 +479,7 @@ bool M2DrawingMesh::update_geometry_nonindexed()
       if (cur_batch != nullptr)
       {
         cur_batch->set_n_tris(global_tri_index - cur_batch->get_tri_start());
-        this->drawing_batches[poly->mat_nr] = cur_batch;
-
-        glm::vec3 bb_center = 0.5f * (bound_box[0] + bound_box[1]);
-        cur_batch->bb_center[0] = bb_center.x;
-        cur_batch->bb_center[1] = bb_center.y;
-        cur_batch->bb_center[2] = bb_center.z;
-        cur_batch->sort_radius = (bound_box[0] - bb_center).length();
+        this->drawing_batches.push_back(cur_batch);
 
         batch_counter++;
       }
@@ -293,9 +487,6 @@ bool M2DrawingMesh::update_geometry_nonindexed()
       cur_batch = new M2DrawingBatch(this, poly->mat_nr, true);
       cur_batch->set_tri_start(global_tri_index);
       mat_idx = poly->mat_nr;
-
-      bound_box[0] = glm::vec3(std::numeric_limits<float>::max());
-      bound_box[1] = glm::vec3(std::numeric_limits<float>::min());
     }
 
     int tri_index_counter = 0;
@@ -311,13 +502,9 @@ bool M2DrawingMesh::update_geometry_nonindexed()
 
       for (int j = 0; j < 2; ++j)
       {
-        for (int k = 0; k < 2; ++k)
-        {
-          uv_buffers[j][global_vertex_index * 2 + k] =
-              uv_layers[j] < 0 ? 0.0f : static_cast<MLoopUV*>(M2DrawingMesh::CustomData_get_n(&this->mesh->ldata,
-                                                                              CD_MLOOPUV, loop_index, j))->uv[k];
-        }
-
+        const float* uv = this->get_loop_uv(uv_layers, j, loop_index);
+        uv_buffers[j][global_vertex_index * 2] = uv[0];
+        uv_buffers[j][global_vertex_index * 2 + 1] = uv[1];
       }
 
       tri_index_counter++;
@@ -330,28 +517,16 @@ bool M2DrawingMesh::update_geometry_nonindexed()
 
   // handle last batch
 
-  if (!is_batching_valid)
-  {
-    if (cur_batch != nullptr)
-    {
-      cur_batch->set_n_tris(global_tri_index - cur_batch->get_tri_start());
-
-      glm::vec3 bb_center = 0.5f * (bound_box[0] + bound_box[1]);
-      cur_batch->bb_center[0] = bb_center.x;
-      cur_batch->bb_center[1] = bb_center.y;
-      cur_batch->bb_center[2] = bb_center.z;
-      cur_batch->sort_radius = (bound_box[0] - bb_center).length();
-
-      this->drawing_batches.push_back(cur_batch);
-    }
-
-    this->init_opengl_buffers();
-  }
-  else
+  if (!is_batching_valid && cur_batch != nullptr)
   {
-    this->update_opengl_buffers();
+    cur_batch->set_n_tris(global_tri_index - cur_batch->get_tri_start());
+    this->drawing_batches.push_back(cur_batch);
   }
 
+  this->update_batch_bounds();
+
+  // LODs are only drawn indexed
+  this->update_lods();
 
   return is_batching_valid;
 }
@@ -370,8 +545,27 @@ bool M2DrawingMesh::update_geometry(bool use_indexed)
 
 bool M2DrawingMesh::update_geometry_indexed()
 {
+  uint64_t topology_hash = this->compute_topology_hash();
+
+  // attribute-only changes, such as moving vertices, keep the vertex split and batches of the last rebuild
+  if (this->has_vertex_split && topology_hash == this->topology_hash && this->update_attributes_indexed())
+  {
+    this->update_batch_bounds();
+    this->is_batching_valid = true;
+
+    if (this->are_lods_dirty)
+    {
+      this->update_lods();
+    }
+
+    return true;
+  }
+
+  this->topology_hash = topology_hash;
+
   int n_vertices_new = this->create_vertex_map();
   this->is_batching_valid = this->is_indexed ? this->validate_batches(n_vertices_new) : false;
+  this->is_gpu_storage_valid = this->is_gpu_storage_valid && this->is_batching_valid;
   this->is_indexed = true;
 
   this->bl_n_materials = this->mesh->totcol;
@@ -383,17 +577,13 @@ bool M2DrawingMesh::update_geometry_indexed()
 
   if (!this->is_batching_valid)
   {
-    for (auto batch_ptr : this->drawing_batches)
-    {
-      delete batch_ptr;
-    }
-
+    // batches own OpenGL objects, they are deleted with the next buffer update on the context thread
+    this->retired_batches.insert(this->retired_batches.end(), this->drawing_batches.begin(),
+                                 this->drawing_batches.end());
     this->drawing_batches.clear();
     this->drawing_batches.reserve(this->mesh->totcol);
   }
 
-  glm::vec3 bound_box[2];
-
   int batch_counter = 0;
   M2DrawingBatch* cur_batch = nullptr;
 
@@ -406,108 +596,94 @@ bool M2DrawingMesh::update_geometry_indexed()
       if (cur_batch != nullptr)
       {
         cur_batch->set_n_tris(global_tri_index - cur_batch->get_tri_start());
-        this->drawing_batches[poly->mat_nr] = cur_batch;
-
-        glm::vec3 bb_center = 0.5f * (bound_box[0] + bound_box[1]);
-        cur_batch->bb_center[0] = bb_center.x;
-        cur_batch->bb_center[1] = bb_center.y;
-        cur_batch->bb_center[2] = bb_center.z;
-        cur_batch->sort_radius = (bound_box[0] - bb_center).length();
+        this->drawing_batches.push_back(cur_batch);
         batch_counter++;
       }
 
       cur_batch = new M2DrawingBatch(this, poly->mat_nr);
       cur_batch->set_tri_start(global_tri_index);
       mat_idx = poly->mat_nr;
-
-      bound_box[0] = glm::vec3(std::numeric_limits<float>::max());
-      bound_box[1] = glm::vec3(std::numeric_limits<float>::min());
     }
 
-    int tri_index_counter = 0;
-    for (unsigned int loop_index : loop_tri->tri)
-    {
-      MLoop *loop = &this->mesh->mloop[loop_index];
-
-      // find vertex duplis using this blender vertex, and find the dupli using this loop
-      auto vertex_duplis = this->vertex_map[loop->v];
-
-      std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<int>>* dupli_vertex_params = nullptr;
-      for (auto& vertex_dupli : vertex_duplis)
-      {
-        for (int dupli_tri_user : std::get<3>(vertex_dupli))
-        {
-          if (dupli_tri_user == global_tri_index)
-          {
-            dupli_vertex_params = &vertex_dupli;
-            break;
-          }
-        }
-      }
-
-      assert(dupli_vertex_params != nullptr && "Vertex is not referenced by this tri.");
-
-      int global_vertex_index = std::get<0>(*dupli_vertex_params);
+    global_tri_index++;
+  }
 
-      // fill the buffers
-      this->tri_indices[global_tri_index * 3 + tri_index_counter] = global_vertex_index;
+  // handle last batch
 
-      for (int j = 0; j < 3; ++j)
-      {
-        this->vertices_co[global_vertex_index * 3 + j] = this->mesh->mvert[loop->v].co[j];
-        this->normals[global_vertex_index * 3 + j] = this->mesh->mvert[loop->v].no[j];
+  if (!this->is_batching_valid && cur_batch != nullptr)
+  {
+    cur_batch->set_n_tris(global_tri_index - cur_batch->get_tri_start());
+    this->drawing_batches.push_back(cur_batch);
+  }
 
-        // bounding box calculations
-        bound_box[0][j] = std::min(bound_box[0][j], this->mesh->mvert[loop->v].co[j]);
-        bound_box[1][j] = std::max(bound_box[1][j], this->mesh->mvert[loop->v].co[j]);
-      }
+  // fill the buffers, attributes of each output vertex are taken from the first loop using it
+  std::copy(this->corner_vertices.begin(), this->corner_vertices.end(), this->tri_indices);
 
-      auto& uv = std::get<2>(*dupli_vertex_params)[0];
-      auto& uv1 = std::get<2>(*dupli_vertex_params)[1];
+  std::vector<int> uv_layers = {M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
+                                                                 CustomDataType::CD_MLOOPUV, "UVMap"),
+                                M2DrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
+                                                                 CustomDataType::CD_MLOOPUV, "UVMap.001")};
 
-      this->tex_coords[global_vertex_index * 2] = uv.first;
-      this->tex_coords[global_vertex_index * 2 + 1] = uv.second;
+  std::vector<float*> uv_buffers = {this->tex_coords, this->tex_coords2};
 
-      this->tex_coords2[global_vertex_index * 2] = uv1.first;
-      this->tex_coords2[global_vertex_index * 2 + 1] = uv1.second;
+  for (int vertex_index = 0; vertex_index < n_vertices_new; ++vertex_index)
+  {
+    unsigned int loop_index = this->vertex_loops[vertex_index];
+    MVert* vertex = &this->mesh->mvert[this->mesh->mloop[loop_index].v];
 
-      tri_index_counter++;
+    for (int j = 0; j < 3; ++j)
+    {
+      this->vertices_co[vertex_index * 3 + j] = vertex->co[j];
+      this->normals[vertex_index * 3 + j] = vertex->no[j];
     }
 
-    global_tri_index++;
+    for (int j = 0; j < 2; ++j)
+    {
+      const float* uv = this->get_loop_uv(uv_layers, j, loop_index);
+      uv_buffers[j][vertex_index * 2] = uv[0];
+      uv_buffers[j][vertex_index * 2 + 1] = uv[1];
+    }
   }
 
-  // handle last batch
+  this->update_batch_bounds();
+  this->has_vertex_split = true;
 
-  if (!this->is_batching_valid)
+  // output vertices of LOD triangles depend on the vertex split
+  this->update_lods();
+
+  return is_batching_valid;
+}
+
+void M2DrawingMesh::delete_retired_batches()
+{
+  for (auto batch_ptr : this->retired_batches)
   {
-    if (cur_batch != nullptr)
-    {
-      cur_batch->set_n_tris(global_tri_index - cur_batch->get_tri_start());
-      glm::vec3 bb_center = 0.5f * (bound_box[0] + bound_box[1]);
-      cur_batch->bb_center[0] = bb_center.x;
-      cur_batch->bb_center[1] = bb_center.y;
-      cur_batch->bb_center[2] = bb_center.z;
-      cur_batch->sort_radius = (bound_box[0] - bb_center).length();
-
-      this->drawing_batches.push_back(cur_batch);
-    }
+    delete batch_ptr;
   }
 
-  return is_batching_valid;
+  this->retired_batches.clear();
 }
 
 void M2DrawingMesh::run_buffer_updates()
 {
+  this->delete_retired_batches();
 
-  if (!this->is_batching_valid)
+  if (!this->is_gpu_storage_valid)
   {
     this->init_opengl_buffers();
+    this->is_gpu_storage_valid = true;
   }
   else
   {
      this->update_opengl_buffers();
   }
+
+  if (!this->are_lods_uploaded)
+  {
+    upload_buffer(GL_ELEMENT_ARRAY_BUFFER, this->ibo_lods, this->lod_indices.data(), this->lod_indices_uploaded,
+                  this->lod_indices.size());
+    this->are_lods_uploaded = true;
+  }
 }
 
 void M2DrawingMesh::allocate_buffers(uint32_t n_vertices_new, uint32_t n_triangles_new)
@@ -567,6 +743,7 @@ void M2DrawingMesh::generate_opengl_buffers()
   // generate VBO and IBO
   glGenBuffers(1, &this->vbo);
   glGenBuffers(1, &this->ibo);
+  glGenBuffers(1, &this->ibo_lods);
   glGenBuffers(1, &this->vbo_normals);
   glGenBuffers(1, &this->vbo_tex_coords);
   glGenBuffers(1, &this->vbo_tex_coords2);
@@ -580,39 +757,42 @@ void M2DrawingMesh::init_opengl_buffers()
     this->is_initialized = true;
   }
 
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 3 * sizeof(float), this->vertices_co, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_normals);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 3 * sizeof(float), this->normals, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 2 * sizeof(float), this->tex_coords, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords2);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 2 * sizeof(float), this->tex_coords2, GL_DYNAMIC_DRAW);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo, this->vertices_co, this->vertices_co_uploaded, this->n_vertices * 3);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_normals, this->normals, this->normals_uploaded, this->n_vertices * 3);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_tex_coords, this->tex_coords, this->tex_coords_uploaded,
+                this->n_vertices * 2);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_tex_coords2, this->tex_coords2, this->tex_coords2_uploaded,
+                this->n_vertices * 2);
 
   if (this->is_indexed)
   {
-   glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, this->ibo);
-   glBufferData(GL_ELEMENT_ARRAY_BUFFER, this->n_triangles * 3 * sizeof(int), this->tri_indices, GL_DYNAMIC_DRAW);
+    upload_buffer(GL_ELEMENT_ARRAY_BUFFER, this->ibo, this->tri_indices, this->tri_indices_uploaded,
+                  this->n_triangles * 3);
+  }
+  else
+  {
+    this->tri_indices_uploaded.clear();
   }
 
 }
 
 void M2DrawingMesh::update_opengl_buffers()
 {
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 3 * sizeof(float), this->vertices_co);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_normals);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 3 * sizeof(float), this->normals);
+  // buffer sizes are unchanged, only the spans modified since the last upload are sent
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo, this->vertices_co, this->vertices_co_uploaded,
+                     this->n_vertices * 3);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_normals, this->normals, this->normals_uploaded,
+                     this->n_vertices * 3);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_tex_coords, this->tex_coords, this->tex_coords_uploaded,
+                     this->n_vertices * 2);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_tex_coords2, this->tex_coords2, this->tex_coords2_uploaded,
+                     this->n_vertices * 2);
 
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 2 * sizeof(float), this->tex_coords);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords2);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 2 * sizeof(float), this->tex_coords2);
+  if (this->is_indexed)
+  {
+    upload_dirty_range(GL_ELEMENT_ARRAY_BUFFER, this->ibo, this->tri_indices, this->tri_indices_uploaded,
+                       this->n_triangles * 3);
+  }
 }
 
 std::vector<M2DrawingBatch*>* M2DrawingMesh::get_drawing_batches()
@@ -623,6 +803,7 @@ std::vector<M2DrawingBatch*>* M2DrawingMesh::get_drawing_batches()
 M2DrawingMesh::~M2DrawingMesh()
 {
   glDeleteBuffers(1, &this->vbo);
+  glDeleteBuffers(1, &this->ibo_lods);
   glDeleteBuffers(1, &this->vbo_normals);
   glDeleteBuffers(1, &this->vbo_tex_coords);
   glDeleteBuffers(1, &this->vbo_tex_coords2);
@@ -637,6 +818,8 @@ M2DrawingMesh::~M2DrawingMesh()
   {
     delete batch_ptr;
   }
+
+  this->delete_retired_batches();
 }
 
 
@@ -2,11 +2,12 @@
 #define WBS_KERNEL_RENDER_M2_EDITABLE_HPP
 
 #include <m2_drawing_batch.hpp>
+#include <buffer_utils.hpp>
+#include <vertex_dedup_map.hpp>
 
-#include <unordered_map>
+#include <cstddef>
 #include <cstdint>
 #include <vector>
-#include <tuple>
 
 #define GLEW_STATIC
 #include <glew.h>
@@ -28,6 +29,7 @@ namespace wbs_kernel
     // OpenGL buffers
     GLuint vbo;
     GLuint ibo;
+    GLuint ibo_lods = 0;
 
     GLuint vbo_normals;
     GLuint vbo_tex_coords;
@@ -45,15 +47,39 @@ namespace wbs_kernel
     int* tri_indices = nullptr;
     //int* bone_indices = nullptr;
 
-    // loop triangles sorted by material index
+    // copies of data last uploaded to the GPU, only ranges differing from them are re-uploaded
+    std::vector<float> vertices_co_uploaded;
+    std::vector<float> normals_uploaded;
+    std::vector<float> tex_coords_uploaded;
+    std::vector<float> tex_coords2_uploaded;
+    std::vector<int> tri_indices_uploaded;
+
+    // loop triangles sorted by material index, and their indices in the mesh loop triangle array
     std::vector<MLoopTri*> loop_tris;
+    std::vector<int> loop_tri_order;
+
+    // hash of the topology the current vertex split was built for
+    uint64_t topology_hash = 0;
+    bool has_vertex_split = false;
 
     // mapping of vertex duplication within mesh, used to construct VBO/IBO etc.
-    std::unordered_map<int, std::vector<std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<int>>>> vertex_map;
+    // corner_vertices holds the output vertex of each loop triangle corner, vertex_loops the first loop of each output vertex
+    VertexDedupMap vertex_map;
+    std::vector<int> corner_vertices;
+    std::vector<unsigned int> vertex_loops;
     std::vector<int> batch_length;
 
-    // drawing batches of this mesh
+    // drawing batches of this mesh, and replaced batches waiting for deletion on the OpenGL context thread
     std::vector<M2DrawingBatch*> drawing_batches;
+    std::vector<M2DrawingBatch*> retired_batches;
+
+    // triangles of lower detail levels as Blender vertex index triplets, LOD 1 first, and their index buffer
+    // with a range per batch, built from the vertex split of the full geometry
+    std::vector<std::vector<int>> lod_sources;
+    std::vector<int> lod_indices;
+    std::vector<int> lod_indices_uploaded;
+    bool are_lods_dirty = false;
+    bool are_lods_uploaded = true;
 
     uint32_t n_vertices = 0;
     uint32_t n_triangles = 0;
@@ -64,6 +90,9 @@ namespace wbs_kernel
     bool is_initialized = false;
     bool is_batching_valid;
 
+    // false when buffer sizes changed since the last upload and storage has to be reallocated
+    bool is_gpu_storage_valid = false;
+
   // Methods
   public:
     M2DrawingMesh(uintptr_t mesh_pointer);
@@ -71,18 +100,27 @@ namespace wbs_kernel
     bool update_geometry(bool use_indexed);
     void run_buffer_updates();
     std::vector<M2DrawingBatch*>* get_drawing_batches();
+    void set_lod_triangles(int lod, const int* vertex_indices, std::size_t n_indices);
+    void clear_lods();
+    int get_n_lods();
     ~M2DrawingMesh();
 
   private:
     int create_vertex_map();
     bool update_geometry_indexed();
     bool update_geometry_nonindexed();
+    bool update_attributes_indexed();
+    uint64_t compute_topology_hash();
+    const float* get_loop_uv(const std::vector<int>& uv_layers, int layer, unsigned int loop_index);
+    void update_batch_bounds();
+    void update_lods();
     void init_looptris();
     bool validate_batches(int n_vertices_new);
     void allocate_buffers(uint32_t n_vertices_new, uint32_t n_triangles_new);
     void generate_opengl_buffers();
     void init_opengl_buffers();
     void update_opengl_buffers();
+    void delete_retired_batches();
 
     // Blender
     static void* CustomData_get_n(const CustomData* data, int type, int index, int n);
@@ -19,3 +19,14 @@ void COpenGLUtils::set_blend_func(int srcRGB, int dstRGB, int srcAlpha, int dstA
   glBlendFuncSeparate(srcRGB, dstRGB, srcAlpha, dstAlpha);
 }
 
+void COpenGLUtils::read_pixels(int x, int y, int width, int height, float* pixels)
+{
+  // read into client memory even if the caller has a pixel pack buffer bound
+  GLint pack_buffer = 0;
+  glGetIntegerv(GL_PIXEL_PACK_BUFFER_BINDING, &pack_buffer);
+  glBindBuffer(GL_PIXEL_PACK_BUFFER, 0);
+
+  glReadPixels(x, y, width, height, GL_RGBA, GL_FLOAT, pixels);
+
+  glBindBuffer(GL_PIXEL_PACK_BUFFER, pack_buffer);
+}
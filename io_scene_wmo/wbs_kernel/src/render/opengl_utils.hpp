@@ -10,6 +10,7 @@ namespace wbs_kernel
   public:
     static void glew_init();
     static void set_blend_func(int srcRGB, int dstRGB, int srcAlpha, int dstAlpha);
+    static void read_pixels(int x, int y, int width, int height, float* pixels);
   };
 
 }
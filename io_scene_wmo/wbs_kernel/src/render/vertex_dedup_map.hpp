@@ -0,0 +1,184 @@
+#ifndef WBS_KERNEL_RENDER_VERTEX_DEDUP_MAP_HPP
+#define WBS_KERNEL_RENDER_VERTEX_DEDUP_MAP_HPP
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+
+namespace wbs_kernel
+{
+  // Open-addressing hash table mapping loop corners to deduplicated output vertices.
+  // Keys are (Blender vertex, material, quantized loop attributes) stored in one contiguous array,
+  // storage is kept between rebuilds so that updating a mesh of similar size does not allocate.
+  //
+  // The home slot of a key is its vertex index followed by a few hash bits of the remaining key words,
+  // so duplicates of a vertex probe neighbouring slots and the memory locality of mesh loops is preserved.
+  class VertexDedupMap
+  {
+  // Members
+  private:
+    struct Slot
+    {
+      uint32_t hash;
+      int entry;
+    };
+
+    std::vector<uint32_t> keys;
+    std::vector<Slot> slots;
+
+    std::size_t n_entries = 0;
+    std::size_t mask = 0;
+    int vertex_shift = 1;
+    int n_attributes = 0;
+    int key_stride = 2;
+
+  // Methods
+  public:
+    // Starts a new build for vertices in range [0, n_vertices) with n_attributes 32-bit attribute words per key
+    void reset(std::size_t n_vertices, int n_attributes)
+    {
+      this->n_attributes = n_attributes;
+      this->key_stride = n_attributes + 2;
+      this->n_entries = 0;
+
+      std::size_t vertex_range = 1;
+
+      while (vertex_range < n_vertices)
+      {
+        vertex_range <<= 1;
+      }
+
+      // two slots per vertex keep the load factor at or below 0.5 until duplicates outnumber vertices
+      this->vertex_shift = 1;
+      this->mask = (vertex_range << this->vertex_shift) - 1;
+      this->slots.assign(this->mask + 1, Slot{0, -1});
+      this->keys.resize(n_vertices * this->key_stride);
+    }
+
+    // Returns output vertex index of the key, registering a new vertex if the key was not seen before
+    int insert(uint32_t vertex, uint32_t material, const uint32_t* attributes, bool& is_new)
+    {
+      uint32_t hash = VertexDedupMap::hash(material, attributes, this->n_attributes);
+      std::size_t slot = this->get_home_slot(vertex, hash);
+
+      while (true)
+      {
+        Slot& cur_slot = this->slots[slot];
+
+        if (cur_slot.entry < 0)
+        {
+          int entry = static_cast<int>(this->n_entries++);
+
+          if (this->keys.size() < this->n_entries * this->key_stride)
+          {
+            this->keys.resize(this->n_entries * this->key_stride * 2);
+          }
+
+          uint32_t* key = &this->keys[entry * this->key_stride];
+          key[0] = vertex;
+          key[1] = material;
+          std::memcpy(key + 2, attributes, this->n_attributes * sizeof(uint32_t));
+
+          cur_slot.hash = hash;
+          cur_slot.entry = entry;
+          is_new = true;
+
+          if (this->n_entries * 2 > this->slots.size())
+          {
+            this->grow();
+          }
+
+          return entry;
+        }
+
+        // hash of non-vertex key words rejects most mismatching entries without touching the key array
+        if (cur_slot.hash == hash)
+        {
+          const uint32_t* key = &this->keys[cur_slot.entry * this->key_stride];
+
+          if (key[0] == vertex && key[1] == material
+              && !std::memcmp(key + 2, attributes, this->n_attributes * sizeof(uint32_t)))
+          {
+            is_new = false;
+
+            return cur_slot.entry;
+          }
+        }
+
+        slot = (slot + 1) & this->mask;
+      }
+    }
+
+    std::size_t size() const
+    {
+      return this->n_entries;
+    }
+
+    // Maps a float attribute to a grid of the given step, values within the same cell are shared
+    static uint32_t quantize(float value, float step)
+    {
+      return static_cast<uint32_t>(static_cast<int32_t>(std::floor(value / step + 0.5f)));
+    }
+
+    static uint32_t pack_color(unsigned char r, unsigned char g, unsigned char b)
+    {
+      return static_cast<uint32_t>(r) | static_cast<uint32_t>(g) << 8 | static_cast<uint32_t>(b) << 16;
+    }
+
+  private:
+    std::size_t get_home_slot(uint32_t vertex, uint32_t hash) const
+    {
+      return ((static_cast<std::size_t>(vertex) << this->vertex_shift) | (hash >> (32 - this->vertex_shift)))
+             & this->mask;
+    }
+
+    // Doubles the slot table, entries keep their indices
+    void grow()
+    {
+      std::vector<Slot> old_slots = std::move(this->slots);
+
+      this->vertex_shift++;
+      this->slots.assign(old_slots.size() * 2, Slot{0, -1});
+      this->mask = this->slots.size() - 1;
+
+      for (const Slot& old_slot : old_slots)
+      {
+        if (old_slot.entry < 0)
+        {
+          continue;
+        }
+
+        std::size_t slot = this->get_home_slot(this->keys[old_slot.entry * this->key_stride], old_slot.hash);
+
+        while (this->slots[slot].entry >= 0)
+        {
+          slot = (slot + 1) & this->mask;
+        }
+
+        this->slots[slot] = old_slot;
+      }
+    }
+
+    static uint32_t hash(uint32_t material, const uint32_t* attributes, int n_attributes)
+    {
+      uint64_t hash = (static_cast<uint64_t>(material) + 1) * 0x9E3779B97F4A7C15ULL;
+
+      for (int i = 0; i < n_attributes; ++i)
+      {
+        hash = (hash ^ attributes[i]) * 0x100000001B3ULL;
+      }
+
+      // fold high bits down, the home slot takes the top bits of the result
+      hash ^= hash >> 29;
+      hash *= 0xBF58476D1CE4E5B9ULL;
+      hash ^= hash >> 32;
+
+      return static_cast<uint32_t>(hash);
+    }
+  };
+}
+
+#endif //WBS_KERNEL_RENDER_VERTEX_DEDUP_MAP_HPP
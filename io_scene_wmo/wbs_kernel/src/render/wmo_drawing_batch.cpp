@@ -68,7 +68,7 @@ void WMODrawingBatch::draw()
 
   glDisable(GL_PRIMITIVE_RESTART);
 
-  glUseProgram(this->shader_program);
+  // program is bound by the caller, which skips redundant binds
   glBindVertexArray(this->vao);
 
   if (this->is_nonindexed)
@@ -52,7 +52,7 @@ int WMODrawingMesh::CustomData_get_named_layer_index(const CustomData *data, int
 
   for (i = 0; i < data->totlayer; i++) {
     if (data->layers[i].type == type) {
-      if (strcmp(data->layers[i].name, name)) {
+      if (!strcmp(data->layers[i].name, name)) {
         return i;
       }
     }
@@ -95,10 +95,10 @@ void WMODrawingMesh::init_looptris()
 
 std::vector<int> WMODrawingMesh::get_uv_layers()
 {
-  return std::vector<int>  (WMODrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
+  return std::vector<int>  {WMODrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
                                                              CustomDataType::CD_MLOOPUV, "UVMap"),
                             WMODrawingMesh::CustomData_get_named_layer_index(&this->mesh->ldata,
-                                                             CustomDataType::CD_MLOOPUV, "UVMap.001"));
+                                                             CustomDataType::CD_MLOOPUV, "UVMap.001")};
 }
 
 std::vector<int> WMODrawingMesh::get_color_layers()
@@ -179,23 +179,59 @@ WMOBatchTypes WMODrawingMesh::get_batch_type(MLoopTri* loop_tri, std::vector<int
   return batch_type;
 }
 
+const float* WMODrawingMesh::get_loop_uv(const std::vector<int>& uv_layers, int layer, unsigned int loop_index)
+{
+  static const float no_uv[2] = {0.0f, 0.0f};
+
+  if (uv_layers[layer] < 0)
+  {
+    return no_uv;
+  }
+
+  // named layer indices are absolute, CustomData_get_n() expects an index among layers of the type
+  int n = uv_layers[layer] - this->mesh->ldata.typemap[CD_MLOOPUV];
+
+  return static_cast<MLoopUV*>(WMODrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPUV, loop_index, n))->uv;
+}
+
+const MLoopCol* WMODrawingMesh::get_loop_color(const std::vector<int>& color_layers, int layer, unsigned int loop_index)
+{
+  static const MLoopCol no_color = {0, 0, 0, 0};
+
+  if (color_layers[layer] < 0)
+  {
+    return &no_color;
+  }
+
+  int n = color_layers[layer] - this->mesh->ldata.typemap[CD_MLOOPCOL];
+
+  return static_cast<MLoopCol*>(WMODrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPCOL, loop_index, n));
+}
+
 int WMODrawingMesh::create_vertex_map()
 {
   this->init_looptris();
-  this->vertex_map.clear();
-  this->vertex_map.reserve(this->mesh->totvert);
 
   std::vector<int> uv_layers = this->get_uv_layers();
   std::vector<int> color_layers = this->get_color_layers();
+
+  // vertex color, blendmap and lightmap are stored per vertex, batch maps only affect batch type
   std::vector<int> data_color_layers = {0, 3, 4};
 
-  int v_index_global_counter = 0;
+  // a loop corner shares an output vertex with corners of the same blender vertex, material, batch type,
+  // quantized UVs and vertex colors
+  std::size_t n_corners = this->loop_tris.size() * 3;
+  this->vertex_map.reset(this->mesh->totvert, 7);
+  this->corner_vertices.resize(n_corners);
+  this->vertex_loops.clear();
 
   this->n_materials = 0;
   int cur_mat_id = -1;
 
-  int loop_tri_counter = 0;
-  for (auto& loop_tri : this->loop_tris)
+  uint32_t attributes[7];
+  std::size_t corner_index = 0;
+
+  for (auto loop_tri : this->loop_tris)
   {
     MPoly* poly = &this->mesh->mpoly[loop_tri->poly];
 
@@ -205,160 +241,38 @@ int WMODrawingMesh::create_vertex_map()
       this->n_materials++;
     }
 
-    WMOBatchTypes batch_type = this->get_batch_type(loop_tri, color_layers);
+    uint32_t batch_material = static_cast<uint32_t>(poly->mat_nr)
+        | static_cast<uint32_t>(this->batch_map[loop_tri]) << 16;
 
     // process triangle loops
     for (unsigned int loop_index : loop_tri->tri)
     {
-      MLoop* loop = &this->mesh->mloop[loop_index];
-
-      // check if we already registered the vertex of that index
-
-      bool has_matching_dupli = false;
-      auto it = vertex_map.find(loop->v);
-      if(it != vertex_map.end())
+      for (int j = 0; j < 2; ++j)
       {
-        // check if registered dupli vertices have matching attributes
-        for (auto & iter : it->second)
-        {
-          auto& uv_layers_data = std::get<2>(iter);
-          auto& color_layers_data = std::get<3>(iter);
-
-          if (std::get<1>(iter) == poly->mat_nr)
-          {
-            bool is_uv_shared = true;
-            bool is_color_shared = true;
-
-            // compare UVs
-            for (int j = 0; j < 2; ++j)
-            {
-              int uv_layer_index = uv_layers[j];
-
-              if (uv_layer_index < 0)
-              {
-                continue;
-              }
-
-              auto uv_loop = static_cast<MLoopUV*>(WMODrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPUV,
-                                                                                    loop_index, uv_layer_index));
-
-              float uv_diff[2];
-              uv_diff[0] = std::fabs(uv_layers_data[j].first) - std::fabs(uv_loop->uv[0]);
-              uv_diff[1] = std::fabs(uv_layers_data[j].second) - std::fabs(uv_loop->uv[1]);
-
-              if ((std::fabs(uv_diff[0]) > STD_UV_CONNECT_LIMIT) && std::fabs(uv_diff[1]) > STD_UV_CONNECT_LIMIT)
-              {
-                is_uv_shared = false;
-                break;
-              }
-
-            }
-
-            // compare colors
-            for (auto layer_index : data_color_layers)
-            {
-              int color_layer_index = color_layers[layer_index];
-
-              if (color_layer_index < 0)
-              {
-                continue;
-              }
-
-              auto color_loop = static_cast<MLoopCol*>(WMODrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPCOL,
-                                                                                        loop_index, color_layer_index));
-
-              std::array<unsigned char, 3> cur_color = {color_loop->r, color_loop->g, color_loop->b};
-              for (int k = 0; k < 3; ++k)
-              {
-                if (color_layers_data[layer_index][k] != cur_color[k])
-                {
-                    is_color_shared = false;
-                    break;
-                }
-              }
-
-            }
-
-            if (is_uv_shared && is_color_shared && static_cast<int>(batch_type) == std::get<5>(iter))
-            {
-              auto& loop_tri_users = std::get<4>(iter);
-              loop_tri_users.push_back(loop_tri_counter);
-              has_matching_dupli = true;
-              break;
-            }
-          }
-        }
+        const float* uv = this->get_loop_uv(uv_layers, j, loop_index);
+        attributes[j * 2] = VertexDedupMap::quantize(uv[0], STD_UV_CONNECT_LIMIT);
+        attributes[j * 2 + 1] = VertexDedupMap::quantize(uv[1], STD_UV_CONNECT_LIMIT);
       }
 
-      // do not add new vertex dupli if we found a matching one already
-      if (has_matching_dupli)
+      for (int j = 0; j < 3; ++j)
       {
-        continue;
+        const MLoopCol* color = this->get_loop_color(color_layers, data_color_layers[j], loop_index);
+        attributes[4 + j] = VertexDedupMap::pack_color(color->r, color->g, color->b);
       }
 
-      // handle registering new duplicate vertex
-      std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<std::array<unsigned char, 3>>,
-                 std::vector<int>, int> vertex_dupli =
-          {0, 0, std::vector<std::pair<float, float>>{static_cast<size_t>(2)}, {{0, 0, 0}}, std::vector<int>{}, 0};
-
-      std::get<0>(vertex_dupli) = v_index_global_counter;
-      std::get<1>(vertex_dupli) = poly->mat_nr;
-      std::get<5>(vertex_dupli) = static_cast<int>(batch_type);
+      bool is_new;
+      int vertex_index = this->vertex_map.insert(this->mesh->mloop[loop_index].v, batch_material, attributes, is_new);
 
-      // handle UVs
-      auto& uv_layers_data = std::get<2>(vertex_dupli);
-
-      for (int j = 0; j < 2; ++j)
+      if (is_new)
       {
-        int uv_layer_index = uv_layers[j];
-
-        if (uv_layer_index < 0)
-        {
-          uv_layers_data[j] = std::pair<float, float>(0.0f, 0.0f);
-        }
-        else
-        {
-          auto uv_loop = static_cast<MLoopUV*>(WMODrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPUV,
-                                                                                loop_index, j));
-          uv_layers_data[j] = std::pair<float, float>(uv_loop->uv[0], uv_loop->uv[1]);
-        }
-
-      }
-
-      // handle colors
-      auto& color_layers_data = std::get<3>(vertex_dupli);
-
-      for (int j = 0; j < 6; ++j)
-      {
-        int color_layer_index = color_layers[j];
-
-        if (color_layer_index < 0)
-        {
-          color_layers_data[j] = std::array<unsigned char, 3>{{0, 0, 0}};
-        }
-        else
-        {
-          auto color_loop = static_cast<MLoopCol*>(WMODrawingMesh::CustomData_get_n(&this->mesh->ldata, CD_MLOOPCOL,
-                                                                                    loop_index, j));
-          color_layers_data[j] = std::array<unsigned char, 3>{{color_loop->r, color_loop->g, color_loop->b}};
-        }
-
+        this->vertex_loops.push_back(loop_index);
       }
 
-      auto& loop_tri_users = std::get<4>(vertex_dupli);
-      loop_tri_users.push_back(loop_tri_counter);
-
-      v_index_global_counter++;
-
-      vertex_map[loop->v].push_back(std::move(vertex_dupli));
-
+      this->corner_vertices[corner_index++] = vertex_index;
     }
-
-    loop_tri_counter++;
   }
 
-  return v_index_global_counter;
-
+  return static_cast<int>(this->vertex_map.size());
 }
 
 void WMODrawingMesh::update_mesh_pointer(uintptr_t mesh_pointer)
@@ -397,6 +311,7 @@ bool WMODrawingMesh::update_geometry_nonindexed()
   this->init_looptris();
 
   bool is_batching_valid = this->is_indexed ? false : this->validate_batches(this->mesh->runtime.looptris.len * 3);
+  this->is_batching_valid = is_batching_valid;
   this->is_indexed = false;
 
   this->bl_n_materials = this->mesh->totcol;
@@ -405,11 +320,9 @@ bool WMODrawingMesh::update_geometry_nonindexed()
 
   if (!is_batching_valid)
   {
-    for (auto batch_ptr : this->drawing_batches)
-    {
-      delete batch_ptr;
-    }
-
+    // batches own OpenGL objects, they are deleted with the next buffer update on the context thread
+    this->retired_batches.insert(this->retired_batches.end(), this->drawing_batches.begin(),
+                                 this->drawing_batches.end());
     this->drawing_batches.clear();
     this->drawing_batches.reserve(this->mesh->totcol);
   }
@@ -456,7 +369,7 @@ bool WMODrawingMesh::update_geometry_nonindexed()
       mat_idx = poly->mat_nr;
 
       bound_box[0] = glm::vec3(std::numeric_limits<float>::max());
-      bound_box[1] = glm::vec3(std::numeric_limits<float>::min());
+      bound_box[1] = glm::vec3(std::numeric_limits<float>::lowest());
     }
 
     int tri_index_counter = 0;
@@ -526,15 +439,8 @@ bool WMODrawingMesh::update_geometry_nonindexed()
 
       this->drawing_batches.push_back(cur_batch);
     }
-
-    this->init_opengl_buffers();
-  }
-  else
-  {
-    this->update_opengl_buffers();
   }
 
-
   return is_batching_valid;
 }
 
@@ -566,11 +472,9 @@ bool WMODrawingMesh::update_geometry_indexed()
 
   if (!this->is_batching_valid)
   {
-    for (auto batch_ptr : this->drawing_batches)
-    {
-      delete batch_ptr;
-    }
-
+    // batches own OpenGL objects, they are deleted with the next buffer update on the context thread
+    this->retired_batches.insert(this->retired_batches.end(), this->drawing_batches.begin(),
+                                 this->drawing_batches.end());
     this->drawing_batches.clear();
     this->drawing_batches.reserve(this->mesh->totcol);
   }
@@ -607,7 +511,7 @@ bool WMODrawingMesh::update_geometry_indexed()
       cur_batch_type = static_cast<int>(batch_type);
 
       bound_box[0] = glm::vec3(std::numeric_limits<float>::max());
-      bound_box[1] = glm::vec3(std::numeric_limits<float>::min());
+      bound_box[1] = glm::vec3(std::numeric_limits<float>::lowest());
     }
 
     int tri_index_counter = 0;
@@ -615,64 +519,13 @@ bool WMODrawingMesh::update_geometry_indexed()
     {
       MLoop *loop = &this->mesh->mloop[loop_index];
 
-      // find vertex duplis using this blender vertex, and find the dupli using this loop
-      auto vertex_duplis = this->vertex_map[loop->v];
-
-      std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<std::array<unsigned char, 3>>, std::vector<int>, int>* dupli_vertex_params = nullptr;
-      for (auto& vertex_dupli : vertex_duplis)
-      {
-        for (int dupli_tri_user : std::get<4>(vertex_dupli))
-        {
-          if (dupli_tri_user == global_tri_index)
-          {
-            dupli_vertex_params = &vertex_dupli;
-            break;
-          }
-        }
-      }
-
-      assert(dupli_vertex_params != nullptr && "Vertex is not referenced by this tri.");
-
-      int global_vertex_index = std::get<0>(*dupli_vertex_params);
-
-      // fill the buffers
-      this->tri_indices[global_tri_index * 3 + tri_index_counter] = global_vertex_index;
-
+      // bounding box calculations
       for (int j = 0; j < 3; ++j)
       {
-        this->vertices_co[global_vertex_index * 3 + j] = this->mesh->mvert[loop->v].co[j];
-        this->normals[global_vertex_index * 3 + j] = this->mesh->mvert[loop->v].no[j];
-
-        // bounding box calculations
         bound_box[0][j] = std::min(bound_box[0][j], this->mesh->mvert[loop->v].co[j]);
         bound_box[1][j] = std::max(bound_box[1][j], this->mesh->mvert[loop->v].co[j]);
       }
 
-      auto& uv = std::get<2>(*dupli_vertex_params)[0];
-      auto& uv1 = std::get<2>(*dupli_vertex_params)[1];
-
-      this->tex_coords[global_vertex_index * 2] = uv.first;
-      this->tex_coords[global_vertex_index * 2 + 1] = uv.second;
-
-      this->tex_coords2[global_vertex_index * 2] = uv1.first;
-      this->tex_coords2[global_vertex_index * 2 + 1] = uv1.second;
-
-      auto& colors = std::get<3>(*dupli_vertex_params);
-
-      // vertex color
-      for (int j = 0; j < 3; ++j)
-      {
-       this->mccv[global_vertex_index * 3 + j] = static_cast<float>(colors[0][j]) / 255.0f;
-      }
-
-      // lightmap
-      this->mccv[global_vertex_index * 3 + 3] =
-        static_cast<float>(WMODrawingMesh::color_get_avg(colors[4][0], colors[4][1], colors[4][2])) / 255.0f;
-
-      // blendmap
-      this->mccv2[global_vertex_index * 3 + 3] =
-        static_cast<float>(WMODrawingMesh::color_get_avg(colors[3][0], colors[3][1], colors[3][2])) / 255.0f;
-
       tri_index_counter++;
     }
 
@@ -696,11 +549,64 @@ bool WMODrawingMesh::update_geometry_indexed()
     }
   }
 
+  // fill the buffers, attributes of each output vertex are taken from the first loop using it
+  std::copy(this->corner_vertices.begin(), this->corner_vertices.end(), this->tri_indices);
+
+  std::vector<int> uv_layers = this->get_uv_layers();
+  std::vector<int> color_layers = this->get_color_layers();
+  std::vector<float*> uv_buffers = {this->tex_coords, this->tex_coords2};
+
+  for (int vertex_index = 0; vertex_index < n_vertices_new; ++vertex_index)
+  {
+    unsigned int loop_index = this->vertex_loops[vertex_index];
+    MVert* vertex = &this->mesh->mvert[this->mesh->mloop[loop_index].v];
+
+    for (int j = 0; j < 3; ++j)
+    {
+      this->vertices_co[vertex_index * 3 + j] = vertex->co[j];
+      this->normals[vertex_index * 3 + j] = vertex->no[j];
+    }
+
+    for (int j = 0; j < 2; ++j)
+    {
+      const float* uv = this->get_loop_uv(uv_layers, j, loop_index);
+      uv_buffers[j][vertex_index * 2] = uv[0];
+      uv_buffers[j][vertex_index * 2 + 1] = uv[1];
+    }
+
+    // vertex color
+    const MLoopCol* color = this->get_loop_color(color_layers, 0, loop_index);
+    this->mccv[vertex_index * 3] = static_cast<float>(color->r) / 255.0f;
+    this->mccv[vertex_index * 3 + 1] = static_cast<float>(color->g) / 255.0f;
+    this->mccv[vertex_index * 3 + 2] = static_cast<float>(color->b) / 255.0f;
+
+    // blendmap and lightmap
+    const MLoopCol* blendmap = this->get_loop_color(color_layers, 3, loop_index);
+    const MLoopCol* lightmap = this->get_loop_color(color_layers, 4, loop_index);
+
+    this->mccv2[vertex_index * 3] =
+      static_cast<float>(WMODrawingMesh::color_get_avg(blendmap->r, blendmap->g, blendmap->b)) / 255.0f;
+    this->mccv2[vertex_index * 3 + 1] =
+      static_cast<float>(WMODrawingMesh::color_get_avg(lightmap->r, lightmap->g, lightmap->b)) / 255.0f;
+    this->mccv2[vertex_index * 3 + 2] = 0.0f;
+  }
+
   return is_batching_valid;
 }
 
+void WMODrawingMesh::delete_retired_batches()
+{
+  for (auto batch_ptr : this->retired_batches)
+  {
+    delete batch_ptr;
+  }
+
+  this->retired_batches.clear();
+}
+
 void WMODrawingMesh::run_buffer_updates()
 {
+  this->delete_retired_batches();
 
   if (!this->is_batching_valid)
   {
@@ -784,52 +690,46 @@ void WMODrawingMesh::init_opengl_buffers()
     this->is_initialized = true;
   }
 
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 3 * sizeof(float), this->vertices_co, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_normals);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 3 * sizeof(float), this->normals, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 2 * sizeof(float), this->tex_coords, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords2);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 2 * sizeof(float), this->tex_coords2, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_mccv);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 3 * sizeof(float), this->mccv, GL_DYNAMIC_DRAW);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_mccv2);
-  glBufferData(GL_ARRAY_BUFFER, this->n_vertices * 3 * sizeof(float), this->mccv2, GL_DYNAMIC_DRAW);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo, this->vertices_co, this->vertices_co_uploaded, this->n_vertices * 3);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_normals, this->normals, this->normals_uploaded, this->n_vertices * 3);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_tex_coords, this->tex_coords, this->tex_coords_uploaded,
+                this->n_vertices * 2);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_tex_coords2, this->tex_coords2, this->tex_coords2_uploaded,
+                this->n_vertices * 2);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_mccv, this->mccv, this->mccv_uploaded, this->n_vertices * 3);
+  upload_buffer(GL_ARRAY_BUFFER, this->vbo_mccv2, this->mccv2, this->mccv2_uploaded, this->n_vertices * 3);
 
   if (this->is_indexed)
   {
-   glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, this->ibo);
-   glBufferData(GL_ELEMENT_ARRAY_BUFFER, this->n_triangles * 3 * sizeof(int), this->tri_indices, GL_DYNAMIC_DRAW);
+    upload_buffer(GL_ELEMENT_ARRAY_BUFFER, this->ibo, this->tri_indices, this->tri_indices_uploaded,
+                  this->n_triangles * 3);
+  }
+  else
+  {
+    this->tri_indices_uploaded.clear();
   }
 
 }
 
 void WMODrawingMesh::update_opengl_buffers()
 {
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 3 * sizeof(float), this->vertices_co);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_normals);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 3 * sizeof(float), this->normals);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 2 * sizeof(float), this->tex_coords);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_tex_coords2);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 2 * sizeof(float), this->tex_coords2);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_mccv);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 3 * sizeof(float), this->mccv);
-
-  glBindBuffer(GL_ARRAY_BUFFER, this->vbo_mccv2);
-  glBufferSubData(GL_ARRAY_BUFFER, 0, this->n_vertices * 3 * sizeof(float), this->mccv2);
+  // buffer sizes are unchanged, only the spans modified since the last upload are sent, e.g. painted colors
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo, this->vertices_co, this->vertices_co_uploaded,
+                     this->n_vertices * 3);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_normals, this->normals, this->normals_uploaded,
+                     this->n_vertices * 3);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_tex_coords, this->tex_coords, this->tex_coords_uploaded,
+                     this->n_vertices * 2);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_tex_coords2, this->tex_coords2, this->tex_coords2_uploaded,
+                     this->n_vertices * 2);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_mccv, this->mccv, this->mccv_uploaded, this->n_vertices * 3);
+  upload_dirty_range(GL_ARRAY_BUFFER, this->vbo_mccv2, this->mccv2, this->mccv2_uploaded, this->n_vertices * 3);
 
+  if (this->is_indexed)
+  {
+    upload_dirty_range(GL_ELEMENT_ARRAY_BUFFER, this->ibo, this->tri_indices, this->tri_indices_uploaded,
+                       this->n_triangles * 3);
+  }
 }
 
 std::vector<WMODrawingBatch*>* WMODrawingMesh::get_drawing_batches()
@@ -863,6 +763,8 @@ WMODrawingMesh::~WMODrawingMesh()
   {
     delete batch_ptr;
   }
+
+  this->delete_retired_batches();
 }
 
 
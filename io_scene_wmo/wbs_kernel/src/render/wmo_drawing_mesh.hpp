@@ -2,12 +2,12 @@
 #define WBS_KERNEL_RENDER_WMO_EDITABLE_HPP
 
 #include <wmo_drawing_batch.hpp>
+#include <buffer_utils.hpp>
+#include <vertex_dedup_map.hpp>
 
 #include <unordered_map>
 #include <cstdint>
 #include <vector>
-#include <array>
-#include <tuple>
 #include <functional>
 
 #define GLEW_STATIC
@@ -70,17 +70,30 @@ namespace wbs_kernel
     int* tri_indices = nullptr;
     //int* bone_indices = nullptr;
 
+    // copies of data last uploaded to the GPU, only ranges differing from them are re-uploaded
+    std::vector<float> vertices_co_uploaded;
+    std::vector<float> normals_uploaded;
+    std::vector<float> tex_coords_uploaded;
+    std::vector<float> tex_coords2_uploaded;
+    std::vector<float> mccv_uploaded;
+    std::vector<float> mccv2_uploaded;
+    std::vector<int> tri_indices_uploaded;
+
     // loop triangles sorted by material index
     std::vector<MLoopTri*> loop_tris;
 
     // mapping of vertex duplication within mesh, used to construct VBO/IBO etc.
+    // corner_vertices holds the output vertex of each loop triangle corner, vertex_loops the first loop of each output vertex
+    VertexDedupMap vertex_map;
+    std::vector<int> corner_vertices;
+    std::vector<unsigned int> vertex_loops;
 
-    std::unordered_map<int, std::vector<std::tuple<int, int, std::vector<std::pair<float, float>>, std::vector<std::array<unsigned char, 3>>, std::vector<int>, int>>> vertex_map;
     std::unordered_map<std::pair<int, int>, int, pair_hash> batch_length;
     std::unordered_map<MLoopTri*, WMOBatchTypes> batch_map;
 
-    // drawing batches of this mesh
+    // drawing batches of this mesh, and replaced batches waiting for deletion on the OpenGL context thread
     std::vector<WMODrawingBatch*> drawing_batches;
+    std::vector<WMODrawingBatch*> retired_batches;
 
     uint32_t n_vertices = 0;
     uint32_t n_triangles = 0;
@@ -110,10 +123,13 @@ namespace wbs_kernel
     void generate_opengl_buffers();
     void init_opengl_buffers();
     void update_opengl_buffers();
+    void delete_retired_batches();
     static unsigned char color_get_avg(unsigned char r, unsigned char g, unsigned char b);
     inline std::vector<int> get_uv_layers();
     inline std::vector<int> get_color_layers();
     WMOBatchTypes get_batch_type(MLoopTri* loop_tri, std::vector<int>& color_layers);
+    const float* get_loop_uv(const std::vector<int>& uv_layers, int layer, unsigned int loop_index);
+    const MLoopCol* get_loop_color(const std::vector<int>& color_layers, int layer, unsigned int loop_index);
 
     // Blender
     static void* CustomData_get_n(const CustomData* data, int type, int index, int n);
@@ -1,4 +1,4 @@
-from libc.stdint cimport uintptr_t, uint32_t
+from libc.stdint cimport uintptr_t, uint32_t, uint8_t
 from libcpp.vector cimport vector
 from libcpp cimport bool
 
@@ -12,6 +12,9 @@ cdef extern from "render/m2_drawing_mesh.hpp" namespace "wbs_kernel":
         void init_opengl_buffers() except +
         void run_buffer_updates() except +
         vector[M2DrawingBatch*]* get_drawing_batches() except +
+        void set_lod_triangles(int lod, const int* vertex_indices, size_t n_indices) except +
+        void clear_lods() except +
+        int get_n_lods() except +
 
 
 cdef extern from "render/m2_drawing_batch.hpp" namespace "wbs_kernel":
@@ -25,9 +28,13 @@ cdef extern from "render/m2_drawing_batch.hpp" namespace "wbs_kernel":
         void create_vao() except +
         void set_program(int shader_program) except +
         void draw() except +
+        void draw_instanced(const float* instance_data, int n_instances) except +
         int get_mat_id() except +
         float* get_bb_center() except +
         float get_sort_radius() except +
+        int get_n_lods() except +
+        void set_lod(int lod) except +
+        int get_n_drawn_tris() except +
 
 cdef extern from "render/wmo_drawing_mesh.hpp" namespace "wbs_kernel":
     cdef cppclass M2DrawingMesh:
@@ -56,6 +63,12 @@ cdef extern from "render/wmo_drawing_batch.hpp" namespace "wbs_kernel":
         float get_sort_radius() except +
 
 
+cdef extern from "render/geometry_jobs.hpp" namespace "wbs_kernel":
+
+    void update_geometry_parallel[T](T** meshes, size_t n_meshes, bool use_indexed, uint8_t* results,
+                                     unsigned int n_threads) nogil except +
+
+
 cdef extern from "render/opengl_utils.hpp" namespace "wbs_kernel":
 
     cdef cppclass COpenGLUtils:
@@ -66,3 +79,28 @@ cdef extern from "render/opengl_utils.hpp" namespace "wbs_kernel":
         @staticmethod
         void set_blend_func(int srcRGB, int dstRGB, int srcAlpha, int dstAlpha) except +
 
+        @staticmethod
+        void read_pixels(int x, int y, int width, int height, float* pixels) except +
+
+
+cdef extern from "render/frustum.hpp" namespace "wbs_kernel":
+
+    cdef cppclass Frustum:
+
+        void update(const float* view_projection) except +
+        bool intersects_sphere(const float* center, float radius) except +
+        int cull_spheres(const float* spheres, int n_spheres, uint8_t* visibility) except +
+
+
+cdef extern from "render/hiz_culler.hpp" namespace "wbs_kernel":
+
+    cdef cppclass HiZCuller:
+
+        bool capture(int width, int height, const float* view_projection, float depth_near,
+                     float depth_far) except +
+        int cull_spheres(const float* spheres, int n_spheres, const uint8_t* test_mask,
+                         uint8_t* visibility) except +
+        bool has_results() except +
+        bool is_pending() except +
+        void invalidate() except +
+        void free() except +
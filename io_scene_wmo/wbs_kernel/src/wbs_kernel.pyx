@@ -27,10 +27,49 @@ cdef class CM2DrawingMesh:
     def update_buffers(self):
         self.draw_mesh.run_buffer_updates()
 
+    def set_lod_triangles(self, int lod, const int[::1] vertex_indices):
+        """ Set triangles of a lower detail level (1 and up) as Blender vertex index triplets, applied with the next
+        geometry update """
+
+        if vertex_indices.shape[0] == 0:
+            self.draw_mesh.set_lod_triangles(lod, NULL, 0)
+        else:
+            self.draw_mesh.set_lod_triangles(lod, &vertex_indices[0], vertex_indices.shape[0])
+
+    def clear_lods(self):
+        self.draw_mesh.clear_lods()
+
+    @property
+    def n_lods(self):
+        return self.draw_mesh.get_n_lods()
+
     def __dealloc__(self):
        del self.draw_mesh
 
 
+def update_m2_geometry(meshes, bool is_indexed=True, unsigned int n_threads=0) -> List[bool]:
+    """ Prepare CPU-side geometry of drawing meshes in parallel with the GIL released, return batching validity
+    of each mesh. GPU buffers are uploaded separately with CM2DrawingMesh.update_buffers() on the GL thread. """
+
+    cdef vector[M2DrawingMesh*] c_meshes
+    cdef vector[uint8_t] results
+    cdef CM2DrawingMesh mesh
+
+    for mesh in meshes:
+        c_meshes.push_back(mesh.draw_mesh)
+
+    if c_meshes.empty():
+        return []
+
+    results.resize(c_meshes.size())
+
+    with nogil:
+        update_geometry_parallel[M2DrawingMesh](c_meshes.data(), c_meshes.size(), is_indexed, results.data(),
+                                                n_threads)
+
+    return [bool(result) for result in results]
+
+
 cdef class CM2DrawingBatch:
     cdef M2DrawingBatch* draw_batch
 
@@ -49,6 +88,17 @@ cdef class CM2DrawingBatch:
     def draw(self):
         self.draw_batch.draw()
 
+    def draw_instanced(self, float[:, ::1] instances):
+        """ Draw the batch once per row of placement matrix columns followed by RGBA color """
+
+        if instances.shape[0] == 0:
+            return
+
+        if instances.shape[1] != 20:
+            raise ValueError('Expected an (n, 20) instance data array.')
+
+        self.draw_batch.draw_instanced(&instances[0, 0], instances.shape[0])
+
     @property
     def bb_center(self):
         cdef float* bb_center = self.draw_batch.get_bb_center()
@@ -58,6 +108,19 @@ cdef class CM2DrawingBatch:
     def sort_radius(self):
         return self.draw_batch.get_sort_radius()
 
+    @property
+    def n_lods(self):
+        return self.draw_batch.get_n_lods()
+
+    def set_lod(self, int lod):
+        """ Select the detail level drawn by following draw calls, 0 is the full geometry """
+        self.draw_batch.set_lod(lod)
+
+    @property
+    def n_drawn_triangles(self):
+        """ Triangles drawn per instance at the selected detail level """
+        return self.draw_batch.get_n_drawn_tris()
+
 cdef class OpenGLUtils:
 
     @staticmethod
@@ -68,5 +131,94 @@ cdef class OpenGLUtils:
     def glBlendFuncSeparate(int srcRGB, int dstRGB, int srcAlpha, int dstAlpha):
          COpenGLUtils.set_blend_func(srcRGB, dstRGB, srcAlpha, dstAlpha)
 
+    @staticmethod
+    def read_pixels(int x, int y, float[:, :, ::1] pixels):
+        """ Read RGBA pixels of the bound framebuffer, bottom row first, into a (height, width, 4) array """
+
+        if pixels.shape[2] != 4:
+            raise ValueError('Expected a (height, width, 4) pixel array.')
+
+        if pixels.shape[0] == 0 or pixels.shape[1] == 0:
+            return
+
+        COpenGLUtils.read_pixels(x, y, pixels.shape[1], pixels.shape[0], &pixels[0, 0, 0])
+
 
+cdef class CFrustum:
+    cdef Frustum frustum
 
+    def update(self, view_projection):
+        """ Extract clipping planes from a 4x4 view projection matrix given as a sequence of rows """
+        cdef float matrix[16]
+
+        for i, row in enumerate(view_projection):
+            for j in range(4):
+                matrix[i * 4 + j] = row[j]
+
+        self.frustum.update(matrix)
+
+    def intersects_sphere(self, center, float radius):
+        cdef float c_center[3]
+        c_center[0], c_center[1], c_center[2] = center[0], center[1], center[2]
+
+        return self.frustum.intersects_sphere(c_center, radius)
+
+    def cull_spheres(self, float[:, ::1] spheres, uint8_t[::1] visibility):
+        """ Test (x, y, z, radius) rows against the frustum, fill visibility mask and return visible count """
+
+        if spheres.shape[0] == 0:
+            return 0
+
+        if spheres.shape[1] != 4 or visibility.shape[0] < spheres.shape[0]:
+            raise ValueError('Expected an (n, 4) sphere array and a visibility mask of at least n elements.')
+
+        return self.frustum.cull_spheres(&spheres[0, 0], spheres.shape[0], &visibility[0])
+
+
+cdef class CHiZCuller:
+    cdef HiZCuller* culler
+
+    def __cinit__(self):
+        self.culler = new HiZCuller()
+
+    def capture(self, int width, int height, view_projection, float depth_near, float depth_far):
+        """ Build the depth pyramid from the bound framebuffer and start reading it back, return False if skipped.
+        view_projection is a 4x4 matrix given as a sequence of rows, depth range is the one occludees are drawn with. """
+        cdef float matrix[16]
+
+        for i, row in enumerate(view_projection):
+            for j in range(4):
+                matrix[i * 4 + j] = row[j]
+
+        return self.culler.capture(width, height, matrix, depth_near, depth_far)
+
+    def cull_spheres(self, float[:, ::1] spheres, const uint8_t[::1] test_mask, uint8_t[::1] visibility):
+        """ Clear visibility of (x, y, z, radius) rows occluded in the last pyramid read back, only rows with test mask
+        set are tested. Return the number of culled rows. """
+
+        if spheres.shape[0] == 0:
+            return 0
+
+        if spheres.shape[1] != 4 or test_mask.shape[0] < spheres.shape[0] \
+                or visibility.shape[0] < spheres.shape[0]:
+            raise ValueError('Expected an (n, 4) sphere array, a test mask and a visibility mask of at least n elements.')
+
+        return self.culler.cull_spheres(&spheres[0, 0], spheres.shape[0], &test_mask[0], &visibility[0])
+
+    @property
+    def has_results(self):
+        return self.culler.has_results()
+
+    @property
+    def is_pending(self):
+        return self.culler.is_pending()
+
+    def invalidate(self):
+        self.culler.invalidate()
+
+    def free(self):
+        """ Free GPU resources, needs a GL context """
+        self.culler.free()
+
+    def __dealloc__(self):
+        del self.culler
@@ -1,11 +1,15 @@
 import bpy
 import bmesh
+import traceback
 
 from functools import partial
+from typing import Dict, Optional, Tuple
 
 from bpy.app.handlers import persistent
 from ..bl_render import BlenderWMOObjectRenderFlags
+from .registry import WMOSceneRegistry
 from ...utils.misc import show_message_box, singleton
+from ...utils.profiling import profile_handler
 
 
 @singleton
@@ -19,93 +23,8 @@ class DepsgraphLock:
         self.DEPSGRAPH_UPDATE_LOCK = False
 
 
-_obj_props = (
-              ('wow_wmo_group', 'groups'),
-              ('wow_wmo_portal', 'portals'),
-              ('wow_wmo_fog', 'fogs'),
-              ('wow_wmo_light', 'lights'),
-              ('wow_wmo_doodad_set', 'doodad_sets'),
-              ('wow_wmo_doodad', 'doodads')
-             )
-
-
-def _remove_col_items(scene, col_name):
-    col = getattr(scene.wow_wmo_root_elements, col_name)
-    for i, obj in enumerate(col):
-        if obj.pointer and obj.pointer.name not in scene.objects:
-            scene.wow_wmo_root_elements.is_update_critical = True
-            col.remove(i)
-            break
-    else:
-        return
-
-    _remove_col_items(scene, col_name)
-
-
-def _remove_col_items_doodads(scene):
-    col = scene.wow_wmo_root_elements.doodad_sets
-
-    # prevent infinite recursion
-    if not len(col):
-        return
-
-    for d_set in col:
-        for i, doodad in enumerate(d_set.doodads):
-            if doodad.pointer and doodad.pointer.name not in scene.objects:
-                scene.wow_wmo_root_elements.is_update_critical = True
-                d_set.doodads.remove(i)
-                break
-
-        else:
-            return
-
-    _remove_col_items_doodads(scene)
-
-
-def _add_col_items(scene):
-    for i, obj in enumerate(scene.objects):
-        for prop, col_name in _obj_props:
-            prop_group = getattr(obj, prop)
-
-            if col_name == 'doodads':
-
-                if prop_group.enabled:
-
-                    # identify if doodad is not in any doodad set
-                    for d_set in scene.wow_wmo_root_elements.doodad_sets:
-                        index = d_set.doodads.find(obj.name)
-
-                        if index >= 0:
-                            # check if doodad is parented to the correct set
-                            if obj.parent != d_set.pointer:
-                                obj.parent = d_set.pointer
-                            break
-
-                    else:
-                        # attempt adding to active doodad set
-                        if len(scene.wow_wmo_root_elements.doodad_sets):
-                            cur_set_index = scene.wow_wmo_root_elements.cur_doodad_set
-                            act_set = scene.wow_wmo_root_elements.doodad_sets[cur_set_index]
-                            slot = act_set.doodads.add()
-                            slot.pointer = obj
-
-                        else:
-                            bpy.data.objects.remove(obj, do_unlink=True)
-
-                    scene.wow_wmo_root_elements.is_update_critical = True
-
-                else:
-                    continue
-
-            elif prop_group.enabled:
-
-                col = getattr(scene.wow_wmo_root_elements, col_name)
-
-                if col.find(obj.name) < 0:
-                    scene.wow_wmo_root_elements.is_update_critical = True
-                    prop_group.enabled = False
-                    slot = col.add()
-                    slot.pointer = obj
+# seconds between processing of accumulated depsgraph updates
+DEPSGRAPH_UPDATE_INTERVAL = 0.1
 
 
 def _liquid_edit_mode_timer(context):
@@ -148,231 +67,395 @@ wmo_render_flag_map = {
     'Blendmap': BlenderWMOObjectRenderFlags.HasBlendmap
 }
 
-@persistent
-def on_depsgraph_update(_):
-    if DepsgraphLock().DEPSGRAPH_UPDATE_LOCK:
-        return
+class PendingObjectUpdate:
+    """ Accumulated depsgraph update state of a single object """
 
-    delete = False
-    is_duplicated = False
+    __slots__ = ('name', 'library', 'is_updated_transform', 'is_updated_geometry')
 
-    for update in bpy.context.view_layer.depsgraph.updates:
+    def __init__(self, name, library):
+        self.name = name
+        self.library = library
+        self.is_updated_transform = False
+        self.is_updated_geometry = False
+
+
+@singleton
+class DepsgraphUpdateQueue:
+    """ Deduplicated depsgraph updates waiting to be processed by a timer """
+
+    def __init__(self):
+        self.objects : Dict[int, PendingObjectUpdate] = {}
+        self.materials : Dict[int, Tuple[str, bpy.types.Library]] = {}
+        self.is_scene_updated = False
+
+    def push(self, update: bpy.types.DepsgraphUpdate):
+
+        id_ = update.id
+
+        if isinstance(id_, bpy.types.Object):
+            pending = self.objects.get(id_.original.as_pointer())
+
+            if pending is None:
+                pending = self.objects[id_.original.as_pointer()] = PendingObjectUpdate(id_.name, id_.library)
+
+            pending.is_updated_transform |= update.is_updated_transform
+            pending.is_updated_geometry |= update.is_updated_geometry
+
+        elif isinstance(id_, bpy.types.Scene):
+            self.is_scene_updated = True
+
+        elif isinstance(id_, bpy.types.Material):
+            self.materials[id_.original.as_pointer()] = id_.name, id_.library
+
+    def pop(self) -> Tuple[Dict[int, PendingObjectUpdate], Dict[int, Tuple[str, bpy.types.Library]], bool]:
+        result = self.objects, self.materials, self.is_scene_updated
+
+        self.objects = {}
+        self.materials = {}
+        self.is_scene_updated = False
+
+        return result
+
+
+def _find_queued_id(collection: bpy.types.bpy_prop_collection, pointer: int, name: str,
+                    library: Optional[bpy.types.Library], pointers: Dict[int, bpy.types.ID]) -> Optional[bpy.types.ID]:
+    """ Find a datablock queued for update. Datablocks are looked up by name first, and by pointer if renamed
+    since the update was queued. The pointers dictionary is filled on first use and reused for the whole batch. """
+
+    id_ = collection.get((name, library))
+
+    if id_ is not None and id_.as_pointer() == pointer:
+        return id_
+
+    if not pointers:
+        pointers.update((item.as_pointer(), item) for item in collection)
+
+    id_ = pointers.get(pointer)
+
+    # datablock may have been deleted while processing other updates of the batch
+    try:
+        return id_ if id_ is not None and id_.as_pointer() == pointer else None
+
+    except ReferenceError:
+        return None
+
+
+def _get_context_override() -> dict:
+    """ Build a context for operators and popups called from the update timer, which runs without a window.
+    Window and 3D view keys are left out when none is open (background mode). """
+
+    wm = bpy.context.window_manager
+    override = {'scene': bpy.context.scene, 'view_layer': bpy.context.view_layer}
+
+    win = bpy.context.window or (wm.windows[0] if wm.windows else None)
 
-        try:
-            if isinstance(update.id, bpy.types.Object) and update.id.type == 'MESH':
-                if update.id.wow_wmo_doodad.enabled:
-                    obj = bpy.data.objects[update.id.name, update.id.library]
-                    DepsgraphLock().DEPSGRAPH_UPDATE_LOCK = True
-
-                    # handle object copies
-                    if obj.active_material.users > 1:
-                        for i, mat in enumerate(obj.data.materials):
-                            mat = mat.copy()
-                            obj.data.materials[i] = mat
-                            is_duplicated = True
-
-                    if is_duplicated:
-                        continue
-
-                    # enforce object mode
-                    if obj.mode != 'OBJECT':
-                        bpy.ops.object.mode_set(mode='OBJECT')
-
-                    # remove modifiers
-                    if len(obj.modifiers):
-                        obj.modifiers.clear()
+    if win is None:
+        return override
 
-                    # delete if object was processed by a specific operator
-                    if bpy.context.window_manager.operators \
-                    and bpy.context.window_manager.operators[-1].bl_idname in banned_ops:
-                        delete = True
-                        bpy.data.objects.remove(obj, do_unlink=True)
+    # avoid focusing settings window if left open
+    if win.screen.name == 'temp':
 
-                    if update.is_updated_transform:
-                        # check if object is scaled evenly
-                        max_scale = 0.0
-                        for j in range(3):
-                            if obj.scale[j] > max_scale:
-                                max_scale = obj.scale[j]
+        for win_ in wm.windows:
+            if win_.screen.name != 'temp':
+                win = win_
 
-                        obj.scale = (max_scale, max_scale, max_scale)
+    override.update({'window': win, 'screen': win.screen, 'workspace': win.workspace})
 
-                elif update.id.wow_wmo_liquid.enabled:
-                    obj = bpy.data.objects[update.id.name, update.id.library]
+    area = next((area for area in win.screen.areas if area.type == 'VIEW_3D'), None)
 
-                    with DepsgraphLock():
-                        if obj.mode == 'EDIT':
+    if area:
+        override.update({'area': area,
+                         'region': next(region for region in area.regions if region.type == 'WINDOW'),
+                         'space_data': area.spaces.active,
+                         'region_data': area.spaces.active.region_3d})
 
-                            win = bpy.context.window
+    return override
 
-                            # avoid focusing settings window if left open
-                            if win.screen.name == 'temp':
 
-                                for win_ in bpy.context.window_manager.windows:
-                                    if win_.screen.name != 'temp':
-                                        win = win_
+def _set_object_mode(obj: bpy.types.Object, override: dict, mode: str = 'OBJECT'):
+    bpy.ops.object.mode_set(dict(override, active_object=obj, object=obj), mode=mode)
 
-                            scr = win.screen
-                            areas3d = [area for area in scr.areas if area.type == 'VIEW_3D']
-                            region = [region for region in areas3d[0].regions if region.type == 'WINDOW'][0]
-                            space = [space for space in areas3d[0].regions if space.type == 'VIEW_3D']
 
-                            override = {'window': win,
-                                        'screen': scr,
-                                        'area': areas3d[0],
-                                        'region': region,
-                                        'scene': bpy.context.scene,
-                                        'workspace': bpy.context.workspace,
-                                        'space_data': space,
-                                        'region_data': region
-                                        }
+def _process_doodad_update(obj: bpy.types.Object, pending: PendingObjectUpdate, override: dict) -> bool:
+    """ Enforce doodad editing restrictions, return True if doodad was deleted """
 
-                            # we need a timer here to prevent operator recognizing tab event as exit
-                            bpy.app.timers.register(partial(_liquid_edit_mode_timer, override), first_interval=0.1)
+    # handle object copies
+    if obj.active_material and obj.active_material.users > 1:
+        for i, mat in enumerate(obj.data.materials):
+            obj.data.materials[i] = mat.copy()
 
-                        # enforce object mode or sculpt mode
-                        elif obj.mode not in ('OBJECT', 'SCULPT'):
-                            bpy.context.view_layer.objects.active = obj
-                            bpy.ops.object.mode_set(mode='OBJECT')
+        return False
 
-                        # enforce Z plane for sculpting brushes
-                        if obj.mode == 'SCULPT':
-                            for brush in bpy.data.brushes:
-                                brush.sculpt_plane = 'Z'
+    # enforce object mode
+    if obj.mode != 'OBJECT':
+        _set_object_mode(obj, override)
 
-                        obj.scale = (1, 1, 1)
-                        obj.rotation_mode = 'XYZ'
-                        obj.rotation_euler = (0, 0, 0)
+    # remove modifiers
+    if len(obj.modifiers):
+        obj.modifiers.clear()
 
-                        # remove modifiers
-                        if len(obj.modifiers):
-                            obj.modifiers.clear()
+    # delete if object was processed by a specific operator
+    if bpy.context.window_manager.operators \
+    and bpy.context.window_manager.operators[-1].bl_idname in banned_ops:
+        bpy.data.objects.remove(obj, do_unlink=True)
+        return True
 
-                elif update.id.wow_wmo_fog.enabled:
-                    obj = bpy.data.objects[update.id.name, update.id.library]
+    if pending.is_updated_transform:
+        # check if object is scaled evenly
+        max_scale = max(obj.scale)
 
-                    with DepsgraphLock():
-                        # enforce object mode
-                        if obj.mode != 'OBJECT':
-                            bpy.context.view_layer.objects.active = obj
-                            bpy.ops.object.mode_set(mode='OBJECT')
+        if tuple(obj.scale) != (max_scale, max_scale, max_scale):
+            obj.scale = (max_scale, max_scale, max_scale)
 
-                elif update.id.wow_wmo_group.enabled:
-                    obj = bpy.data.objects[update.id.name, update.id.library]
-                    mesh = obj.data
+    return False
 
-                    for col_name, flag in wmo_render_flag_map.items():
-                        col = mesh.vertex_colors.get(col_name)
 
-                        if col:
-                            obj.pass_index |= flag
-                        else:
-                            obj.pass_index &= ~flag
+def _process_liquid_update(obj: bpy.types.Object, override: dict):
 
-                    if obj.mode == 'EDIT':
-                        bm = bmesh.from_edit_mesh(mesh)
+    if obj.mode == 'EDIT':
 
-                        if bm.faces.active:
+        # liquid editing is modal in a 3D view, we need a timer here to prevent operator recognizing tab event as exit
+        if 'area' in override:
+            bpy.app.timers.register(partial(_liquid_edit_mode_timer, dict(override, active_object=obj, object=obj)),
+                                    first_interval=0.1)
 
-                            root_elements = bpy.context.scene.wow_wmo_root_elements
-                            mat_index_active = bm.faces.active.material_index
+    # enforce object mode or sculpt mode
+    elif obj.mode not in ('OBJECT', 'SCULPT'):
+        bpy.context.view_layer.objects.active = obj
+        _set_object_mode(obj, override)
 
-                            if mesh.materials:
-                                mat_index = root_elements.materials.find(mesh.materials[mat_index_active].name)
+    # enforce Z plane for sculpting brushes
+    if obj.mode == 'SCULPT':
+        for brush in bpy.data.brushes:
+            if brush.sculpt_plane != 'Z':
+                brush.sculpt_plane = 'Z'
 
-                                if mat_index >= 0 and root_elements.cur_material != mat_index:
+    if tuple(obj.scale) != (1, 1, 1):
+        obj.scale = (1, 1, 1)
 
-                                    with DepsgraphLock():
-                                        root_elements.cur_material = mat_index
+    if obj.rotation_mode != 'XYZ':
+        obj.rotation_mode = 'XYZ'
 
-                    if update.is_updated_geometry:
-                        group_entry = bpy.context.scene.wow_wmo_root_elements.groups.get(obj.name)
+    if tuple(obj.rotation_euler) != (0, 0, 0):
+        obj.rotation_euler = (0, 0, 0)
 
-                        if group_entry:  # TODO: find out why there is a possible WMO group not in the list yet.
-                            group_entry.export = True
+    # remove modifiers
+    if len(obj.modifiers):
+        obj.modifiers.clear()
 
-            elif isinstance(update.id, bpy.types.Scene):
 
-                if bpy.context.view_layer.objects.active \
-                and bpy.context.view_layer.objects.active.select_get():
+def _process_fog_update(obj: bpy.types.Object, override: dict):
 
-                    # sync collection active items
-                    act_obj = bpy.context.view_layer.objects.active
+    # enforce object mode
+    if obj.mode != 'OBJECT':
+        bpy.context.view_layer.objects.active = obj
+        _set_object_mode(obj, override)
 
-                    root_comps = bpy.context.scene.wow_wmo_root_elements
-                    if act_obj:
-                        if act_obj.wow_wmo_group.enabled:
-                            slot_idx = root_comps.groups.find(act_obj.name)
-                            root_comps.cur_group = slot_idx
 
-                        elif act_obj.wow_wmo_fog.enabled:
-                            slot_idx = root_comps.fogs.find(act_obj.name)
-                            root_comps.cur_fog = slot_idx
+def _process_group_update(obj: bpy.types.Object, pending: PendingObjectUpdate):
 
-                        elif act_obj.wow_wmo_light.enabled:
-                            slot_idx = root_comps.lights.find(act_obj.name)
-                            root_comps.cur_light = slot_idx
+    mesh = obj.data
 
-                        elif act_obj.wow_wmo_portal.enabled:
-                            slot_idx = root_comps.portals.find(act_obj.name)
-                            root_comps.cur_portal = slot_idx
+    for col_name, flag in wmo_render_flag_map.items():
+        col = mesh.vertex_colors.get(col_name)
 
-                        elif act_obj.wow_wmo_doodad.enabled:
-                            d_set = root_comps.doodad_sets[root_comps.cur_doodad_set]
+        pass_index = obj.pass_index | flag if col else obj.pass_index & ~flag
 
-                            if d_set.pointer:
-                                slot_idx = d_set.doodads.find(act_obj.name)
+        if obj.pass_index != pass_index:
+            obj.pass_index = pass_index
 
-                                if slot_idx >= 0:
-                                    d_set.cur_doodad = slot_idx
+    if obj.mode == 'EDIT':
+        bm = bmesh.from_edit_mesh(mesh)
 
-                # fill collections
-                n_objs = len(bpy.context.scene.objects)
+        if bm.faces.active:
 
-                if n_objs == bpy.wbs_n_scene_objects:
+            root_elements = bpy.context.scene.wow_wmo_root_elements
+            mat_index_active = bm.faces.active.material_index
+
+            if mesh.materials:
+                mat_index = root_elements.materials.find(mesh.materials[mat_index_active].name)
+
+                if mat_index >= 0 and root_elements.cur_material != mat_index:
+                    root_elements.cur_material = mat_index
+
+    if pending.is_updated_geometry:
+        group_entry = bpy.context.scene.wow_wmo_root_elements.groups.get(obj.name)
+
+        if group_entry:  # TODO: find out why there is a possible WMO group not in the list yet.
+            group_entry.export = True
+
+
+def _process_scene_update(scene: bpy.types.Scene, registry: WMOSceneRegistry):
+
+    if bpy.context.view_layer.objects.active \
+    and bpy.context.view_layer.objects.active.select_get():
+
+        # sync collection active items
+        act_obj = bpy.context.view_layer.objects.active
+
+        root_comps = scene.wow_wmo_root_elements
+        if act_obj:
+            if act_obj.wow_wmo_group.enabled:
+                slot_idx = root_comps.groups.find(act_obj.name)
+                root_comps.cur_group = slot_idx
+
+            elif act_obj.wow_wmo_fog.enabled:
+                slot_idx = root_comps.fogs.find(act_obj.name)
+                root_comps.cur_fog = slot_idx
+
+            elif act_obj.wow_wmo_light.enabled:
+                slot_idx = root_comps.lights.find(act_obj.name)
+                root_comps.cur_light = slot_idx
+
+            elif act_obj.wow_wmo_portal.enabled:
+                slot_idx = root_comps.portals.find(act_obj.name)
+                root_comps.cur_portal = slot_idx
+
+            elif act_obj.wow_wmo_doodad.enabled:
+                d_set = root_comps.doodad_sets[root_comps.cur_doodad_set]
+
+                if d_set.pointer:
+                    slot_idx = d_set.doodads.find(act_obj.name)
+
+                    if slot_idx >= 0:
+                        d_set.cur_doodad = slot_idx
+
+    # remove deleted objects from collections
+    n_objs = len(scene.objects)
+
+    if n_objs < bpy.wbs_n_scene_objects:
+        registry.remove_stale(scene)
+
+    bpy.wbs_n_scene_objects = n_objs
+
+
+def _process_material_update(mat: bpy.types.Material):
+
+    if mat.wow_wmo_material.enabled \
+    and bpy.context.scene.wow_wmo_root_elements.materials.find(mat.name) < 0:
+        mat.wow_wmo_material.enabled = False
+        slot = bpy.context.scene.wow_wmo_root_elements.materials.add()
+        slot.pointer = mat
+
+
+@profile_handler()
+def process_depsgraph_updates():
+    """ Process depsgraph updates accumulated since the last run, each object is processed once """
+
+    objects, materials, is_scene_updated = DepsgraphUpdateQueue().pop()
+
+    delete = False
+
+    scene = bpy.context.scene
+    registry = WMOSceneRegistry()
+    override = _get_context_override()
+
+    with DepsgraphLock():
+
+        if registry.ensure_index(scene):
+            registry.sync_scene(scene)
+            bpy.wbs_n_scene_objects = len(scene.objects)
+
+        object_pointers = {}
+
+        for obj_ptr, pending in objects.items():
+            obj = _find_queued_id(bpy.data.objects, obj_ptr, pending.name, pending.library, object_pointers)
+
+            # object was deleted since the update was queued
+            if obj is None:
+                continue
+
+            # the queue is already drained, a failing object must not drop updates of the others
+            try:
+                # register new WMO entities, doodads outside of doodad sets get deleted
+                if registry.register_objects(scene, (obj,)) or obj.type != 'MESH':
                     continue
 
-                if n_objs < bpy.wbs_n_scene_objects:
-                    bpy.wbs_n_scene_objects = n_objs
+                if obj.wow_wmo_doodad.enabled:
+                    delete |= _process_doodad_update(obj, pending, override)
+
+                elif obj.wow_wmo_liquid.enabled:
+                    _process_liquid_update(obj, override)
 
-                    _remove_col_items(bpy.context.scene, 'groups')
-                    _remove_col_items(bpy.context.scene, 'portals')
-                    _remove_col_items(bpy.context.scene, 'fogs')
-                    _remove_col_items(bpy.context.scene, 'lights')
-                    _remove_col_items(bpy.context.scene, 'doodad_sets')
-                    _remove_col_items_doodads(bpy.context.scene)
+                elif obj.wow_wmo_fog.enabled:
+                    _process_fog_update(obj, override)
 
-                else:
-                    bpy.wbs_n_scene_objects = n_objs
-                    _add_col_items(bpy.context.scene)
+                elif obj.wow_wmo_group.enabled:
+                    _process_group_update(obj, pending)
 
-            elif isinstance(update.id, bpy.types.Material):
+            except:
+                print('Error: Failed to process depsgraph update of object "{}".'.format(pending.name))
+                traceback.print_exc()
 
-                mat = bpy.data.materials[update.id.name, update.id.library]
+        if is_scene_updated:
+            _process_scene_update(scene, registry)
 
-                if mat.wow_wmo_material.enabled \
-                and bpy.context.scene.wow_wmo_root_elements.materials.find(mat.name) < 0:
-                    mat.wow_wmo_material.enabled = False
-                    slot = bpy.context.scene.wow_wmo_root_elements.materials.add()
-                    slot.pointer = mat
+        material_pointers = {}
 
-        finally:
-            DepsgraphLock().DEPSGRAPH_UPDATE_LOCK = False
+        for mat_ptr, (name, library) in materials.items():
+            mat = _find_queued_id(bpy.data.materials, mat_ptr, name, library, material_pointers)
+
+            if not mat:
+                continue
+
+            try:
+                _process_material_update(mat)
+
+            except:
+                print('Error: Failed to process depsgraph update of material "{}".'.format(name))
+                traceback.print_exc()
 
     if delete:
         show_message_box('One or more doodads were deleted due to mesh changes. Editing doodads is not allowed.'
                          , "WoW Blender Studio Error"
-                         , icon='ERROR')
+                         , icon='ERROR'
+                         , override=override)
+
+
+@persistent
+@profile_handler()
+def on_depsgraph_update(_):
+    if DepsgraphLock().DEPSGRAPH_UPDATE_LOCK:
+        return
+
+    queue = DepsgraphUpdateQueue()
+
+    for update in bpy.context.view_layer.depsgraph.updates:
+        queue.push(update)
+
+    # changes are coalesced and processed once per interval, keeping interactive transforms responsive
+    if not bpy.app.timers.is_registered(process_depsgraph_updates):
+        bpy.app.timers.register(process_depsgraph_updates, first_interval=DEPSGRAPH_UPDATE_INTERVAL)
+
+
+@persistent
+def on_datablocks_reallocated(*_):
+    """ Undo, redo and file loading reallocate datablocks, leaving object pointers of the registry stale """
+
+    WMOSceneRegistry().reset()
+
+    # queued updates may refer to freed datablocks, the scene is fully synchronized by the next update instead
+    DepsgraphUpdateQueue().pop()
 
 
 def register():
     bpy.wbs_n_scene_objects = 0
     bpy.types.Object.wow_subject_to_removal = bpy.props.BoolProperty(default=False)
     bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    bpy.app.handlers.undo_post.append(on_datablocks_reallocated)
+    bpy.app.handlers.redo_post.append(on_datablocks_reallocated)
+    bpy.app.handlers.load_post.append(on_datablocks_reallocated)
 
 
 def unregister():
     bpy.app.handlers.depsgraph_update_post.remove(on_depsgraph_update)
+    bpy.app.handlers.undo_post.remove(on_datablocks_reallocated)
+    bpy.app.handlers.redo_post.remove(on_datablocks_reallocated)
+    bpy.app.handlers.load_post.remove(on_datablocks_reallocated)
+
+    if bpy.app.timers.is_registered(process_depsgraph_updates):
+        bpy.app.timers.unregister(process_depsgraph_updates)
+
     del bpy.wbs_n_scene_objects
     del bpy.types.Object.wow_subject_to_removal
 
@@ -1,12 +1,11 @@
 import bpy
-import mathutils
+import time
 
 from ..panels.toolbar import switch_doodad_set, get_doodad_sets
 from ...utils.doodads import import_doodad
+from ...utils.doodad_colors import DoodadColorBaker
 from ...utils.wmv import wmv_get_last_m2
 from ....ui import get_addon_prefs
-from ....utils.misc import find_nearest_object
-from ....third_party.tqdm import tqdm
 
 
 class WMO_OT_wmv_import_doodad_from_wmv(bpy.types.Operator):
@@ -49,91 +48,18 @@ class WMO_OT_doodads_bake_color(bpy.types.Operator):
     bl_description = "Bake doodads colors from nearby vertex color values"
     bl_options = {'UNDO', 'REGISTER'}
 
-    tree_map = {}
-
-    @staticmethod
-    def get_object_radius(obj):
-        corner_min = [32767, 32767, 32767]
-        corner_max = [0, 0, 0]
-
-        mesh = obj.data
-
-        for vertex in mesh.vertices:
-            for i in range(3):
-                corner_min[i] = min(corner_min[i], vertex.co[i])
-                corner_max[i] = max(corner_max[i], vertex.co[i])
-        result = (mathutils.Vector(corner_min) - mathutils.Vector(corner_max))
-        return (abs(result.x) + abs(result.y) + abs(result.z)) / 3
-
-    def gen_doodad_color(self, obj, group):
-
-        mesh = group.data
-
-        if 'Col' not in mesh.vertex_colors:
-            return 0.5, 0.5, 0.5, 1.0
-
-        radius = self.get_object_radius(obj)
-        colors = []
-
-        kd_tree = self.tree_map.get(group.name)
-        if not kd_tree:
-            kd_tree = mathutils.kdtree.KDTree(len(mesh.polygons))
-
-            for index, poly in enumerate(mesh.polygons):
-                kd_tree.insert(group.matrix_world @ poly.center, index)
-
-            kd_tree.balance()
-            self.tree_map[group.name] = kd_tree
-
-        polygons = kd_tree.find_range(obj.location, radius)
-
-        if not polygons:
-            polygons.append(kd_tree.find(obj.location))
-
-        for poly in polygons:
-            for loop_index in mesh.polygons[poly[1]].loop_indices:
-                colors.append(mesh.vertex_colors['Col'].data[loop_index].color)
-
-        if not colors:
-            return 0.5, 0.5, 0.5, 1.0
-
-        final_color = mathutils.Vector((0, 0, 0, 0))
-
-        for color in colors:
-            final_color += mathutils.Vector(color)
-
-        final_color = final_color / len(colors)
-
-        flags = bpy.context.scene.wow_wmo_root.flags
-
-        if "2" in flags and group.wow_wmo_group.place_type == '8192':
-            final_color += mathutils.Vector(tuple([c / 2 for c in bpy.context.scene.wow_wmo_root.ambient_color]))
-
-        return final_color
-
     def execute(self, context):
 
-        doodad_counter = 0
-
-        groups = [obj for obj in bpy.context.scene.objects if obj.wow_wmo_group.enabled]
-
-        for index, obj in enumerate(tqdm(bpy.context.selected_objects, desc='Baking doodad colors', ascii=True)):
-            if obj.wow_wmo_doodad.enabled:
-
-                group = find_nearest_object(obj, groups)
-
-                if '0' not in group.wow_wmo_group.flags or not group.data.vertex_colors.get('Col'):
-                    continue
-
-                vertex_color = self.gen_doodad_color(obj, group)
+        start_time = time.perf_counter()
 
-                color = [pow(x, 2.2) for x in vertex_color]
-                obj.wow_wmo_doodad.color = color
+        baker = DoodadColorBaker(context.scene)
+        doodad_counter = baker.bake(bpy.context.selected_objects)
 
-                doodad_counter += 1
+        elapsed = time.perf_counter() - start_time
 
         if doodad_counter:
-            self.report({'INFO'}, "Done baking colors to {} doodad instances.".format(doodad_counter))
+            self.report({'INFO'}, "Done baking colors to {} doodad instances in {:.2f} seconds ({:.0f} doodads/s)."
+                        .format(doodad_counter, elapsed, doodad_counter / max(elapsed, 1e-6)))
         else:
             self.report({'ERROR'}, "No doodad instances found among selected objects.")
         return {'FINISHED'}
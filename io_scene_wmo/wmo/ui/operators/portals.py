@@ -1,5 +1,6 @@
 import bpy
 from ..enums import portal_dir_alg_enum
+from ...utils.spatial import GroupSpatialIndex
 
 
 class WMO_OT_bake_portal_relations(bpy.types.Operator):
@@ -10,33 +11,24 @@ class WMO_OT_bake_portal_relations(bpy.types.Operator):
 
     def execute(self, context):
 
-        def find_nearest_objects_pair(object, objects):
-
-            pairs = []
-
-            for obj in objects:
-                hit = obj.closest_point_on_mesh(
-                    obj.matrix_world.inverted() @ (object.matrix_world @ object.data.polygons[0].center))
-                hit_dist = (obj.matrix_world @ hit[1] - object.matrix_world @ object.data.polygons[0].center).length
-                pairs.append((obj, hit_dist))
-
-            pairs.sort(key=lambda x: x[1])
-
-            return pairs[0][0], pairs[1][0]
-
         if not bpy.context.selected_objects:
             self.report({'ERROR'}, "No objects selected.")
             return {'FINISHED'}
 
         success = False
 
-        groups = tuple(x for x in bpy.context.scene.objects if x.wow_wmo_group.enabled and not x.hide_get())
+        group_index = GroupSpatialIndex(x for x in bpy.context.scene.objects
+                                        if x.wow_wmo_group.enabled and not x.hide_get())
 
         for obj in bpy.context.selected_objects:
             if obj.wow_wmo_portal.enabled:
-                direction = find_nearest_objects_pair(obj, groups)
-                obj.wow_wmo_portal.first = direction[0] if direction[0] else ""
-                obj.wow_wmo_portal.second = direction[1] if direction[1] else ""
+                direction = group_index.find_nearest(obj.matrix_world @ obj.data.polygons[0].center, count=2)
+
+                if len(direction) < 2:
+                    continue
+
+                obj.wow_wmo_portal.first = direction[0][0]
+                obj.wow_wmo_portal.second = direction[1][0]
                 success = True
 
         if success:
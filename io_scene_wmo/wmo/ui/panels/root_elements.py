@@ -10,6 +10,7 @@ from .material import WMO_PT_material, update_flags, update_shader
 from .portal import WMO_PT_portal
 from .utils import WMO_UL_root_elements_template_list, update_current_object, update_doodad_pointer, is_obj_unused
 from ..handlers import DepsgraphLock
+from ..registry import WMOSceneRegistry
 from .... import ui_icons
 
 
@@ -330,6 +331,7 @@ def update_object_pointer(self, context, prop, obj_type):
         self.pointer_old = None
         self.name = ""
 
+    WMOSceneRegistry().invalidate()
     context.scene.wow_wmo_root_elements.is_update_critical = True
 
 
@@ -1,5 +1,6 @@
 import bpy
 from ..handlers import DepsgraphLock
+from ..registry import WMOSceneRegistry
 
 
 _obj_props = ['wow_wmo_portal',
@@ -16,6 +17,8 @@ def update_doodad_pointer(self, context):
     if self.pointer and self.name != self.pointer.name:
         self.name = self.pointer.name
 
+    WMOSceneRegistry().invalidate()
+
 
 def update_current_object(self, context, col_name, cur_item_name):
 
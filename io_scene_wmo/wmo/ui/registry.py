@@ -0,0 +1,163 @@
+import bpy
+
+from typing import Dict, Iterable, Set, Tuple
+
+from ...utils.misc import singleton
+
+
+_obj_props = (
+              ('wow_wmo_group', 'groups'),
+              ('wow_wmo_portal', 'portals'),
+              ('wow_wmo_fog', 'fogs'),
+              ('wow_wmo_light', 'lights'),
+              ('wow_wmo_doodad_set', 'doodad_sets'),
+              ('wow_wmo_doodad', 'doodads')
+             )
+
+
+@singleton
+class WMOSceneRegistry:
+    """ Keeps WMO root element collections in sync with scene objects.
+    Entities are tracked by object pointer, so only objects reported by depsgraph updates need to be examined. """
+
+    def __init__(self):
+        self.scene_ptr : int = 0
+        self.is_valid : bool = False
+        self.signature : Tuple[int, ...] = ()
+        self.slots : Dict[str, Set[int]] = {}
+        self.doodads : Dict[int, int] = {}
+
+    def invalidate(self):
+        """ Mark the pointer index outdated, needs to be called when slot pointers are reassigned """
+        self.is_valid = False
+
+    def reset(self):
+        """ Forget the indexed scene, needs to be called when datablocks are reallocated (undo, redo, file load).
+        Next update rebuilds the index and fully synchronizes the scene. """
+        self.is_valid = False
+        self.scene_ptr = 0
+
+    @staticmethod
+    def get_signature(root_elements) -> Tuple[int, ...]:
+        return tuple(len(getattr(root_elements, col_name)) for _, col_name in _obj_props[:-1]) \
+               + tuple(len(d_set.doodads) for d_set in root_elements.doodad_sets)
+
+    def rebuild_index(self, root_elements):
+        """ Index object pointers referenced by root element slots """
+
+        for _, col_name in _obj_props[:-1]:
+            self.slots[col_name] = {slot.pointer.as_pointer() for slot in getattr(root_elements, col_name)
+                                    if slot.pointer}
+
+        self.doodads = {slot.pointer.as_pointer(): i for i, d_set in enumerate(root_elements.doodad_sets)
+                        for slot in d_set.doodads if slot.pointer}
+
+        self.signature = self.get_signature(root_elements)
+        self.is_valid = True
+
+    def ensure_index(self, scene: bpy.types.Scene) -> bool:
+        """ Validate pointer index against the scene, return True if scene requires a full synchronization """
+
+        root_elements = scene.wow_wmo_root_elements
+
+        if not self.is_valid or self.signature != self.get_signature(root_elements):
+            self.rebuild_index(root_elements)
+
+        if scene.as_pointer() != self.scene_ptr:
+            self.scene_ptr = scene.as_pointer()
+            return True
+
+        return False
+
+    def register_doodad(self, scene: bpy.types.Scene, obj: bpy.types.Object) -> bool:
+        """ Ensure doodad belongs to a doodad set, return False if it had to be deleted """
+
+        root_elements = scene.wow_wmo_root_elements
+        set_index = self.doodads.get(obj.as_pointer())
+
+        if set_index is not None:
+            d_set = root_elements.doodad_sets[set_index]
+
+            # check if doodad is parented to the correct set
+            if obj.parent != d_set.pointer:
+                obj.parent = d_set.pointer
+                root_elements.is_update_critical = True
+
+            return True
+
+        root_elements.is_update_critical = True
+
+        # attempt adding to active doodad set
+        if len(root_elements.doodad_sets):
+            cur_set_index = root_elements.cur_doodad_set
+            slot = root_elements.doodad_sets[cur_set_index].doodads.add()
+            slot.pointer = obj
+            self.doodads[obj.as_pointer()] = cur_set_index
+
+            return True
+
+        bpy.data.objects.remove(obj, do_unlink=True)
+        return False
+
+    def register_objects(self, scene: bpy.types.Scene, objects: Iterable[bpy.types.Object]) -> Set[int]:
+        """ Add WMO entities missing from root element collections, return pointers of deleted objects """
+
+        root_elements = scene.wow_wmo_root_elements
+        deleted = set()
+
+        for obj in objects:
+            obj_ptr = obj.as_pointer()
+
+            for prop, col_name in _obj_props:
+                prop_group = getattr(obj, prop)
+
+                if not prop_group.enabled:
+                    continue
+
+                if col_name == 'doodads':
+
+                    if not self.register_doodad(scene, obj):
+                        deleted.add(obj_ptr)
+                        break
+
+                elif obj_ptr not in self.slots[col_name]:
+                    root_elements.is_update_critical = True
+                    prop_group.enabled = False
+                    slot = getattr(root_elements, col_name).add()
+                    slot.pointer = obj
+
+                    if slot.pointer:
+                        self.slots[col_name].add(obj_ptr)
+
+        self.signature = self.get_signature(root_elements)
+
+        return deleted
+
+    def remove_stale(self, scene: bpy.types.Scene):
+        """ Remove slots pointing to objects that are no longer in the scene in a single pass """
+
+        root_elements = scene.wow_wmo_root_elements
+        scene_objects = {obj.as_pointer() for obj in scene.objects}
+
+        def remove_from(col):
+            for i in reversed(range(len(col))):
+                pointer = col[i].pointer
+
+                if pointer and pointer.as_pointer() not in scene_objects:
+                    root_elements.is_update_critical = True
+                    col.remove(i)
+
+        for _, col_name in _obj_props[:-1]:
+            remove_from(getattr(root_elements, col_name))
+
+        # doodad sets are processed first, so doodads of removed sets are not visited
+        for d_set in root_elements.doodad_sets:
+            remove_from(d_set.doodads)
+
+        self.rebuild_index(root_elements)
+
+    def sync_scene(self, scene: bpy.types.Scene):
+        """ Fully synchronize root element collections with all scene objects """
+
+        self.remove_stale(scene)
+        self.register_objects(scene, list(scene.objects))
@@ -0,0 +1,149 @@
+import bpy
+import hashlib
+import numpy as np
+
+from collections import OrderedDict
+from mathutils import Vector
+from mathutils.kdtree import KDTree
+from typing import Dict, List, Tuple
+
+from .spatial import GroupSpatialIndex
+
+
+DEFAULT_DOODAD_COLOR = (0.5, 0.5, 0.5, 1.0)
+
+
+class DoodadColorBaker:
+    """ Bakes doodad colors from vertex colors of nearby WMO group polygons """
+
+    # KD-trees of world-space polygon centers, keyed by a hash of group geometry and placement.
+    # Editing or moving a group changes its key, so stale trees are never reused.
+    kd_tree_cache : 'OrderedDict[bytes, KDTree]' = OrderedDict()
+    kd_tree_cache_size = 64
+
+    def __init__(self, scene: bpy.types.Scene):
+        self.scene = scene
+        self.group_index = GroupSpatialIndex(obj for obj in scene.objects if obj.wow_wmo_group.enabled)
+
+    @classmethod
+    def get_kd_tree(cls, group: bpy.types.Object, centers: np.ndarray) -> KDTree:
+        """ Get cached KD-tree of world-space polygon centers of a group """
+
+        key = hashlib.md5(centers.tobytes())
+        key.update(np.array(group.matrix_world, dtype=np.float32).tobytes())
+        key = key.digest()
+
+        kd_tree = cls.kd_tree_cache.get(key)
+
+        if kd_tree is not None:
+            cls.kd_tree_cache.move_to_end(key)
+            return kd_tree
+
+        matrix = group.matrix_world
+        kd_tree = KDTree(len(centers))
+
+        for index, center in enumerate(centers):
+            kd_tree.insert(matrix @ Vector(center), index)
+
+        kd_tree.balance()
+
+        cls.kd_tree_cache[key] = kd_tree
+
+        if len(cls.kd_tree_cache) > cls.kd_tree_cache_size:
+            cls.kd_tree_cache.popitem(last=False)
+
+        return kd_tree
+
+    @staticmethod
+    def get_polygon_colors(mesh: bpy.types.Mesh) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Get polygon centers, per-polygon sums of 'Col' loop colors and polygon loop counts """
+
+        n_polys = len(mesh.polygons)
+
+        centers = np.empty(n_polys * 3, dtype=np.float32)
+        mesh.polygons.foreach_get('center', centers)
+
+        loop_starts = np.empty(n_polys, dtype=np.int32)
+        mesh.polygons.foreach_get('loop_start', loop_starts)
+
+        loop_totals = np.empty(n_polys, dtype=np.int32)
+        mesh.polygons.foreach_get('loop_total', loop_totals)
+
+        colors = np.empty(len(mesh.loops) * 4, dtype=np.float32)
+        mesh.vertex_colors['Col'].data.foreach_get('color', colors)
+
+        color_sums = np.add.reduceat(colors.reshape(-1, 4), loop_starts, axis=0) if n_polys \
+            else np.zeros((0, 4), dtype=np.float32)
+
+        return centers.reshape(-1, 3), color_sums, loop_totals
+
+    @staticmethod
+    def get_doodad_radius(obj: bpy.types.Object) -> float:
+        """ Get the radius of nearby polygons contributing to doodad color """
+
+        bound_box = np.array([corner[:] for corner in obj.bound_box], dtype=np.float32)
+        return float(np.abs(bound_box.max(axis=0) - bound_box.min(axis=0)).sum() / 3)
+
+    def bake_group(self, group: bpy.types.Object, doodads: List[bpy.types.Object]) -> np.ndarray:
+        """ Calculate linear colors of doodads located in a group """
+
+        centers, color_sums, loop_totals = self.get_polygon_colors(group.data)
+
+        if not len(centers):
+            return np.tile(np.array(DEFAULT_DOODAD_COLOR, dtype=np.float32), (len(doodads), 1))
+
+        kd_tree = self.get_kd_tree(group, centers)
+
+        poly_indices = []
+        counts = np.empty(len(doodads), dtype=np.int64)
+
+        for i, obj in enumerate(doodads):
+            location = obj.matrix_world.translation
+            polygons = kd_tree.find_range(location, self.get_doodad_radius(obj)) or [kd_tree.find(location)]
+
+            poly_indices.extend(poly[1] for poly in polygons)
+            counts[i] = len(polygons)
+
+        poly_indices = np.array(poly_indices, dtype=np.int64)
+        doodad_indices = np.repeat(np.arange(len(doodads)), counts)
+
+        colors = np.zeros((len(doodads), 4), dtype=np.float64)
+        np.add.at(colors, doodad_indices, color_sums[poly_indices])
+
+        n_loops = np.bincount(doodad_indices, weights=loop_totals[poly_indices], minlength=len(doodads))
+        colors /= np.maximum(n_loops, 1)[:, None]
+        colors[n_loops == 0] = DEFAULT_DOODAD_COLOR
+
+        root = self.scene.wow_wmo_root
+
+        if "2" in root.flags and group.wow_wmo_group.place_type == '8192':
+            colors += np.array(root.ambient_color, dtype=np.float64) / 2
+
+        return colors
+
+    def bake(self, objects: List[bpy.types.Object]) -> int:
+        """ Bake colors to all doodads among objects, return the number of doodads baked """
+
+        doodads = [obj for obj in objects if obj.wow_wmo_doodad.enabled]
+        groups = self.group_index.find_nearest_groups(obj.matrix_world.translation for obj in doodads)
+
+        doodads_by_group : Dict[str, Tuple[bpy.types.Object, List[bpy.types.Object]]] = {}
+
+        for obj, group in zip(doodads, groups):
+
+            if group is None or '0' not in group.wow_wmo_group.flags or not group.data.vertex_colors.get('Col'):
+                continue
+
+            doodads_by_group.setdefault(group.name, (group, []))[1].append(obj)
+
+        n_baked = 0
+
+        for group, group_doodads in doodads_by_group.values():
+            colors = np.power(np.clip(self.bake_group(group, group_doodads), 0.0, None), 2.2)
+
+            for obj, color in zip(group_doodads, colors.tolist()):
+                obj.wow_wmo_doodad.color = color
+
+            n_baked += len(group_doodads)
+
+        return n_baked
@@ -1,58 +1,126 @@
 import bpy
-import mathutils
-import sys
+import numpy as np
 
-from math import pi
-from ...pywowlib.file_formats.wmo_format_root import PortalRelation
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from typing import Dict, Iterable, List, Tuple
 
+from ...utils.misc import get_mesh_world_data
 
-def calculate_portal_direction( group_obj : bpy.types.Object
-                              , portal_obj : bpy.types.Object
-                              , bound_relation : PortalRelation
-                              , bound_relation_side : int
-                              ) -> int:
-    mesh = group_obj.data
-    portal_mesh = portal_obj.data
-    normal = portal_obj.data.polygons[0].normal
 
-    for poly in mesh.polygons:
-        poly_normal = mathutils.Vector(poly.normal)
-        g_center = group_obj.matrix_world @ poly.center + poly_normal * sys.float_info.epsilon
+class PortalDirectionSolver:
+    """ Calculates MOPR portal relation sides from BVH trees of world-space group geometry.
+    Neither the scene nor the portal / group objects are modified in the process. """
 
-        dist = normal[0] * g_center[0] + normal[1] * g_center[1] \
-               + normal[2] * g_center[2] - portal_mesh.polygons[0].normal[0] \
-                                           * portal_mesh.vertices[portal_mesh.polygons[0].vertices[0]].co[0] \
-               - portal_mesh.polygons[0].normal[1] \
-                 * portal_mesh.vertices[portal_mesh.polygons[0].vertices[0]].co[1] \
-               - portal_mesh.polygons[0].normal[2] \
-                 * portal_mesh.vertices[portal_mesh.polygons[0].vertices[0]].co[2]
+    # distance rays are pushed away from the casting polygon to avoid self-intersection
+    ray_offset = 1e-4
 
-        if dist == 0:
-            continue
+    def __init__(self, group_objects: Iterable[bpy.types.Object]):
 
-        for portal_poly in portal_mesh.polygons:
+        self.group_faces : Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.portal_targets : Dict[str, Tuple[Vector, float, List[List[Vector]]]] = {}
+        self.sides : Dict[Tuple[str, str], int] = {}
 
-            direction = portal_poly.center - g_center
-            length = mathutils.Vector(direction).length
-            direction.normalize()
+        occluder_verts = []
+        occluder_polys = []
+        vert_offset = 0
 
-            angle = mathutils.Vector(direction).angle(poly.normal, None)
+        for obj in group_objects:
+            co, polygons, centers, normals = get_mesh_world_data(obj)
 
-            if angle is None or angle >= pi * 0.5:
-                continue
+            occluder_verts.extend(co.tolist())
+            occluder_polys.extend([i + vert_offset for i in poly] for poly in polygons)
+            vert_offset += len(co)
 
-            ray_cast_result = bpy.context.scene.ray_cast(g_center, direction)
+            self.group_faces[obj.name] = (centers, normals)
 
-            if not ray_cast_result[0] \
-                    or ray_cast_result[4].name == portal_obj.name \
-                    or mathutils.Vector(
-                        (ray_cast_result[1][0] - g_center[0], ray_cast_result[1][1] - g_center[1],
-                         ray_cast_result[1][2] - g_center[2])).length > length:
-                result = 1 if dist > 0 else -1
+        # all group geometry is merged into a single tree, as any group can occlude the line of sight to a portal
+        self.occluders = BVHTree.FromPolygons(occluder_verts, occluder_polys, all_triangles=False)
 
-                if bound_relation_side == 0:
-                    bound_relation.Side = -result
+    def get_portal_targets(self, portal_obj: bpy.types.Object) -> Tuple[Vector, float, List[List[Vector]]]:
+        """ Get portal plane and sets of points rays are cast to, ordered by priority """
 
-                return result
+        targets = self.portal_targets.get(portal_obj.name)
 
-    return 0
+        if targets is not None:
+            return targets
+
+        co, polygons, centers, normals = get_mesh_world_data(portal_obj)
+
+        normal = Vector(normals[0])
+        plane_dist = normal.dot(Vector(co[polygons[0][0]]))
+
+        poly_centers = [Vector(center) for center in centers]
+
+        # triangle centers act as a fallback when polygon centers are obscured
+        tri_centers = []
+        for poly in polygons:
+            for i in range(1, len(poly) - 1):
+                tri_centers.append(Vector(co[poly[0]] + co[poly[i]] + co[poly[i + 1]]) / 3)
+
+        targets = normal, plane_dist, [poly_centers, tri_centers]
+        self.portal_targets[portal_obj.name] = targets
+
+        return targets
+
+    def calculate_side(self, portal_obj: bpy.types.Object, group_obj: bpy.types.Object) -> int:
+        """ Get the side of portal plane a group is located at, 0 if it could not be determined """
+
+        centers, normals = self.group_faces[group_obj.name]
+        portal_normal, plane_dist, target_sets = self.get_portal_targets(portal_obj)
+
+        dists = centers @ np.array(portal_normal, dtype=np.float32) - plane_dist
+
+        for targets in target_sets:
+
+            for center, normal, dist in zip(centers, normals, dists):
+
+                if dist == 0:
+                    continue
+
+                center = Vector(center)
+                normal = Vector(normal)
+
+                for target in targets:
+                    direction = target - center
+                    length = direction.length
+
+                    if not length:
+                        continue
+
+                    direction /= length
+
+                    # portal is behind the polygon
+                    if direction.dot(normal) <= 0:
+                        continue
+
+                    hit = self.occluders.ray_cast(center + normal * self.ray_offset, direction, length - self.ray_offset)
+
+                    if hit[0] is None:
+                        return 1 if dist > 0 else -1
+
+        return 0
+
+    def get_side(self, portal_obj: bpy.types.Object, group_obj: bpy.types.Object) -> int:
+        """ Get cached side of portal plane a group is located at """
+
+        key = portal_obj.name, group_obj.name
+        side = self.sides.get(key)
+
+        if side is None:
+            side = self.calculate_side(portal_obj, group_obj)
+            self.sides[key] = side
+
+        return side
+
+    def solve(self, portal_objects: Iterable[bpy.types.Object]) -> Dict[Tuple[str, str], int]:
+        """ Evaluate sides of all portal / group relations in one pass """
+
+        for portal_obj in portal_objects:
+            for group_obj in (portal_obj.wow_wmo_portal.first, portal_obj.wow_wmo_portal.second):
+
+                # the opposite side is only needed when the first one could not be determined
+                if group_obj and group_obj.name in self.group_faces and self.get_side(portal_obj, group_obj):
+                    break
+
+        return self.sides
@@ -0,0 +1,137 @@
+import bpy
+import heapq
+import numpy as np
+
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ...utils.misc import get_mesh_world_data
+
+
+class AABBNode:
+    """ Node of a bounding volume hierarchy over group bounding boxes """
+
+    __slots__ = ('corner_min', 'corner_max', 'children', 'group_index')
+
+    def __init__(self, corner_min: np.ndarray, corner_max: np.ndarray
+                 , children: Tuple['AABBNode', ...] = (), group_index: int = -1):
+        self.corner_min = corner_min
+        self.corner_max = corner_max
+        self.children = children
+        self.group_index = group_index
+
+    def distance_squared(self, point: np.ndarray) -> float:
+        delta = np.maximum(np.maximum(self.corner_min - point, point - self.corner_max), 0.0)
+        return float(delta.dot(delta))
+
+
+class GroupSpatialIndex:
+    """ Answers nearest WMO group queries using an AABB tree over group bounds and cached per-group BVH trees.
+    World-space geometry is snapshotted on construction, so the index must be rebuilt after groups are edited. """
+
+    def __init__(self, group_objects: Iterable[bpy.types.Object]):
+
+        self.groups : List[bpy.types.Object] = list(group_objects)
+        self.bvh_trees : Dict[int, BVHTree] = {}
+
+        if not self.groups:
+            self.root = None
+            return
+
+        corners = np.empty((len(self.groups), 8, 3), dtype=np.float64)
+
+        for i, obj in enumerate(self.groups):
+            bound_box = np.array([corner[:] for corner in obj.bound_box], dtype=np.float64)
+            matrix = np.array(obj.matrix_world, dtype=np.float64)
+            corners[i] = bound_box @ matrix[:3, :3].T + matrix[:3, 3]
+
+        self.bounds_min = corners.min(axis=1)
+        self.bounds_max = corners.max(axis=1)
+
+        self.root = self._build_node(np.arange(len(self.groups)))
+
+    def _build_node(self, indices: np.ndarray) -> AABBNode:
+
+        corner_min = self.bounds_min[indices].min(axis=0)
+        corner_max = self.bounds_max[indices].max(axis=0)
+
+        if len(indices) == 1:
+            return AABBNode(corner_min, corner_max, group_index=int(indices[0]))
+
+        # split at the median of box centers along the longest axis
+        axis = int(np.argmax(corner_max - corner_min))
+        centers = (self.bounds_min[indices, axis] + self.bounds_max[indices, axis]) * 0.5
+        order = indices[np.argsort(centers, kind='stable')]
+        half = len(order) // 2
+
+        return AABBNode(corner_min, corner_max, children=(self._build_node(order[:half]),
+                                                          self._build_node(order[half:])))
+
+    def get_bvh_tree(self, group_index: int) -> BVHTree:
+        """ Get world-space BVH tree of a group, built on first use """
+
+        bvh_tree = self.bvh_trees.get(group_index)
+
+        if bvh_tree is None:
+            co, polygons, _, _ = get_mesh_world_data(self.groups[group_index])
+            bvh_tree = BVHTree.FromPolygons(co.tolist(), polygons, all_triangles=False)
+            self.bvh_trees[group_index] = bvh_tree
+
+        return bvh_tree
+
+    def group_distance(self, group_index: int, point: Sequence[float]) -> float:
+        """ Get distance from a world-space point to the surface of a group """
+
+        result = self.get_bvh_tree(group_index).find_nearest(Vector(point))
+
+        # groups without geometry can never be nearest
+        return result[3] if result[3] is not None else float('inf')
+
+    def find_nearest(self, point: Sequence[float], count: int = 1) -> List[Tuple[bpy.types.Object, float]]:
+        """ Get up to count groups nearest to a world-space point, sorted by distance """
+
+        if self.root is None:
+            return []
+
+        point_np = np.array(point[:3], dtype=np.float64)
+
+        # best-first traversal, candidates is a max-heap of the current nearest (distance, group index) pairs,
+        # equally distant groups are ordered by index so the first one passed to the index wins
+        candidates = []
+        queue = [(self.root.distance_squared(point_np), 0, self.root)]
+        counter = 1
+
+        while queue:
+            box_dist_sq, _, node = heapq.heappop(queue)
+
+            # a box is never farther than the surface inside it, so no remaining group can be nearer
+            if len(candidates) == count and box_dist_sq > (-candidates[0][0]) ** 2:
+                break
+
+            if node.group_index >= 0:
+                dist = self.group_distance(node.group_index, point)
+
+                if len(candidates) < count:
+                    heapq.heappush(candidates, (-dist, -node.group_index))
+                elif (dist, node.group_index) < (-candidates[0][0], -candidates[0][1]):
+                    heapq.heapreplace(candidates, (-dist, -node.group_index))
+
+                continue
+
+            for child in node.children:
+                heapq.heappush(queue, (child.distance_squared(point_np), counter, child))
+                counter += 1
+
+        return [(self.groups[-neg_index], -neg_dist) for neg_dist, neg_index in sorted(candidates, reverse=True)]
+
+    def find_nearest_group(self, point: Sequence[float]) -> Optional[bpy.types.Object]:
+        """ Get the group nearest to a world-space point """
+
+        result = self.find_nearest(point)
+        return result[0][0] if result else None
+
+    def find_nearest_groups(self, points: Iterable[Sequence[float]]) -> List[Optional[bpy.types.Object]]:
+        """ Get the nearest group for each of the world-space points """
+
+        return [self.find_nearest_group(point) for point in points]
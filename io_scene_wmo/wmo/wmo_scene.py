@@ -5,16 +5,17 @@ import bmesh
 from mathutils import Vector
 from bmesh.types import BMVert
 
-from math import sqrt, atan2, pi
+from math import sqrt, atan2
 from typing import Dict, List
 
 from .bl_render import update_wmo_mat_node_tree, load_wmo_shader_dependencies, BlenderWMOMaterialRenderFlags
 from .utils.fogs import create_fog_object
 from .utils.materials import load_texture, add_ghost_material
 from .utils.doodads import import_doodad
+from .utils.portals import PortalDirectionSolver
+from .utils.spatial import GroupSpatialIndex
 from .wmo_scene_group import BlenderWMOSceneGroup
 from ..ui import get_addon_prefs
-from ..utils.misc import find_nearest_object
 
 from ..pywowlib.file_formats.wmo_format_root import GroupInfo, PortalInfo, PortalRelation, Fog
 from ..pywowlib.wmo_file import WMOFile
@@ -462,9 +463,13 @@ class BlenderWMOScene:
             self.bl_fogs.append(slot.pointer)
             slot.pointer.wow_wmo_fog.fog_id = i
 
+        group_index = GroupSpatialIndex(group_objects)
+
         # process lights
-        for i, slot in enumerate(root_elements.lights):
-            group = find_nearest_object(slot.pointer, group_objects)
+        light_groups = group_index.find_nearest_groups(slot.pointer.matrix_world.translation
+                                                       for slot in root_elements.lights)
+
+        for i, (slot, group) in enumerate(zip(root_elements.lights, light_groups)):
             rel = group.wow_wmo_group.relations.lights.add()
             rel.id = i
 
@@ -474,9 +479,11 @@ class BlenderWMOScene:
         doodad_counter = 0
         for i, slot in enumerate(root_elements.doodad_sets):
 
+            doodad_groups = group_index.find_nearest_groups(doodad.pointer.matrix_world.translation
+                                                            for doodad in slot.doodads)
+
             doodads = []
-            for doodad in slot.doodads:
-                group = find_nearest_object(doodad.pointer, group_objects)
+            for doodad, group in zip(slot.doodads, doodad_groups):
                 rel = group.wow_wmo_group.relations.doodads.add()
                 rel.id = doodad_counter
                 doodad_counter += 1
@@ -607,69 +614,85 @@ class BlenderWMOScene:
                                position, intensity, attenuation_start, attenuation_end)
 
     @staticmethod
-    def get_angle(vec_a: Vector, vec_b: Vector, vec_n: Vector) -> float:
-        return atan2(
-            -(vec_a.x * vec_b.y * vec_n.z + vec_b.x * vec_n.y * vec_a.z + vec_n.x * vec_a.y * vec_b.z
-              - vec_a.z * vec_b.y * vec_n.x - vec_b.z * vec_n.y * vec_a.x - vec_n.z * vec_a.y * vec_b.x),
-            -(vec_a.x * vec_b.x + vec_a.y * vec_b.y + vec_a.z * vec_b.z)) + pi
+    def walk_portal_outline(vertices: List[BMVert], origin: BMVert, normal: Vector) -> List[BMVert]:
+        """ Order vertices by walking the boundary edges of a portal, used for outlines angular sorting fails on """
 
-    @staticmethod
-    def traverse(  cur_vtx: BMVert
-                 , nodes_to_hit: List
-                 , nodes_hit: List
-                 , origin: BMVert) -> List:
+        edges = {edge for vtx in vertices for edge in vtx.link_edges}
+        outline = [edge for edge in edges if len(edge.link_faces) == 1] or list(edges)
 
-        for edge in cur_vtx.link_edges:
+        adjacency = {vtx: [] for vtx in vertices}
 
-            other = edge.other_vert(cur_vtx)
+        for edge in outline:
+            vtx_a, vtx_b = edge.verts
+            adjacency[vtx_a].append(vtx_b)
+            adjacency[vtx_b].append(vtx_a)
 
-            if other == origin:
-                if not nodes_to_hit:
-                    return nodes_hit
-                else:
-                    continue
+        if any(len(linked) != 2 for linked in adjacency.values()):
+            return []
 
-            if other in nodes_hit:
-                continue
+        result = [origin]
+        prev_vtx, cur_vtx = origin, adjacency[origin][0]
+
+        while cur_vtx is not origin:
 
-            nodes_to_hit_new = nodes_to_hit.copy()
-            nodes_to_hit_new.remove(other)
+            if len(result) > len(vertices):
+                return []
 
-            nodes_hit_new = nodes_hit.copy()
-            nodes_hit_new.append(other)
+            result.append(cur_vtx)
+            linked = adjacency[cur_vtx]
+            prev_vtx, cur_vtx = cur_vtx, linked[1] if linked[0] is prev_vtx else linked[0]
 
-            result = BlenderWMOScene.traverse(other, nodes_to_hit_new, nodes_hit_new, origin)
+        if len(result) != len(vertices):
+            return []
 
-            if result:
-                return result
+        # keep counter-clockwise winding around the portal normal
+        area_normal = Vector((0, 0, 0))
+        for i, vtx in enumerate(result):
+            area_normal += vtx.co.cross(result[(i + 1) % len(result)].co)
 
-        return []
+        if area_normal.dot(normal) < 0:
+            result = result[:1] + result[:0:-1]
+
+        return result
 
     @staticmethod
     def sort_portal_vertices(vertices: List[BMVert], normal: Vector) -> List[BMVert]:
+        """ Order portal vertices counter-clockwise around the portal normal """
 
-        pos_n = Vector((0, 0, 0))
-        origin = None
+        vertices = list(vertices)
 
+        if len(vertices) < 3:
+            return vertices
+
+        origin = next((vtx for vtx in vertices if len(vtx.link_edges) == 2), vertices[0])
+
+        center = Vector((0, 0, 0))
         for vtx in vertices:
-            if len(vtx.link_edges) == 2 and origin is None:
-                origin = vtx
-            pos_n += vtx.co
+            center += vtx.co
+        center /= len(vertices)
+
+        # project vertices onto the portal plane and sort them by angle around the centroid
+        axis_u = normal.orthogonal().normalized()
+        axis_v = normal.cross(axis_u).normalized()
+
+        def get_angle(vtx: BMVert) -> float:
+            offset = vtx.co - center
+            return atan2(offset.dot(axis_v), offset.dot(axis_u))
 
-        pos_n /= len(vertices)
-        vtx_a = origin.link_edges[0].other_vert(origin)
-        vtx_b = origin.link_edges[1].other_vert(origin)
-        vector_o = origin.co - pos_n
-        next_vtx = vtx_b if BlenderWMOScene.get_angle(vtx_a.co - pos_n, vector_o, normal) \
-                            < BlenderWMOScene.get_angle(vtx_b.co - pos_n, vector_o, normal) else vtx_a
+        result = sorted(vertices, key=get_angle)
 
-        # traversing mesh
-        nodes_to_hit = list(vertices).copy()
-        nodes_to_hit.remove(origin)
-        nodes_to_hit.remove(next_vtx)
+        origin_index = result.index(origin)
+        result = result[origin_index:] + result[:origin_index]
 
-        nodes_hit = [origin, next_vtx]
-        result = BlenderWMOScene.traverse(next_vtx, nodes_to_hit, nodes_hit, origin)
+        # angular order is only valid if the outline is star-shaped around the centroid
+        linked_pairs = {frozenset(edge.verts) for vtx in vertices for edge in vtx.link_edges}
+
+        if linked_pairs and not all(frozenset((vtx, result[(i + 1) % len(result)])) in linked_pairs
+                                    for i, vtx in enumerate(result)):
+            outline = BlenderWMOScene.walk_portal_outline(vertices, origin, normal)
+
+            if outline:
+                return outline
 
         return result
 
@@ -679,6 +702,9 @@ class BlenderWMOScene:
 
         self.wmo.mopt.infos = len(self.bl_portals) * [PortalInfo()]
 
+        direction_solver = PortalDirectionSolver(bl_group.bl_object for bl_group in self.bl_groups)
+        direction_solver.solve(self.bl_portals)
+
         for bl_group in tqdm(self.bl_groups, desc='Saving portals', ascii=True):
 
             group_obj = bl_group.bl_object
@@ -737,7 +763,7 @@ class BlenderWMOScene:
                 relation.group_index = second.wow_wmo_group.group_id if first.name == group_obj.name \
                                                                      else first.wow_wmo_group.group_id
 
-                relation.side = bl_group.get_portal_direction(portal_obj, group_obj)
+                relation.side = bl_group.get_portal_direction(portal_obj, group_obj, direction_solver)
 
                 self.wmo.mopr.relations.append(relation)
 
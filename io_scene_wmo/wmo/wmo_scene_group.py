@@ -1,10 +1,9 @@
 import bpy
-import mathutils
 import bmesh
 import sys
 import inspect
 
-from math import pi, ceil, floor
+from math import ceil, floor
 
 from ..pywowlib.file_formats.wmo_format_group import MOGPFlags, LiquidVertex, TriangleMaterial, Batch
 from ..pywowlib.wmo_file import WMOGroupFile
@@ -601,61 +600,9 @@ class BlenderWMOSceneGroup:
 
             nobj.wow_wmo_group.liquid_type = str(real_liquid_type)
 
-    def get_portal_direction(self, portal_obj, group_obj):
+    def get_portal_direction(self, portal_obj, group_obj, direction_solver):
         """ Get the direction of MOPR portal relation given a portal object and a target group """
 
-        def try_calculate_direction():
-
-            mesh = group_obj.data
-            portal_mesh = portal_obj.data
-            normal = portal_obj.data.polygons[0].normal
-
-            for poly in mesh.polygons:
-                poly_normal = mathutils.Vector(poly.normal)
-                g_center = group_obj.matrix_world @ poly.center + poly_normal * sys.float_info.epsilon
-
-                dist = normal[0] * g_center[0] + normal[1] * g_center[1] \
-                       + normal[2] * g_center[2] - portal_mesh.polygons[0].normal[0] \
-                       * portal_mesh.vertices[portal_mesh.polygons[0].vertices[0]].co[0] \
-                       - portal_mesh.polygons[0].normal[1] \
-                       * portal_mesh.vertices[portal_mesh.polygons[0].vertices[0]].co[1] \
-                       - portal_mesh.polygons[0].normal[2] \
-                       * portal_mesh.vertices[portal_mesh.polygons[0].vertices[0]].co[2]
-
-                if dist == 0:
-                    continue
-
-                for portal_poly in portal_mesh.polygons:
-
-                    direction = portal_poly.center - g_center
-                    length = mathutils.Vector(direction).length
-                    direction.normalize()
-
-                    angle = mathutils.Vector(direction).angle(poly.normal, None)
-
-                    if angle is None or angle >= pi * 0.5:
-                        continue
-
-                    ray_cast_result = bpy.context.scene.ray_cast(bpy.context.view_layer, g_center, direction)
-
-                    if not ray_cast_result[0] \
-                            or ray_cast_result[4].name == portal_obj.name \
-                            or mathutils.Vector(
-                        (ray_cast_result[1][0] - g_center[0], ray_cast_result[1][1] - g_center[1],
-                         ray_cast_result[1][2] - g_center[2])).length > length:
-                        result = 1 if dist > 0 else -1
-
-                        if bound_relation_side == 0:
-                            bound_relation.side = -result
-
-                        return result
-
-            return 0
-
-        bpy.ops.object.select_all(action='DESELECT')
-
-        bpy.context.view_layer.objects.active = portal_obj
-
         # check if this portal was already processed
         bound_relation_side = None
         bound_relation = None
@@ -670,34 +617,13 @@ class BlenderWMOSceneGroup:
         if portal_obj.wow_wmo_portal.algorithm != '0':
             return 1 if portal_obj.wow_wmo_portal.algorithm == '1' else -1
 
-        # reveal hidden geometry
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.mesh.reveal()
-        bpy.ops.mesh.select_all(action='DESELECT')
-        bpy.ops.object.mode_set(mode='OBJECT')
-
-        portal_obj.select_set(True)
-        bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
-        portal_obj.select_set(False)
-
-        bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY')
-
-        result = try_calculate_direction()
+        result = direction_solver.get_side(portal_obj, group_obj)
 
         if result:
-            return result
-
-        # triangulate the proxy portal
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.mesh.quads_convert_to_tris()
-        bpy.ops.mesh.select_all(action='DESELECT')
-        bpy.ops.object.mode_set(mode='OBJECT')
 
-        result = try_calculate_direction()
+            if bound_relation_side == 0:
+                bound_relation.side = -result
 
-        if result:
             return result
 
         if bound_relation_side is None: